@@ -0,0 +1,76 @@
+"""Measure bleed stage throughput in megapixels per second for each bleed mode.
+
+    python benchmarks/bleed_bench.py [--bleed 3] [--images 4] [--size 1800x1200]
+
+The default size is a 4x6in card at 300 DPI. For every mode, reports the bare
+NumPy extension rate and end-to-end bleed_image (decode, extend, write), cold
+and from the on-disk cache.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from business_logic import bleed
+from business_logic.bleed import BLEED_MODES, bleed_image, extend_bleed
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main():
+    import numpy as np
+    from PIL import Image
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bleed', type=float, default=3.0, help="Bleed in mm")
+    parser.add_argument('--images', type=int, default=4)
+    parser.add_argument('--size', default='1800x1200')
+    parser.add_argument('--dpi', type=int, default=300)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split('x'))
+    megapixels = width * height / 1e6
+    trim_width_mm = width * 25.4 / args.dpi
+
+    work_dir = tempfile.mkdtemp(prefix='postcard-bleed-bench-')
+    results = {}
+    try:
+        images = []
+        for i in range(args.images):
+            path = os.path.join(work_dir, f'card_{i}.png')
+            Image.merge('RGB', [Image.effect_noise((width, height), 40 + i)] * 2 + [Image.linear_gradient('L').resize((width, height))]).save(path, compress_level=1)
+            images.append(path)
+
+        with Image.open(images[0]) as img:
+            pixels = np.asarray(img.convert('RGB'))
+        pad = round(args.bleed * width / trim_width_mm)
+
+        for mode in BLEED_MODES:
+            extend_seconds, _ = timed(lambda: extend_bleed(pixels, pad, mode))
+            cache_dir = os.path.join(work_dir, f'cache_{mode}')
+            cold_seconds, _ = timed(lambda: [bleed_image(path, args.bleed, trim_width_mm, mode, cache_dir) for path in images])
+            bleed._bled.clear()  # Leave only the on-disk cache
+            warm_seconds, _ = timed(lambda: [bleed_image(path, args.bleed, trim_width_mm, mode, cache_dir) for path in images])
+            results[mode] = {
+                'extend_mp_per_second': megapixels / extend_seconds,
+                'bleed_image_mp_per_second': megapixels * args.images / cold_seconds,
+                'cached_mp_per_second': megapixels * args.images / warm_seconds,
+            }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps({
+        'image_megapixels': megapixels,
+        'bleed_mm': args.bleed,
+        'bleed_px': pad,
+        'modes': results,
+    }, indent=4))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Measure colour stage throughput in megapixels per second.
+
+    python benchmarks/color_bench.py [--profile press_cmyk.icc] [--images 8] [--size 3000x2000]
+
+Reports the cost of building a transform cold and from the cache, the bare
+transform rate on one thread, and end-to-end conversion (decode, transform,
+write) through the worker pool, cold and from the converted-image cache.
+Without --profile, a built-in Lab profile stands in for the press profile.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from business_logic import color_management
+from business_logic.color_management import convert_images, get_transform
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main():
+    from PIL import Image, ImageCms
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', help="Output ICC profile, e.g. the press's CMYK profile")
+    parser.add_argument('--intent', default='perceptual', choices=color_management.RENDERING_INTENTS)
+    parser.add_argument('--images', type=int, default=8)
+    parser.add_argument('--size', default='3000x2000')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split('x'))
+    megapixels = width * height / 1e6
+
+    work_dir = tempfile.mkdtemp(prefix='postcard-color-bench-')
+    try:
+        profile = args.profile
+        if not profile:
+            profile = os.path.join(work_dir, 'lab.icc')
+            with open(profile, 'wb') as f:
+                f.write(ImageCms.ImageCmsProfile(ImageCms.createProfile('LAB')).tobytes())
+
+        images = []
+        for i in range(args.images):
+            path = os.path.join(work_dir, f'card_{i}.png')
+            Image.merge('RGB', [Image.effect_noise((width, height), 40 + i)] * 2 + [Image.linear_gradient('L').resize((width, height))]).save(path, compress_level=1)
+            images.append(path)
+
+        build_cold, _ = timed(lambda: get_transform(None, profile, args.intent))
+        build_cached, (transform, output_mode) = timed(lambda: get_transform(None, profile, args.intent))
+
+        with Image.open(images[0]) as img:
+            rgb = img.convert('RGB')
+        apply_seconds, _ = timed(lambda: transform.apply(rgb))
+
+        cache_dir = os.path.join(work_dir, 'cache')
+        cold_seconds, _ = timed(lambda: convert_images(images, profile, args.intent, cache_dir, args.workers))
+        color_management._converted.clear()  # Leave only the on-disk cache
+        warm_seconds, _ = timed(lambda: convert_images(images, profile, args.intent, cache_dir, args.workers))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    total_megapixels = megapixels * args.images
+    print(json.dumps({
+        'profile': args.profile or 'built-in Lab',
+        'output_mode': output_mode,
+        'image_megapixels': megapixels,
+        'transform_build_ms': {'cold': build_cold * 1000, 'cached': build_cached * 1000},
+        'transform_mp_per_second': megapixels / apply_seconds,
+        'pool_convert_mp_per_second': total_megapixels / cold_seconds,
+        'pool_cached_mp_per_second': total_megapixels / warm_seconds,
+    }, indent=4))
+
+if __name__ == '__main__':
+    main()
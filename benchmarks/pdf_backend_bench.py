@@ -0,0 +1,59 @@
+"""Compare sheet writer backends on throughput and output size.
+
+    python benchmarks/pdf_backend_bench.py [--sheets 20] [--paper-size A4]
+
+Writes one multi-page PDF per backend from the same synthetic 4x6 card and
+prints sheets/s and file size as JSON.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from business_logic.pdf_operations import layout_postcard_sheet
+from business_logic.sheet_writers import SHEET_WRITERS
+
+def make_synthetic_card(path, size=(1800, 1200)):
+    from PIL import Image
+
+    # Noise keeps the encoders honest; a flat image compresses to nothing.
+    Image.effect_noise(size, 64).convert('RGB').save(path)
+
+def bench_backend(backend, image_path, paper_size, sheets, output_dir):
+    output_pdf = os.path.join(output_dir, f'{backend}.pdf')
+    start = time.perf_counter()
+    _, geometry = layout_postcard_sheet(image_path, paper_size)
+    writer = SHEET_WRITERS[backend](output_pdf)
+    for _ in range(sheets):
+        writer.add_sheet(image_path, geometry)
+    writer.close()
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'sheets_per_second': sheets / elapsed,
+        'output_bytes': os.path.getsize(output_pdf),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sheets', type=int, default=20)
+    parser.add_argument('--paper-size', default='A4')
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp(prefix='postcard-backend-bench-')
+    try:
+        image_path = os.path.join(output_dir, 'card.png')
+        make_synthetic_card(image_path)
+        results = {backend: bench_backend(backend, image_path, args.paper_size, args.sheets, output_dir)
+                   for backend in SHEET_WRITERS}
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    print(json.dumps(results, indent=4))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Load test for the render service.
+
+Starts ``python -m service.render_service`` on a free local port (or uses
+--port to target one that is already running), submits jobs from several
+concurrent clients and reports requests/s and latency percentiles as JSON.
+Latency is measured from submitting a job to receiving the last byte of its PDF.
+
+    python benchmarks/service_load_test.py [--jobs 40] [--concurrency 8] [--workers 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def http_request(port, method, path, body=b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split(b' ', 2)[1]), payload
+
+async def run_job(port, spec, admission_wait):
+    start = time.perf_counter()
+    retries = 0
+    submit_path = f'/jobs?wait={admission_wait}' if admission_wait else '/jobs'
+    while True:
+        status, payload = await http_request(port, 'POST', submit_path, json.dumps(spec).encode())
+        if status != 503:
+            break
+        retries += 1
+        # Back off while the queue is full, with jitter so clients do not retry in lockstep
+        await asyncio.sleep(random.uniform(0.5, 1.0) * min(0.05 * 2 ** retries, 1.0))
+    if status != 202:
+        raise RuntimeError(f"Submit failed with {status}: {payload[:200]}")
+    job = json.loads(payload)
+    status, pdf = await http_request(port, 'GET', job['result_url'])
+    if status != 200 or not pdf.startswith(b'%PDF'):
+        raise RuntimeError(f"Result failed with {status}: {pdf[:200]}")
+    return time.perf_counter() - start, retries
+
+async def load_test(port, spec, jobs, concurrency, admission_wait):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def client():
+        async with semaphore:
+            return await run_job(port, spec, admission_wait)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client() for _ in range(jobs)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+    return {
+        'jobs': jobs,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests_per_second': jobs / elapsed,
+        'p50_ms': percentile(50),
+        'p99_ms': percentile(99),
+        'max_ms': latencies[-1] * 1000,
+        'queue_full_retries': sum(retries for _, retries in results),
+    }
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+async def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Render service did not start on port {port}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queue-size', type=int, default=8)
+    parser.add_argument('--paper-size', default='A4')
+    parser.add_argument('--backend', default='pymupdf')
+    parser.add_argument('--admission-wait', type=float, default=60,
+                        help="Seconds to wait for a queue slot per submit; 0 retries on 503 instead")
+    parser.add_argument('--port', type=int, help="Use an already running service")
+    args = parser.parse_args()
+
+    from PIL import Image
+
+    temp_dir = tempfile.mkdtemp(prefix='postcard-load-test-')
+    service = None
+    try:
+        image_path = os.path.join(temp_dir, 'card.png')
+        Image.effect_noise((1800, 1200), 64).convert('RGB').save(image_path)
+        spec = {'images': [image_path], 'paper_size': args.paper_size, 'dpi': 300, 'backend': args.backend}
+
+        port = args.port
+        if port is None:
+            port = free_port()
+            service = subprocess.Popen(
+                [sys.executable, '-m', 'service.render_service', '--port', str(port),
+                 '--workers', str(args.workers), '--queue-size', str(args.queue_size)],
+                cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        asyncio.run(wait_for_port(port))
+        results = asyncio.run(load_test(port, spec, args.jobs, args.concurrency, args.admission_wait))
+    finally:
+        if service:
+            service.terminate()
+            service.wait()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    results['backend'] = args.backend
+    results['admission_wait'] = args.admission_wait
+    print(json.dumps(results, indent=4))
+
+if __name__ == '__main__':
+    main()
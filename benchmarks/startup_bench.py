@@ -0,0 +1,123 @@
+"""Startup benchmark based on ``python -X importtime``.
+
+Measures the import cost of the PDF module used by the command line tools and
+the time until the main window is first shown, and fails when either exceeds
+its threshold or when a heavy library is loaded before it is needed.
+
+    python benchmarks/startup_bench.py [--cli-ms 150] [--window-ms 2000]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLI_MODULE = 'business_logic.pdf_operations'
+GUI_MODULE = 'ui.views.main_view'
+
+# Libraries that must only be imported on first use.
+HEAVY_MODULES = ('fitz', 'pymupdf', 'reportlab', 'PyPDF2', 'PIL', 'tkinter', 'pdf2image')
+
+FIRST_WINDOW_SNIPPET = '''
+import sys, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+from ui.views.main_view import PostcardApp
+app = QApplication(sys.argv)
+window = PostcardApp()
+window.show()
+app.processEvents()
+print("first_window_ms=%f" % ((time.perf_counter() - start) * 1000))
+'''
+
+
+def _isolated_workdir():
+    """Temporary working directory with a config that does not restore persisted files."""
+    workdir = tempfile.mkdtemp(prefix='postcard-startup-')
+    with open(os.path.join(REPO_ROOT, 'config.json')) as f:
+        config = json.load(f)
+    config.setdefault('user_modifiable', {})['persist_files'] = False
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(config, f)
+    return workdir
+
+
+def _run_importtime(code, cwd):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{result.stderr[-2000:]}")
+
+    cumulative_us = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, total_us, name = line.split('|')
+        cumulative_us[name.strip()] = int(total_us)
+    return cumulative_us, result.stdout
+
+
+def _heavy_modules_loaded(cumulative_us):
+    return sorted({name.split('.')[0] for name in cumulative_us if name.split('.')[0] in HEAVY_MODULES})
+
+
+def measure_cli_import(cwd):
+    cumulative_us, _ = _run_importtime(f'import {CLI_MODULE}', cwd)
+    return {
+        'import_ms': cumulative_us.get(CLI_MODULE, 0) / 1000,
+        'heavy_modules': _heavy_modules_loaded(cumulative_us),
+    }
+
+
+def measure_first_window(cwd):
+    cumulative_us, stdout = _run_importtime(FIRST_WINDOW_SNIPPET, cwd)
+    first_window_ms = None
+    for line in stdout.splitlines():
+        if line.startswith('first_window_ms='):
+            first_window_ms = float(line.split('=', 1)[1])
+    return {
+        'import_ms': cumulative_us.get(GUI_MODULE, 0) / 1000,
+        'first_window_ms': first_window_ms,
+        'heavy_modules': _heavy_modules_loaded(cumulative_us),
+    }
+
+
+def run(cli_ms, window_ms):
+    workdir = _isolated_workdir()
+    try:
+        results = {'cli': measure_cli_import(workdir), 'gui': measure_first_window(workdir)}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failures = []
+    if results['cli']['import_ms'] > cli_ms:
+        failures.append(f"CLI import took {results['cli']['import_ms']:.1f}ms (limit {cli_ms}ms)")
+    if results['gui']['first_window_ms'] is None or results['gui']['first_window_ms'] > window_ms:
+        failures.append(f"First window took {results['gui']['first_window_ms']}ms (limit {window_ms}ms)")
+    for target in ('cli', 'gui'):
+        if results[target]['heavy_modules']:
+            failures.append(f"{target} startup imported {', '.join(results[target]['heavy_modules'])}")
+    results['failures'] = failures
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cli-ms', type=float, default=150)
+    parser.add_argument('--window-ms', type=float, default=2000)
+    args = parser.parse_args()
+
+    results = run(args.cli_ms, args.window_ms)
+    print(json.dumps(results, indent=4))
+    return 1 if results['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
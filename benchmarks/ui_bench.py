@@ -0,0 +1,212 @@
+"""Scripted UI responsiveness benchmark, driving PostcardApp on the offscreen Qt platform.
+
+    python benchmarks/ui_bench.py [--images 1000] [--max-frame-ms 250] [--output ui_bench.json]
+
+Each scenario calls one GUI hot path from the event loop, as a user action
+would, then lets the loop run until background imports have finished and
+the preview loader has gone idle. A
+heartbeat timer ticking every HEARTBEAT_MS records how long the main thread
+went without processing events:
+
+    operation_ms   time spent in the scripted call itself
+    stall_ms       total time the heartbeat ran late by more than a frame
+    max_frame_ms   the longest gap between two heartbeats
+    renders        preview pages rendered as a result of the scenario
+    first_pass_ms  time from the preview being updated to its first, low
+                   quality page being shown; null if the scenario did not
+                   update the preview
+
+Results are printed as JSON with stable keys, so runs can be diffed. A
+scenario fails when its max_frame_ms exceeds its threshold or its
+first_pass_ms exceeds FIRST_PASS_BUDGET_MS (from business_logic.preview_proxies);
+the exit status is 1 if any scenario failed.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+HEARTBEAT_MS = 5
+FRAME_MS = 16
+SETTLE_QUIET_MS = 200
+SETTLE_TIMEOUT_S = 60
+
+# Longest the main thread may go without processing events, per scenario
+THRESHOLDS_MS = {
+    'import_files': 250,
+    'select_all': 250,
+    'switch_paper_size': 250,
+    'resize': 250,
+    'splitter_drag': 250,
+}
+
+# import_files shows the session's first preview, which also pays for loading the PDF libraries
+FIRST_PASS_EXEMPT = ('import_files',)
+
+def isolated_workdir(images):
+    """Working directory with its own config, no persisted session and ``images`` synthetic cards."""
+    from PIL import Image
+
+    workdir = tempfile.mkdtemp(prefix='postcard-ui-bench-')
+    with open(os.path.join(REPO_ROOT, 'config.json')) as f:
+        config = json.load(f)
+    config.setdefault('user_modifiable', {})['persist_files'] = False
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(config, f)
+
+    paths = []
+    image_dir = os.path.join(workdir, 'images')
+    os.makedirs(image_dir)
+    for i in range(images):
+        # Every card differs, or the import would skip them as duplicates
+        path = os.path.join(image_dir, f'card_{i:05d}.png')
+        Image.new('RGB', (600, 400), (i % 256, i // 256 % 256, 128)).save(path, dpi=(150, 150), compress_level=1)
+        paths.append(path)
+    return workdir, paths
+
+class Heartbeat:
+    """Timestamps of a fast repeating timer; gaps between them are time the event loop was blocked."""
+    def __init__(self):
+        from PyQt5.QtCore import Qt, QTimer
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(HEARTBEAT_MS)
+        self.timer.timeout.connect(lambda: self.ticks.append(time.perf_counter()))
+        self.ticks = []
+
+    def start(self):
+        self.ticks = [time.perf_counter()]
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.ticks.append(time.perf_counter())
+        gaps = [(later - earlier) * 1000 for earlier, later in zip(self.ticks, self.ticks[1:])]
+        return {
+            'stall_ms': sum(gap - HEARTBEAT_MS for gap in gaps if gap > FRAME_MS),
+            'max_frame_ms': max(gaps, default=0),
+        }
+
+def run_scenario(app, window, operation):
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from business_logic import instrumentation
+
+    renders_before = instrumentation.get('preview.cell_renders')
+    heartbeat = Heartbeat()
+    loop = QEventLoop()
+    timing = {}
+
+    def call():
+        start = time.perf_counter()
+        operation()
+        timing['operation_ms'] = (time.perf_counter() - start) * 1000
+        timing['done'] = time.perf_counter()
+
+    def poll():
+        # Settled once imports are done and the preview loader has been idle for SETTLE_QUIET_MS
+        now = time.perf_counter()
+        if 'done' not in timing:
+            return
+        if window.file_list.is_importing() or not window.preview_view.loader.is_idle():
+            timing['done'] = now
+        if (now - timing['done']) * 1000 >= SETTLE_QUIET_MS or now - timing['started'] > SETTLE_TIMEOUT_S:
+            loop.quit()
+
+    poller = QTimer()
+    poller.setInterval(10)
+    poller.timeout.connect(poll)
+    heartbeat.start()
+    poller.start()
+    timing['started'] = time.perf_counter()
+    QTimer.singleShot(0, call)
+    loop.exec_()
+    poller.stop()
+
+    result = heartbeat.stop()
+    result['operation_ms'] = timing['operation_ms']
+    result['renders'] = instrumentation.get('preview.cell_renders') - renders_before
+    return result
+
+def scenarios(window, images):
+    combo = window.paper_size_combo
+
+    def resize():
+        for width in (1100, 1300, 1000, 1200):
+            window.resize(width, width * 3 // 5)
+
+    def splitter_drag():
+        for preview in range(700, 300, -50):
+            window.splitter.setSizes([preview, 1000 - preview])
+
+    return [
+        ('import_files', lambda: window.file_list.import_files(images)),
+        ('select_all', lambda: (window.file_list.set_all_selected(True, True),
+                                window.file_list.set_all_selected(False, True))),
+        ('switch_paper_size', lambda: combo.setCurrentIndex((combo.currentIndex() + 1) % combo.count())),
+        ('resize', resize),
+        ('splitter_drag', splitter_drag),
+    ]
+
+def run(image_count, max_frame_ms=None):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    workdir, images = isolated_workdir(image_count)
+    cwd = os.getcwd()
+    # config.json is read from the working directory on import; the hash index,
+    # session and thumbnails go to the user directories, so those are moved too
+    os.chdir(workdir)
+    os.environ['XDG_DATA_HOME'] = os.path.join(workdir, 'data')
+    os.environ['XDG_CACHE_HOME'] = os.path.join(workdir, 'cache')
+    try:
+        from PyQt5.QtWidgets import QApplication
+        from business_logic import instrumentation
+        from business_logic.preview_proxies import FIRST_PASS_BUDGET_MS
+        from ui.views.main_view import PostcardApp
+
+        app = QApplication.instance() or QApplication(sys.argv)
+        window = PostcardApp()
+        window.show()
+        app.processEvents()
+
+        results = {'images': image_count, 'scenarios': {}, 'failures': []}
+        for name, operation in scenarios(window, images):
+            instrumentation.set_value('preview.first_pass_ms', None)
+            result = run_scenario(app, window, operation)
+            result['threshold_ms'] = max_frame_ms or THRESHOLDS_MS[name]
+            result['first_pass_ms'] = instrumentation.get('preview.first_pass_ms', None)
+            results['scenarios'][name] = result
+            if result['max_frame_ms'] > result['threshold_ms']:
+                results['failures'].append(
+                    f"{name} blocked the main thread for {result['max_frame_ms']:.0f}ms (limit {result['threshold_ms']}ms)")
+            if name not in FIRST_PASS_EXEMPT and (result['first_pass_ms'] or 0) > FIRST_PASS_BUDGET_MS:
+                results['failures'].append(
+                    f"{name} took {result['first_pass_ms']:.0f}ms to show a preview page (limit {FIRST_PASS_BUDGET_MS}ms)")
+        window.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=1000)
+    parser.add_argument('--max-frame-ms', type=float, help="One threshold for every scenario instead of THRESHOLDS_MS")
+    parser.add_argument('--output', help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.images, args.max_frame_ms)
+    output = json.dumps(results, indent=4, sort_keys=True)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    return 1 if results['failures'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
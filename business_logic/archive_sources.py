@@ -0,0 +1,205 @@
+"""Images read straight out of ZIP and TAR archives, without unpacking them.
+
+An archive member is named by the archive path, ``!/`` and the member name,
+e.g. ``bundle.zip!/front/card1.png``, and can be used wherever an image path
+is taken. Probing, hashing, thumbnails and preview proxies stream the member
+from the archive. Only the stages that hand a file name to reportlab or
+MuPDF need a real file; ``local_path`` copies just that member out once,
+into a cache in the user's cache directory keyed on its content hash.
+
+Each thread keeps its own open handle per archive, so worker pools read one
+ZIP or plain TAR in parallel instead of queueing on a shared file position.
+Compressed TARs have no random access: every backward seek decompresses
+from the start again. Their members are hashed in one front-to-back pass per
+archive (``hash_tar_members``), and other readers should take them in
+archive order.
+"""
+import collections
+import os
+import re
+import tarfile
+import tempfile
+import threading
+import zipfile
+
+from business_logic.image_operations import is_supported_image
+from config import user_cache_dir
+
+ARCHIVE_SEPARATOR = '!/'
+COMPRESSED_TAR_EXTENSIONS = ('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar') + COMPRESSED_TAR_EXTENSIONS
+ARCHIVE_CACHE_DIR = 'archive'  # Under the user's cache directory
+COPY_CHUNK_BYTES = 1024 * 1024
+
+_MEMBER_PATH = re.compile(
+    '^(.*?(?:%s))%s(.+)$' % ('|'.join(re.escape(ext) for ext in ARCHIVE_EXTENSIONS), re.escape(ARCHIVE_SEPARATOR)),
+    re.IGNORECASE)
+
+# Just the stat fields the hash index and session store compare
+SourceStat = collections.namedtuple('SourceStat', 'st_dev st_ino st_mtime_ns st_size')
+
+_local = threading.local()
+_materialized = {}
+_lock = threading.Lock()
+
+def is_archive(path):
+    """Whether ``path`` is an archive file, rather than a member inside one."""
+    return path.lower().endswith(ARCHIVE_EXTENSIONS) and not is_archive_member(path)
+
+def is_archive_member(path):
+    return ARCHIVE_SEPARATOR in path and _MEMBER_PATH.match(path) is not None
+
+def is_compressed_tar_member(path):
+    return is_archive_member(path) and split_archive_path(path)[0].lower().endswith(COMPRESSED_TAR_EXTENSIONS)
+
+def split_archive_path(path):
+    archive_path, member = _MEMBER_PATH.match(path).groups()
+    return archive_path, member
+
+def member_path(archive_path, member):
+    return f"{archive_path}{ARCHIVE_SEPARATOR}{member}"
+
+def _open_archive(archive_path):
+    # One handle per thread and archive, reopened if the archive changes on disk
+    stat = os.stat(archive_path)
+    handles = getattr(_local, 'handles', None)
+    if handles is None:
+        handles = _local.handles = {}
+    identity = (stat.st_mtime_ns, stat.st_size)
+    cached = handles.get(archive_path)
+    if cached and cached[0] == identity:
+        return cached[1]
+    if cached:
+        cached[1].close()
+    if zipfile.is_zipfile(archive_path):
+        handle = zipfile.ZipFile(archive_path)
+    else:
+        try:
+            handle = tarfile.open(archive_path)
+        except tarfile.TarError as e:
+            raise OSError(f"Not a ZIP or TAR archive: {archive_path}") from e
+    handles[archive_path] = (identity, handle)
+    return handle
+
+def _member_info(handle, member, path):
+    try:
+        if isinstance(handle, zipfile.ZipFile):
+            return handle.getinfo(member)
+        info = handle.getmember(member)
+    except KeyError:
+        raise FileNotFoundError(f"No such archive member: {path}")
+    if not info.isfile():
+        raise FileNotFoundError(f"Not a file: {path}")
+    return info
+
+def list_archive_images(archive_path):
+    """Member paths of the supported images in an archive, in archive order."""
+    handle = _open_archive(archive_path)
+    if isinstance(handle, zipfile.ZipFile):
+        names = [info.filename for info in handle.infolist() if not info.is_dir()]
+    else:
+        names = [info.name for info in handle.getmembers() if info.isfile()]
+    return [member_path(archive_path, name) for name in names if is_supported_image(name)]
+
+def expand_sources(paths):
+    """``paths`` with every archive replaced by the images inside it."""
+    expanded = []
+    for path in paths:
+        if is_archive(path) and os.path.isfile(path):
+            expanded.extend(list_archive_images(path))
+        else:
+            expanded.append(path)
+    return expanded
+
+def open_source(path):
+    """A binary file object for an image path or archive member, streamed from the archive."""
+    if not is_archive_member(path):
+        return open(path, 'rb')
+    archive_path, member = split_archive_path(path)
+    handle = _open_archive(archive_path)
+    info = _member_info(handle, member, path)
+    if isinstance(handle, zipfile.ZipFile):
+        return handle.open(info)
+    return handle.extractfile(info)
+
+def source_stat(path):
+    """os.stat for a file; for an archive member, the archive's stat with the member's size."""
+    if not is_archive_member(path):
+        return os.stat(path)
+    archive_path, member = split_archive_path(path)
+    stat = os.stat(archive_path)
+    info = _member_info(_open_archive(archive_path), member, path)
+    size = info.file_size if isinstance(info, zipfile.ZipInfo) else info.size
+    return SourceStat(stat.st_dev, stat.st_ino, stat.st_mtime_ns, size)
+
+def source_exists(path):
+    try:
+        source_stat(path)
+    except OSError:
+        return False
+    return True
+
+def local_path(path, cache_dir=None):
+    """A real file with the image's content: the path itself, or the archive member copied out once."""
+    from business_logic.content_hash import _new_hasher
+
+    if not is_archive_member(path):
+        return path
+    stat = source_stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _materialized.get(key)
+    if cached and os.path.exists(cached):
+        return cached
+
+    # The member is copied as it is, hashing it on the way, and named after its content
+    cache_dir = cache_dir or user_cache_dir(ARCHIVE_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    hasher = _new_hasher()
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir)
+    try:
+        with open_source(path) as src, os.fdopen(fd, 'wb') as dst:
+            while chunk := src.read(COPY_CHUNK_BYTES):
+                hasher.update(chunk)
+                dst.write(chunk)
+        cached = os.path.join(cache_dir, f"member_{hasher.hexdigest()[:16]}{os.path.splitext(path)[1].lower()}")
+        if os.path.exists(cached):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, cached)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    with _lock:
+        _materialized[key] = cached
+    return cached
+
+def hash_tar_members(archive_path, paths, new_hasher):
+    """Hash the given members of a TAR in a single streaming pass over the archive.
+
+    Returns {member path: (SourceStat, hash)} for the members found.
+    """
+    wanted = set(paths)
+    stat = os.stat(archive_path)
+    hashes = {}
+    with tarfile.open(archive_path, 'r|*') as archive:
+        for info in archive:
+            path = member_path(archive_path, info.name)
+            if path not in wanted or not info.isfile():
+                continue
+            hasher = new_hasher()
+            src = archive.extractfile(info)
+            while chunk := src.read(COPY_CHUNK_BYTES):
+                hasher.update(chunk)
+            hashes[path] = (SourceStat(stat.st_dev, stat.st_ino, stat.st_mtime_ns, info.size), hasher.hexdigest())
+            if len(hashes) == len(wanted):
+                break
+    return hashes
+
+def hash_member(path, hasher):
+    with open_source(path) as src:
+        while chunk := src.read(COPY_CHUNK_BYTES):
+            hasher.update(chunk)
+    return hasher.hexdigest()
@@ -0,0 +1,122 @@
+"""Bleed stage: extends each card image past its trim edge so cutting never leaves a white sliver.
+
+Modes, all done with whole-array NumPy operations on the decoded image:
+
+mirror          the image reflected across each trim edge
+stretch         the outermost row or column of pixels repeated outwards
+content_aware   the reflection, faded into the edge colours smoothed along
+                the edge, so details near the trim do not reappear mirrored
+
+Extended images are cached in the user's cache directory, keyed on the
+image's content hash, the bleed width in pixels and the mode.
+"""
+import os
+import tempfile
+import threading
+
+from business_logic.content_hash import content_key
+from config import user_cache_dir
+
+BLEED_MODES = ('mirror', 'stretch', 'content_aware')
+
+BLEED_CACHE_DIR = 'bleed'  # Under the user's cache directory
+
+_bled = {}
+_lock = threading.Lock()
+
+def extend_bleed(pixels, pad, mode='mirror'):
+    """``pixels`` (H x W x C uint8) with ``pad`` pixels added on every side."""
+    import numpy as np
+
+    if pad <= 0:
+        return pixels
+    if mode not in BLEED_MODES:
+        raise ValueError(f"Unknown bleed mode: {mode}")
+    pads = ((pad, pad), (pad, pad), (0, 0))
+    if mode == 'stretch':
+        return np.pad(pixels, pads, mode='edge')
+
+    mirrored = np.pad(pixels, pads, mode='symmetric')
+    if mode == 'mirror':
+        return mirrored
+    return _fade_to_edges(pixels, mirrored, pad)
+
+def _smooth(line, radius):
+    # Box filter along the first axis of a row or column of pixels, via a cumulative sum
+    import numpy as np
+
+    padded = np.pad(line.astype(np.float32), ((radius, radius), (0, 0)), mode='edge')
+    sums = np.cumsum(np.pad(padded, ((1, 0), (0, 0))), axis=0)
+    return (sums[2 * radius + 1:] - sums[:-2 * radius - 1]) / (2 * radius + 1)
+
+def _fade_to_edges(pixels, mirrored, pad):
+    import numpy as np
+
+    height, width = pixels.shape[:2]
+    out = mirrored.astype(np.float32)
+    radius = max(pad, 1)
+    top, bottom = _smooth(pixels[0], radius), _smooth(pixels[-1], radius)
+    left, right = _smooth(pixels[:, 0], radius), _smooth(pixels[:, -1], radius)
+
+    # 0 at the trim edge rising to 1 at the outer edge of the bleed
+    ramp = (np.arange(pad, 0, -1, dtype=np.float32) / pad)[:, None, None]
+    inner_x, inner_y = slice(pad, pad + width), slice(pad, pad + height)
+
+    out[:pad, inner_x] += (top[None] - out[:pad, inner_x]) * ramp
+    out[-pad:, inner_x] += (bottom[None] - out[-pad:, inner_x]) * ramp[::-1]
+    out[inner_y, :pad] += (left[:, None] - out[inner_y, :pad]) * ramp.transpose(1, 0, 2)
+    out[inner_y, -pad:] += (right[:, None] - out[inner_y, -pad:]) * ramp[::-1].transpose(1, 0, 2)
+
+    # Corners fade towards the colour where their two edges meet
+    corner_ramp = np.maximum(ramp, ramp.transpose(1, 0, 2))
+    for ys, xs, colour, weights in (
+        (slice(0, pad), slice(0, pad), (top[0] + left[0]) / 2, corner_ramp),
+        (slice(0, pad), slice(-pad, None), (top[-1] + right[0]) / 2, corner_ramp[:, ::-1]),
+        (slice(-pad, None), slice(0, pad), (bottom[0] + left[-1]) / 2, corner_ramp[::-1]),
+        (slice(-pad, None), slice(-pad, None), (bottom[-1] + right[-1]) / 2, corner_ramp[::-1, ::-1]),
+    ):
+        out[ys, xs] += (colour - out[ys, xs]) * weights
+    return np.clip(out + 0.5, 0, 255).astype(np.uint8)
+
+def bleed_image(image_path, bleed_mm, trim_width_mm, mode='mirror', cache_dir=None):
+    """Path of ``image_path`` with ``bleed_mm`` of bleed added, for a card ``trim_width_mm`` wide.
+
+    The bleed in pixels follows from the image's own width, so stand-ins such
+    as preview proxies get the same bleed relative to the card.
+    """
+    import numpy as np
+    from PIL import Image
+
+    cache_dir = cache_dir or user_cache_dir(BLEED_CACHE_DIR)
+    with Image.open(image_path) as img:
+        pad = round(bleed_mm * img.width / trim_width_mm)
+    key = (content_key(image_path), pad, mode)
+    with _lock:
+        bled_path = _bled.get(key)
+    if bled_path and os.path.exists(bled_path):
+        return bled_path
+
+    bled_path = os.path.join(cache_dir, f"bleed_{key[0][:16]}_{pad}_{mode}.png")
+    if not os.path.exists(bled_path):
+        with Image.open(image_path) as img:
+            info = {k: img.info[k] for k in ('dpi', 'icc_profile') if k in img.info}
+            pixels = np.asarray(img.convert('RGBA' if 'A' in img.getbands() else 'RGB'))
+        bled = Image.fromarray(extend_bleed(pixels, pad, mode))
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write under a unique name so concurrent renders never see a partial file
+        fd, temp_path = tempfile.mkstemp(suffix='.png', dir=cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            bled.save(f, format='PNG', compress_level=1, **info)
+        os.replace(temp_path, bled_path)
+
+    with _lock:
+        _bled[key] = bled_path
+    return bled_path
+
+def bleed_stage(image_path, layout, settings):
+    """The image to place in the sheet's bleed boxes, or the image itself when there is no bleed."""
+    if not settings.bleed_mm:
+        return image_path
+    trim_width = layout['card_height'] if layout['rotated'] else layout['card_width']
+    return bleed_image(image_path, settings.bleed_mm, trim_width, settings.bleed_mode)
@@ -0,0 +1,154 @@
+"""Optional colour stage that converts images to the press's output profile.
+
+Enabled by setting ``color_management.output_profile`` in config.json to an
+ICC profile, usually the press's CMYK profile. Images are converted from
+their embedded profile (sRGB when they have none) before they are placed on
+a sheet, and the output profile is embedded in the PDF as its output intent.
+
+An ImageCms transform is built once for each (source profile, output
+profile, intent) and reused. Converted images are cached on disk, keyed on
+the image's content hash and the transform, so an image is converted once
+per profile no matter how many sheets or sessions use it. The cache lives in
+the user's cache directory and is trimmed by ``config.prune_cache_dir``.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from business_logic.archive_sources import open_source
+from business_logic.content_hash import content_key
+from config import user_cache_dir
+
+RENDERING_INTENTS = ('perceptual', 'relative_colorimetric', 'saturation', 'absolute_colorimetric')
+
+COLOR_CACHE_DIR = 'color'  # Under the user's cache directory
+
+_transforms = {}
+_profiles = {}
+_converted = {}
+_lock = threading.Lock()
+
+def _profile_bytes(profile_path):
+    with _lock:
+        data = _profiles.get(profile_path)
+    if data is None:
+        with open(profile_path, 'rb') as f:
+            data = f.read()
+        with _lock:
+            _profiles[profile_path] = data
+    return data
+
+def _profile_key(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+def get_transform(source_profile, output_profile, intent):
+    """Cached transform from RGB in ``source_profile`` (ICC bytes, None for sRGB) to ``output_profile``.
+
+    Returns (transform, output mode).
+    """
+    from PIL import ImageCms
+
+    output_data = _profile_bytes(output_profile)
+    key = (_profile_key(source_profile) if source_profile else 'sRGB', _profile_key(output_data), intent)
+    with _lock:
+        cached = _transforms.get(key)
+    if cached:
+        return cached
+
+    if source_profile:
+        source = ImageCms.ImageCmsProfile(io.BytesIO(source_profile))
+    else:
+        source = ImageCms.createProfile('sRGB')
+    output = ImageCms.ImageCmsProfile(io.BytesIO(output_data))
+    output_mode = {'CMYK': 'CMYK', 'GRAY': 'L', 'Lab': 'LAB'}.get(output.profile.xcolor_space.strip(), 'RGB')
+    transform = ImageCms.buildTransform(source, output, 'RGB', output_mode,
+                                        renderingIntent=ImageCms.Intent(RENDERING_INTENTS.index(intent)))
+    with _lock:
+        _transforms[key] = (transform, output_mode)
+    return transform, output_mode
+
+def convert_image(image_path, output_profile, intent='perceptual', cache_dir=None):
+    """Path of ``image_path`` converted to ``output_profile``, converting it on first use."""
+    from PIL import Image
+
+    cache_dir = cache_dir or user_cache_dir(COLOR_CACHE_DIR)
+
+    transform_key = f"{_profile_key(_profile_bytes(output_profile))}_{intent}"
+    key = (content_key(image_path), transform_key)
+    with _lock:
+        converted_path = _converted.get(key)
+    if converted_path and os.path.exists(converted_path):
+        return converted_path
+
+    converted_path = os.path.join(cache_dir, f"color_{key[0][:16]}_{transform_key}.tif")
+    if not os.path.exists(converted_path):
+        with open_source(image_path) as f, Image.open(f) as img:
+            source_profile = img.info.get('icc_profile')
+            if 'A' in img.getbands() or img.mode == 'P':
+                # Output profiles have no alpha channel; flatten onto paper white
+                rgba = img.convert('RGBA')
+                rgb = Image.new('RGB', img.size, 'white')
+                rgb.paste(rgba, mask=rgba.getchannel('A'))
+            else:
+                rgb = img.convert('RGB')
+        transform, _ = get_transform(source_profile, output_profile, intent)
+        converted = transform.apply(rgb)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write under a unique name so concurrent conversions never see a partial file
+        fd, temp_path = tempfile.mkstemp(suffix='.tif', dir=cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            converted.save(f, format='TIFF', compression='tiff_adobe_deflate',
+                           icc_profile=_profile_bytes(output_profile), dpi=rgb.info.get('dpi', (300, 300)))
+        os.replace(temp_path, converted_path)
+
+    with _lock:
+        _converted[key] = converted_path
+    return converted_path
+
+def convert_images(image_paths, output_profile, intent='perceptual', cache_dir=None, workers=None):
+    """Convert many images on a thread pool; returns {image_path: converted_path}.
+
+    LittleCMS releases the GIL while transforming, so conversions run in parallel.
+    """
+    image_paths = list(dict.fromkeys(image_paths))
+    workers = min(workers or os.cpu_count() or 1, len(image_paths) or 1)
+    with ThreadPoolExecutor(workers) as executor:
+        converted = executor.map(lambda path: convert_image(path, output_profile, intent, cache_dir), image_paths)
+        return dict(zip(image_paths, converted))
+
+def prepare_images(image_paths, settings):
+    """Convert images for a job up front, in parallel, when the colour stage is enabled."""
+    if settings.output_profile:
+        convert_images(image_paths, settings.output_profile, settings.rendering_intent)
+
+def color_stage(image_path, settings):
+    """The image to place on a sheet: converted to the output profile, or unchanged."""
+    if not settings.output_profile:
+        return image_path
+    return convert_image(image_path, settings.output_profile, settings.rendering_intent)
+
+def embed_output_intent(pdf_path, output_profile, condition=None):
+    """Add ``output_profile`` to a PDF as its PDF/X output intent."""
+    import fitz
+    from PIL import ImageCms
+
+    data = _profile_bytes(output_profile)
+    profile = ImageCms.ImageCmsProfile(io.BytesIO(data))
+    components = {'CMYK': 4, 'GRAY': 1}.get(profile.profile.xcolor_space.strip(), 3)
+    condition = condition or ImageCms.getProfileDescription(profile).strip() or os.path.basename(output_profile)
+
+    with fitz.open(pdf_path) as doc:
+        profile_xref = doc.get_new_xref()
+        doc.update_object(profile_xref, f"<< /N {components} >>")
+        doc.update_stream(profile_xref, data)
+        intent_xref = doc.get_new_xref()
+        doc.update_object(intent_xref, (
+            f"<< /Type /OutputIntent /S /GTS_PDFX /OutputConditionIdentifier {fitz.get_pdf_str(condition)}"
+            f" /Info {fitz.get_pdf_str(condition)} /DestOutputProfile {profile_xref} 0 R >>"
+        ))
+        doc.xref_set_key(doc.pdf_catalog(), 'OutputIntents', f"[{intent_xref} 0 R]")
+        doc.saveIncr()
@@ -0,0 +1,185 @@
+"""Content hashes for imported images.
+
+Files are hashed through mmap with a fast non-cryptographic hash (xxHash
+when installed, BLAKE2b otherwise) on a thread pool; both hash
+implementations release the GIL on large buffers. Hashes are remembered
+in a path index keyed on device, inode, mtime and size, so an unchanged
+file is never read twice, and the same content reached through a copy,
+a symlink or a different path gets the same hash. Members of ZIP and TAR
+archives (see archive_sources) are hashed by streaming them from the archive;
+the members of a compressed TAR in one pass over it.
+"""
+import hashlib
+import json
+import mmap
+import os
+import tarfile
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import user_dir
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+HASH_INDEX_FILE = 'hash_index.json'  # In the per-user cache directory
+
+def _new_hasher():
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+def hash_file(path):
+    from business_logic import archive_sources
+
+    hasher = _new_hasher()
+    if archive_sources.is_archive_member(path):
+        return archive_sources.hash_member(path, hasher)
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+    return hasher.hexdigest()
+
+def _file_identity(path):
+    from business_logic.archive_sources import source_stat
+
+    stat = source_stat(path)
+    return [stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+def _still_exists(path):
+    # Only the archive itself is checked for a member, so pruning never opens archives
+    from business_logic.archive_sources import is_archive_member, split_archive_path
+
+    if is_archive_member(path):
+        path = split_archive_path(path)[0]
+    return os.path.exists(path)
+
+class HashIndex:
+    """Cached path -> content hash map, persisted between sessions.
+
+    Entries for files that no longer exist are dropped when the index is loaded.
+    Import workers save after every batch, so saves are serialized.
+    """
+    def __init__(self, index_file=None, workers=None):
+        self.index_file = index_file or os.path.join(user_dir('cache'), HASH_INDEX_FILE)
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_file, 'r') as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            entries = {}
+        self.entries = {path: entry for path, entry in entries.items() if _still_exists(path)}
+        self.dirty = len(self.entries) != len(entries)
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                entries = dict(self.entries)
+                self.dirty = False
+            fd, temp_path = tempfile.mkstemp(prefix='.hash_index-', suffix='.json', dir=os.path.dirname(self.index_file))
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(entries, f)
+                os.replace(temp_path, self.index_file)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+    def cached_hash(self, path):
+        key = os.path.realpath(path)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry['identity'] == _file_identity(key):
+            return entry['hash']
+        return None
+
+    def get_hash(self, path):
+        key = os.path.realpath(path)
+        identity = _file_identity(key)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry['identity'] == identity:
+            return entry['hash']
+
+        content_hash = hash_file(key)
+        with self.lock:
+            self.entries[key] = {'identity': identity, 'hash': content_hash}
+            self.dirty = True
+        return content_hash
+
+    def get_hashes(self, paths):
+        """Hashes for many paths, reading uncached files in parallel. Missing files map to None."""
+        def safe_hash(path):
+            try:
+                return self.get_hash(path)
+            except OSError:
+                return None
+
+        from business_logic.archive_sources import is_compressed_tar_member, split_archive_path
+
+        paths = list(paths)
+        uncached = [path for path in paths if self._needs_hash(path)]
+        # Each compressed TAR is read in one pass on one worker, as reading its
+        # members out of order would decompress it from the start each time
+        tars = {}
+        for path in uncached:
+            if is_compressed_tar_member(path):
+                tars.setdefault(split_archive_path(path)[0], []).append(path)
+        files = [path for path in uncached if not is_compressed_tar_member(path)]
+        if len(files) + len(tars) > 1:
+            with ThreadPoolExecutor(min(self.workers, len(files) + len(tars))) as executor:
+                futures = [executor.submit(self._hash_tar, archive_path, members) for archive_path, members in tars.items()]
+                list(executor.map(safe_hash, files))
+                for future in futures:
+                    future.result()
+        else:
+            for archive_path, members in tars.items():
+                self._hash_tar(archive_path, members)
+        return {path: safe_hash(path) for path in paths}
+
+    def _hash_tar(self, archive_path, paths):
+        from business_logic.archive_sources import hash_tar_members
+
+        try:
+            hashes = hash_tar_members(archive_path, paths, _new_hasher)
+        except (OSError, tarfile.TarError) as e:
+            print(f"Error reading {archive_path}: {e}")
+            return
+        with self.lock:
+            for path, (stat, content_hash) in hashes.items():
+                self.entries[os.path.realpath(path)] = {'identity': list(stat), 'hash': content_hash}
+            self.dirty = True
+
+    def _needs_hash(self, path):
+        try:
+            return self.cached_hash(path) is None
+        except OSError:
+            return False
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+def get_hash_index():
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = HashIndex()
+        return _default_index
+
+def content_key(path):
+    """Content hash of a file, for use as a cache key wherever its renders are cached."""
+    return get_hash_index().get_hash(path)
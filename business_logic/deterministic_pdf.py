@@ -0,0 +1,49 @@
+"""Byte-reproducible PDF output, for hash-based dedupe, incremental re-export and diffing outputs.
+
+reportlab stamps the creation time into every file and MuPDF a random
+document ID. ``make_deterministic`` rewrites a finished PDF with MuPDF
+without either: the dates are dropped and objects renumbered in document
+order. The document ID is then derived from a hash of the resulting bytes,
+so identical inputs and settings give identical files, and different
+outputs still get different IDs.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+ID_PLACEHOLDER = '0' * 32
+_PLACEHOLDER_BYTES = f'/ID[<{ID_PLACEHOLDER}><{ID_PLACEHOLDER}>]'.encode()
+
+def make_deterministic(pdf_path):
+    import fitz
+
+    fd, temp_path = tempfile.mkstemp(suffix='.pdf', dir=os.path.dirname(os.path.abspath(pdf_path)))
+    os.close(fd)
+    try:
+        with fitz.open(pdf_path) as document:
+            metadata = {key: value for key, value in document.metadata.items() if key not in ('format', 'encryption')}
+            document.set_metadata(dict(metadata, creationDate='', modDate=''))
+            # A fixed-width placeholder, overwritten in place below without moving any offsets
+            document.xref_set_key(-1, 'ID', f'[<{ID_PLACEHOLDER}><{ID_PLACEHOLDER}>]')
+            document.save(temp_path, garbage=3, deflate=True, no_new_id=True)
+
+        with open(temp_path, 'rb') as f:
+            data = f.read()
+        if data.count(_PLACEHOLDER_BYTES) != 1:
+            raise ValueError(f"Could not place a document ID in {pdf_path}")
+        document_id = hashlib.blake2b(data, digest_size=16).hexdigest().upper()
+        with open(temp_path, 'wb') as f:
+            f.write(data.replace(_PLACEHOLDER_BYTES, f'/ID[<{document_id}><{document_id}>]'.encode()))
+        # Keep the original's permissions rather than mkstemp's owner-only mode
+        shutil.copymode(pdf_path, temp_path)
+        os.replace(temp_path, pdf_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def deterministic_stage(pdf_paths, settings):
+    """Make finished outputs reproducible when the job's settings ask for it."""
+    if settings.deterministic_pdf:
+        for pdf_path in pdf_paths:
+            make_deterministic(pdf_path)
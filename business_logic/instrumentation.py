@@ -0,0 +1,30 @@
+"""Process-wide performance counters.
+
+Counters accumulate (``increment``) and gauges hold the latest value
+(``set_value``). Everything is keyed by a dotted name such as
+``render.frames`` and can be read back as a plain dict with ``snapshot``.
+"""
+import threading
+
+_lock = threading.Lock()
+_metrics = {}
+
+def increment(name, amount=1):
+    with _lock:
+        _metrics[name] = _metrics.get(name, 0) + amount
+
+def set_value(name, value):
+    with _lock:
+        _metrics[name] = value
+
+def get(name, default=0):
+    with _lock:
+        return _metrics.get(name, default)
+
+def snapshot():
+    with _lock:
+        return dict(_metrics)
+
+def reset():
+    with _lock:
+        _metrics.clear()
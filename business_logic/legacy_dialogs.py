@@ -0,0 +1,25 @@
+"""Tkinter dialogs from the original command-line workflow.
+
+Kept out of pdf_operations so that importing the PDF code never pulls in tkinter.
+"""
+from tkinter import Tk, filedialog, simpledialog
+from config import get_setting
+
+def select_image():
+    root = Tk()
+    root.withdraw()
+    file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp")])
+    return file_path
+
+def select_output_folder():
+    root = Tk()
+    root.withdraw()
+    folder_path = filedialog.askdirectory()
+    return folder_path
+
+def select_paper_size():
+    root = Tk()
+    root.withdraw()
+    sizes = list(get_setting('paper_sizes').keys())
+    choice = simpledialog.askinteger("Paper Size", "Select paper size:\n" + "\n".join([f"{i+1}. {size}" for i, size in enumerate(sizes)]), minvalue=1, maxvalue=len(sizes))
+    return list(get_setting('paper_sizes').keys())[choice-1] if choice else None
@@ -0,0 +1,186 @@
+"""Write-behind output stage for slow or network destinations, such as a share on the print server.
+
+Outputs are rendered to local scratch and handed to ``OutputUploader.submit``,
+which returns at once. Worker threads then copy each file into its
+destination under a temporary name and rename it into place, so the
+destination only ever holds complete files. Failed copies are retried with
+backoff, and the local file is kept if every attempt fails; failure
+listeners are told which file was kept where, so the UI can say so.
+
+fsync policies, from ``output.fsync`` in config.json:
+
+never    leave flushing to the operating system
+file     fsync each file before it is renamed into place
+always   also fsync the destination directory after the rename
+
+Throughput and queue depth are reported through instrumentation under
+``output.*``.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from business_logic import instrumentation
+from config import NEW_FILE_MODE, get_setting
+
+FSYNC_POLICIES = ('never', 'file', 'always')
+COPY_CHUNK_BYTES = 1024 * 1024
+
+def _copy(src, dst):
+    # Plain chunked copy; the destination may be a network share without a fast path
+    copied = 0
+    while chunk := src.read(COPY_CHUNK_BYTES):
+        dst.write(chunk)
+        copied += len(chunk)
+    return copied
+
+def _fsync_dir(path):
+    # Directories cannot be opened for fsync on every platform
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class OutputUploader:
+    def __init__(self, max_pending=64, workers=2, retries=3, retry_delay=0.5, fsync='file', scratch_root=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.fsync = fsync
+        self.scratch_root = scratch_root or tempfile.mkdtemp(prefix='postcard-output-')
+        os.makedirs(self.scratch_root, exist_ok=True)
+        # Submitting blocks once max_pending files are waiting, so scratch use stays bounded
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='output-uploader')
+        self.changed = threading.Condition()
+        self.pending = 0
+        self.failures = []  # (kept local path, destination dir, error) per file that could not be written
+        self.failure_listeners = []
+
+    def add_failure_listener(self, callback):
+        """Call ``callback(local_path, destination_dir, error)`` from a worker thread whenever a file is given up on."""
+        self.failure_listeners.append(callback)
+
+    def scratch_dir(self):
+        """A fresh local directory to render one batch of outputs into."""
+        return tempfile.mkdtemp(dir=self.scratch_root)
+
+    def submit(self, local_path, destination_dir, name=None):
+        """Queue ``local_path`` to be moved into ``destination_dir``, as ``name`` if given rather than
+        its own file name. Returns a future of its upload report."""
+        self.slots.acquire()
+        with self.changed:
+            self.pending += 1
+            instrumentation.set_value('output.pending', self.pending)
+        try:
+            return self.executor.submit(self._upload, local_path, destination_dir, name)
+        except BaseException:
+            self._finished()
+            raise
+
+    def _finished(self):
+        with self.changed:
+            self.pending -= 1
+            instrumentation.set_value('output.pending', self.pending)
+            self.changed.notify_all()
+        self.slots.release()
+
+    def _upload(self, local_path, destination_dir, name=None):
+        try:
+            name = name or os.path.basename(local_path)
+            start = time.perf_counter()
+            for attempt in range(self.retries + 1):
+                try:
+                    size = self._copy_into(local_path, destination_dir, name)
+                    break
+                except OSError as e:
+                    if attempt == self.retries:
+                        print(f"Could not write {name} to {destination_dir}, kept at {local_path}: {e}")
+                        instrumentation.increment('output.failures')
+                        with self.changed:
+                            self.failures.append((local_path, destination_dir, str(e)))
+                        for listener in list(self.failure_listeners):
+                            listener(local_path, destination_dir, str(e))
+                        raise
+                    instrumentation.increment('output.retries')
+                    time.sleep(self.retry_delay * 2 ** attempt)
+            os.remove(local_path)
+
+            seconds = time.perf_counter() - start
+            instrumentation.increment('output.files')
+            instrumentation.increment('output.bytes', size)
+            instrumentation.set_value('output.last_mb_per_second', size / 1e6 / seconds if seconds else 0)
+            return {
+                'path': os.path.join(destination_dir, name),
+                'bytes': size,
+                'seconds': seconds,
+                'attempts': attempt + 1,
+            }
+        finally:
+            self._finished()
+
+    def _copy_into(self, local_path, destination_dir, name):
+        final_path = os.path.join(destination_dir, name)
+        fd, partial_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.partial', dir=destination_dir)
+        try:
+            with open(local_path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+                size = _copy(src, dst)
+                if self.fsync != 'never':
+                    dst.flush()
+                    os.fsync(dst.fileno())
+            os.chmod(partial_path, NEW_FILE_MODE)
+            os.replace(partial_path, final_path)
+        except BaseException:
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+            raise
+        if self.fsync == 'always':
+            _fsync_dir(destination_dir)
+        return size
+
+    def wait(self):
+        """Block until every queued file has been uploaded or has failed."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.pending == 0)
+
+    def close(self):
+        """Finish queued uploads. Returns the failures, whose local files are kept."""
+        self.executor.shutdown(wait=True)
+        if not self.failures:
+            shutil.rmtree(self.scratch_root, ignore_errors=True)
+        return list(self.failures)
+
+_default_uploader = None
+_default_lock = threading.Lock()
+
+def get_uploader():
+    """The process-wide uploader, configured from the ``output`` section of config.json."""
+    global _default_uploader
+    with _default_lock:
+        if _default_uploader is None:
+            _default_uploader = OutputUploader(
+                max_pending=get_setting('output.max_pending', 64),
+                workers=get_setting('output.workers', 2),
+                retries=get_setting('output.retries', 3),
+                fsync=get_setting('output.fsync', 'file'),
+            )
+        return _default_uploader
+
+def shutdown_uploader():
+    """Finish any uploads still queued. Called on exit; returns the failures of the whole session."""
+    global _default_uploader
+    with _default_lock:
+        uploader, _default_uploader = _default_uploader, None
+    if uploader:
+        return uploader.close()
+    return []
@@ -0,0 +1,61 @@
+"""Strategies for matching front images to back images.
+
+one_to_one   the n-th front with the n-th back; counts must match
+shared_back  every front with a single back, e.g. one address side for all
+cyclic       fronts in order with the backs repeated as often as needed
+manifest     pairs listed in a CSV file with one "front,back" row per pair
+"""
+import csv
+import os
+
+from business_logic.archive_sources import source_exists
+
+PAIRING_MODES = ('one_to_one', 'shared_back', 'cyclic', 'manifest')
+
+def plan_pairs(front_images, back_images, mode='one_to_one', manifest=None):
+    """List of (front, back) pairs for the given mode. Raises ValueError if they cannot be paired."""
+    if mode == 'manifest':
+        if not manifest:
+            raise ValueError("Manifest pairing needs a manifest file")
+        return load_pairing_manifest(manifest)
+
+    if not front_images or not back_images:
+        raise ValueError("Both front and back images are required for pairing")
+
+    if mode == 'one_to_one':
+        if len(front_images) != len(back_images):
+            raise ValueError(f"Got {len(front_images)} fronts but {len(back_images)} backs; "
+                             "select matching counts or another pairing mode")
+        return list(zip(front_images, back_images))
+    if mode == 'shared_back':
+        if len(back_images) != 1:
+            raise ValueError(f"Shared back pairing needs exactly one back, got {len(back_images)}")
+        return [(front, back_images[0]) for front in front_images]
+    if mode == 'cyclic':
+        return [(front, back_images[i % len(back_images)]) for i, front in enumerate(front_images)]
+    raise ValueError(f"Unknown pairing mode: {mode}")
+
+def load_pairing_manifest(manifest_path):
+    """Pairs from a CSV manifest. Relative paths are resolved against the manifest's folder.
+
+    Raises ValueError naming the line of a malformed row or of a file that does not exist.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    pairs = []
+    with open(manifest_path, newline='') as f:
+        for line_number, row in enumerate(csv.reader(f), 1):
+            row = [cell.strip() for cell in row]
+            if not any(row) or row[0].startswith('#'):
+                continue
+            if line_number == 1 and [cell.lower() for cell in row[:2]] == ['front', 'back']:
+                continue
+            if len(row) < 2 or not row[0] or not row[1]:
+                raise ValueError(f"{manifest_path}:{line_number}: expected a front and a back path")
+            pair = tuple(os.path.join(base_dir, cell) for cell in row[:2])
+            for path in pair:
+                if not source_exists(path):
+                    raise ValueError(f"{manifest_path}:{line_number}: image file not found: {path}")
+            pairs.append(pair)
+    if not pairs:
+        raise ValueError(f"{manifest_path} lists no pairs")
+    return pairs
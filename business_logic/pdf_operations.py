@@ -1,16 +1,20 @@
-import os
-import itertools
-from PyPDF2 import PdfReader, PdfWriter
+import dataclasses
 import os
 import math
-from PIL import Image
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm, inch
-from reportlab.lib.colors import black
-from tkinter import Tk, filedialog, simpledialog
-from config import get_setting
-
-def combine_pdfs(front_pdf, back_pdf, output_path):
+from config import get_setting, resolve_render_settings
+from business_logic.archive_sources import local_path, open_source, source_exists
+from business_logic.content_hash import content_key
+from business_logic.pairing import plan_pairs
+
+# PyPDF2, reportlab and Pillow are imported inside the functions that use them
+# so that importing this module (for layout maths, the CLI or the GUI) stays cheap.
+
+def combine_pdfs(front_pdf, back_pdf, output_path, backend=None):
+    if (backend or get_setting('pdf_backend', 'reportlab')) == 'pymupdf':
+        return _combine_pdfs_pymupdf(front_pdf, back_pdf, output_path)
+
+    from PyPDF2 import PdfReader, PdfWriter
+
     pdf_writer = PdfWriter()
     pdf_reader1 = PdfReader(front_pdf)
     pdf_reader2 = PdfReader(back_pdf)
@@ -24,45 +28,74 @@ def combine_pdfs(front_pdf, back_pdf, output_path):
     with open(output_path, 'wb') as fh:
         pdf_writer.write(fh)
 
-def pair_pdfs(front_pdfs, back_pdfs, output_folder):
+def _combine_pdfs_pymupdf(front_pdf, back_pdf, output_path):
+    import fitz
+
+    with fitz.open() as paired, fitz.open(front_pdf) as front, fitz.open(back_pdf) as back:
+        paired.insert_pdf(front, from_page=0, to_page=0)
+        paired.insert_pdf(back, from_page=0, to_page=0)
+        paired.save(output_path, garbage=3, deflate=True)
+
+def pair_pdfs(front_pdfs, back_pdfs, output_folder, backend=None, mode='one_to_one', manifest=None):
+    return combine_pairs(plan_pairs(front_pdfs, back_pdfs, mode, manifest), output_folder, backend)
+
+def combine_pairs(pairs, output_folder, backend=None, names=None):
+    """Combine each (front_pdf, back_pdf) into a two-page PDF. ``names`` optionally
+    gives the (front, back) names to build each output file name from."""
     os.makedirs(output_folder, exist_ok=True)
     paired_pdfs = []
 
-    for front_pdf, back_pdf in zip(front_pdfs, back_pdfs):
-        front_name = os.path.basename(front_pdf)
-        back_name = os.path.basename(back_pdf)
-        output_filename = os.path.join(output_folder, f'{front_name}&{back_name}.pdf')
-        combine_pdfs(front_pdf, back_pdf, output_filename)
+    for i, (front_pdf, back_pdf) in enumerate(pairs):
+        front_name, back_name = (names or pairs)[i]
+        front_name = os.path.splitext(os.path.basename(front_name))[0]
+        back_name = os.path.splitext(os.path.basename(back_name))[0]
+        output_filename = os.path.join(output_folder, f'{i + 1:03d}_{front_name}&{back_name}.pdf')
+        combine_pdfs(front_pdf, back_pdf, output_filename, backend)
         paired_pdfs.append(output_filename)
 
     return paired_pdfs
 
-def select_image():
-    root = Tk()
-    root.withdraw()
-    file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp")])
-    return file_path
-
-def select_output_folder():
-    root = Tk()
-    root.withdraw()
-    folder_path = filedialog.askdirectory()
-    return folder_path
-
-def select_paper_size():
-    root = Tk()
-    root.withdraw()
-    sizes = list(get_setting('paper_sizes').keys())
-    choice = simpledialog.askinteger("Paper Size", "Select paper size:\n" + "\n".join([f"{i+1}. {size}" for i, size in enumerate(sizes)]), minvalue=1, maxvalue=len(sizes))
-    return list(get_setting('paper_sizes').keys())[choice-1] if choice else None
-
-def calculate_optimal_layout(card_width, card_height, paper_width, paper_height, margin, min_spacing=1):
+def render_pairs(pairs, paper_size_name, output_folder, temp_dir, settings=None):
+    """Render and combine (front_image, back_image) pairs into paired PDFs.
+
+    Each distinct image is rendered once, however many pairs it appears in,
+    so a back shared by every front costs a single render.
+    """
+    from business_logic.color_management import embed_output_intent, prepare_images
+    from business_logic.deterministic_pdf import deterministic_stage
+    from business_logic.pdf_optimizer import optimize_stage
+
+    settings = settings or resolve_render_settings()
+    prepare_images([image for pair in pairs for image in pair], settings)
+    # The sheets are intermediates; only the combined outputs are made deterministic
+    sheet_settings = dataclasses.replace(settings, deterministic_pdf=False)
+    rendered = {}
+
+    def render_side(image_path):
+        key = content_key(image_path)
+        if key not in rendered:
+            sheet_pdf = os.path.join(temp_dir, f'sheet_{key}.pdf')
+            create_postcard_pdf(image_path, sheet_pdf, paper_size_name, settings=sheet_settings)
+            rendered[key] = sheet_pdf
+        return rendered[key]
+
+    sheet_pairs = [(render_side(front), render_side(back)) for front, back in pairs]
+    paired_pdfs = combine_pairs(sheet_pairs, output_folder, settings.pdf_backend, names=pairs)
+    if settings.output_profile:
+        for paired_pdf in paired_pdfs:
+            embed_output_intent(paired_pdf, settings.output_profile)
+    deterministic_stage(paired_pdfs, settings)
+    optimize_stage(paired_pdfs, settings)
+    return paired_pdfs
+
+def calculate_optimal_layout(card_width, card_height, paper_width, paper_height, margin, min_spacing=1, bleed=0):
     usable_width = paper_width - 2 * margin
     usable_height = paper_height - 2 * margin
 
     def calc_fit(w, h):
-        cols = math.floor((usable_width + min_spacing) / (w + min_spacing))
-        rows = math.floor((usable_height + min_spacing) / (h + min_spacing))
+        # Each card takes up its bleed box, the card plus bleed on every side
+        cols = math.floor((usable_width + min_spacing) / (w + 2 * bleed + min_spacing))
+        rows = math.floor((usable_height + min_spacing) / (h + 2 * bleed + min_spacing))
         return cols * rows, cols, rows
 
     # Calculate fits for both orientations
@@ -82,8 +115,8 @@ def calculate_optimal_layout(card_width, card_height, paper_width, paper_height,
         rows = standard_rows
         rotated = False
 
-    x_spacing = (usable_width - cols * card_width) / (cols + 1)
-    y_spacing = (usable_height - rows * card_height) / (rows + 1)
+    x_spacing = (usable_width - cols * (card_width + 2 * bleed)) / (cols + 1)
+    y_spacing = (usable_height - rows * (card_height + 2 * bleed)) / (rows + 1)
 
     return {
         'total': total,
@@ -93,44 +126,25 @@ def calculate_optimal_layout(card_width, card_height, paper_width, paper_height,
         'card_height': card_height,
         'x_spacing': x_spacing,
         'y_spacing': y_spacing,
-        'rotated': rotated
+        'rotated': rotated,
+        'bleed': bleed
     }
-def create_postcard_pdf(image_path, output_pdf, paper_size_name):
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image file not found: {image_path}")
-
-    with Image.open(image_path) as img:
-        DPI = get_setting('user_modifiable.default_dpi')
-        print(DPI)
-        original_card_width = img.width * 25.4 / DPI
-        original_card_height = img.height * 25.4 / DPI
-
-    paper_width, paper_height = get_setting('paper_sizes')[paper_size_name]
-    margin = 6.35  # 0.25 inch margin in mm
-
-    print(f"Paper size: {paper_width}mm x {paper_height}mm")
-    print(f"Original card size: {original_card_width}mm x {original_card_height}mm")
-
-    layout = calculate_optimal_layout(original_card_width, original_card_height, paper_width, paper_height, margin, min_spacing=1)
 
-    print(f"Layout: {layout}")
+def calculate_sheet_geometry(layout, paper_width, paper_height, margin):
+    """Card slots and cutting marks for a layout, in mm from the bottom-left corner of the page.
 
-    c = canvas.Canvas(output_pdf, pagesize=(paper_width*mm, paper_height*mm))
-    
-    def place_image(x, y, width, height, rotated):
-        print(f"Placing image at: x={x}mm, y={y}mm, width={width}mm, height={height}mm, rotated={rotated}")
-        if rotated:
-            c.saveState()
-            c.translate((x+width)*mm, y*mm)
-            c.rotate(90)
-            c.drawImage(image_path, 0, 0, width=height*mm, height=width*mm, preserveAspectRatio=True)
-            c.restoreState()
-        else:
-            c.drawImage(image_path, x*mm, y*mm, width=width*mm, height=height*mm, preserveAspectRatio=True)
+    ``slots`` are the trimmed cards and ``image_slots`` the boxes their images
+    are drawn in, which include the bleed. Without bleed, cards are marked with
+    dashed ``guides`` in the margins; with bleed, with solid ``crop_marks`` at
+    every trim line instead.
+    """
+    bleed = layout.get('bleed', 0)
+    box_width = layout['card_width'] + 2 * bleed
+    box_height = layout['card_height'] + 2 * bleed
 
     # Calculate total width and height of the layout
-    total_width = layout['cols'] * layout['card_width'] + (layout['cols'] - 1) * layout['x_spacing']
-    total_height = layout['rows'] * layout['card_height'] + (layout['rows'] - 1) * layout['y_spacing']
+    total_width = layout['cols'] * box_width + (layout['cols'] - 1) * layout['x_spacing']
+    total_height = layout['rows'] * box_height + (layout['rows'] - 1) * layout['y_spacing']
 
     # Calculate starting positions to center the layout
     x_start = (paper_width - total_width) / 2
@@ -139,31 +153,117 @@ def create_postcard_pdf(image_path, output_pdf, paper_size_name):
     print(f"Layout dimensions: {total_width}mm x {total_height}mm")
     print(f"Starting position: x={x_start}mm, y={y_start}mm")
 
-    # Place images
+    slots = []
+    image_slots = []
     for row in range(layout['rows']):
         for col in range(layout['cols']):
-            x = x_start + col * (layout['card_width'] + layout['x_spacing'])
-            y = paper_height - (y_start + (row + 1) * layout['card_height'] + row * layout['y_spacing'])
-            place_image(x, y, layout['card_width'], layout['card_height'], layout['rotated'])
-
-    # Add guidelines
-    c.setStrokeColor(black)
-    c.setLineWidth(0.5)
-    c.setDash(6, 3)
-    
-    # Vertical guidelines
-    for i in range(layout['cols'] + 1):
-        x = x_start + i * (layout['card_width'] + layout['x_spacing'])
-        c.line(x*mm, 0, x*mm, margin*mm)  # Bottom
-        c.line(x*mm, paper_height*mm, x*mm, (paper_height - margin)*mm)  # Top
-    
-    # Horizontal guidelines
-    for i in range(layout['rows'] + 1):
-        y = paper_height - (y_start + i * (layout['card_height'] + layout['y_spacing']))
-        c.line(0, y*mm, margin*mm, y*mm)  # Left
-        c.line(paper_width*mm, y*mm, (paper_width - margin)*mm, y*mm)  # Right
-    
-    # Save the PDF
-    c.save()
+            x = x_start + col * (box_width + layout['x_spacing'])
+            y = paper_height - (y_start + (row + 1) * box_height + row * layout['y_spacing'])
+            slots.append((x + bleed, y + bleed, layout['card_width'], layout['card_height']))
+            image_slots.append((x, y, box_width, box_height))
+
+    guides = []
+    crop_marks = []
+    if bleed:
+        crop_marks = calculate_crop_marks(slots, x_start, paper_height - y_start - total_height,
+                                          total_width, total_height, paper_width, paper_height)
+    else:
+        # Vertical guidelines
+        for i in range(layout['cols'] + 1):
+            x = x_start + i * (layout['card_width'] + layout['x_spacing'])
+            guides.append((x, 0, x, margin))  # Bottom
+            guides.append((x, paper_height, x, paper_height - margin))  # Top
+
+        # Horizontal guidelines
+        for i in range(layout['rows'] + 1):
+            y = paper_height - (y_start + i * (layout['card_height'] + layout['y_spacing']))
+            guides.append((0, y, margin, y))  # Left
+            guides.append((paper_width, y, paper_width - margin, y))  # Right
+
+    return {
+        'paper_width': paper_width,
+        'paper_height': paper_height,
+        'slots': slots,
+        'image_slots': image_slots,
+        'guides': guides,
+        'crop_marks': crop_marks,
+        'rotated': layout['rotated']
+    }
+
+CROP_MARK_OFFSET = 2  # Gap in mm between the printed area and a crop mark
+CROP_MARK_LENGTH = 5
+
+def calculate_crop_marks(slots, left, bottom, width, height, paper_width, paper_height):
+    """Crop marks extending every trim line out past the printed area, clipped to the page."""
+    trim_xs = sorted({round(x, 4) for x, _, w, _ in slots} | {round(x + w, 4) for x, _, w, _ in slots})
+    trim_ys = sorted({round(y, 4) for _, y, _, h in slots} | {round(y + h, 4) for _, y, _, h in slots})
+    marks = []
+
+    def add_mark(start, direction, limit, make_line):
+        end = start + direction * CROP_MARK_LENGTH
+        end = min(end, limit) if direction > 0 else max(end, limit)
+        if (end - start) * direction > 0:
+            marks.append(make_line(start, end))
+
+    for x in trim_xs:
+        add_mark(bottom - CROP_MARK_OFFSET, -1, 0, lambda y1, y2: (x, y1, x, y2))
+        add_mark(bottom + height + CROP_MARK_OFFSET, 1, paper_height, lambda y1, y2: (x, y1, x, y2))
+    for y in trim_ys:
+        add_mark(left - CROP_MARK_OFFSET, -1, 0, lambda x1, x2: (x1, y, x2, y))
+        add_mark(left + width + CROP_MARK_OFFSET, 1, paper_width, lambda x1, x2: (x1, y, x2, y))
+    return marks
+
+def layout_postcard_sheet(image_path, paper_size_name, settings=None):
+    from PIL import Image
+
+    settings = settings or resolve_render_settings()
+    if not source_exists(image_path):
+        raise FileNotFoundError(f"Image file not found: {image_path}")
+
+    with open_source(image_path) as f, Image.open(f) as img:
+        original_card_width = img.width * 25.4 / settings.dpi
+        original_card_height = img.height * 25.4 / settings.dpi
+
+    paper_width, paper_height = settings.paper_size(paper_size_name)
+    margin = settings.margin_mm
+
+    print(f"Paper size: {paper_width}mm x {paper_height}mm")
+    print(f"Original card size: {original_card_width}mm x {original_card_height}mm")
+
+    layout = calculate_optimal_layout(original_card_width, original_card_height, paper_width, paper_height, margin,
+                                      min_spacing=1, bleed=settings.bleed_mm)
+
+    print(f"Layout: {layout}")
+
+    return layout, calculate_sheet_geometry(layout, paper_width, paper_height, margin)
+
+def create_postcard_pdf(image_path, output_pdf, paper_size_name, backend=None, draw_image_path=None, settings=None):
+    """Lay out one sheet of postcards. ``draw_image_path`` draws a stand-in
+    (such as a preview proxy) in place of the image the layout is sized from.
+
+    ``settings`` is the job's RenderSettings; callers rendering several sheets
+    should resolve it once and pass it to every call. When it names an output
+    profile the image goes through the colour stage first; stand-ins are drawn
+    as they are, and their sheets are not made deterministic.
+    """
+    from business_logic.bleed import bleed_stage
+    from business_logic.color_management import color_stage, embed_output_intent
+    from business_logic.deterministic_pdf import deterministic_stage
+    from business_logic.sheet_writers import get_sheet_writer
+
+    settings = settings or resolve_render_settings()
+    if not draw_image_path:
+        # The writers take file names, so an archive member is copied out once here
+        image_path = local_path(image_path)
+    layout, geometry = layout_postcard_sheet(image_path, paper_size_name, settings)
+
+    writer = get_sheet_writer(backend or settings.pdf_backend)(output_pdf)
+    sheet_image = bleed_stage(draw_image_path or image_path, layout, settings)
+    writer.add_sheet(sheet_image if draw_image_path else color_stage(sheet_image, settings), geometry)
+    writer.close()
+    if not draw_image_path:
+        if settings.output_profile:
+            embed_output_intent(output_pdf, settings.output_profile)
+        deterministic_stage([output_pdf], settings)
     print(f"PDF saved: {output_pdf}")
-    return layout['total']
\ No newline at end of file
+    return layout['total']
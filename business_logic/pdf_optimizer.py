@@ -0,0 +1,98 @@
+"""Optional post-pass that shrinks finished PDFs before they go to the print server.
+
+Each file is rewritten with identical objects merged (so an image embedded
+once per page or per sheet is stored once), unused objects dropped, streams
+deflated and small objects packed into object streams. Linearization needs
+the ``qpdf`` command line tool, as MuPDF no longer writes linearized files;
+without it, or if it fails, the file is left unlinearized and the report
+says why.
+
+Files are replaced in place and each optimization returns a report of the
+size and time it took.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+def _count_images(document):
+    return sum(1 for xref in range(1, document.xref_length())
+               if document.xref_get_key(xref, 'Subtype')[1] == '/Image')
+
+def optimize_pdf(pdf_path, linearize=False):
+    """Optimize ``pdf_path`` in place. Returns a dict with sizes, image counts and the time taken."""
+    import fitz
+
+    start = time.perf_counter()
+    before_bytes = os.path.getsize(pdf_path)
+    qpdf = shutil.which('qpdf') if linearize else None
+    linearize_error = None
+    if linearize and not qpdf:
+        linearize_error = "qpdf not found"
+        print(f"qpdf not found, {pdf_path} will not be linearized")
+
+    fd, temp_path = tempfile.mkstemp(suffix='.pdf', dir=os.path.dirname(os.path.abspath(pdf_path)))
+    os.close(fd)
+    try:
+        with fitz.open(pdf_path) as document:
+            images_before = _count_images(document)
+            # garbage=4 also merges objects with identical streams, such as repeated images;
+            # qpdf writes its own object streams when it linearizes. The document ID is
+            # kept, so deterministic outputs stay deterministic.
+            document.save(temp_path, garbage=4, deflate=True, use_objstms=0 if qpdf else 1, no_new_id=True)
+        if qpdf:
+            linear_path = temp_path + '.linear'
+            try:
+                subprocess.run([qpdf, '--linearize', '--object-streams=generate', '--deterministic-id', temp_path, linear_path],
+                               check=True, capture_output=True)
+                os.replace(linear_path, temp_path)
+            except subprocess.CalledProcessError as e:
+                # The optimized file is still good, it is just not linearized
+                linearize_error = e.stderr.decode(errors='replace').strip() or f"qpdf exited with status {e.returncode}"
+                print(f"qpdf failed, {pdf_path} will not be linearized: {linearize_error}")
+                if os.path.exists(linear_path):
+                    os.remove(linear_path)
+        with fitz.open(temp_path) as document:
+            images_after = _count_images(document)
+        # mkstemp files are private to their owner; the rewritten file keeps the original's mode
+        shutil.copymode(pdf_path, temp_path)
+        os.replace(temp_path, pdf_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    report = {
+        'path': pdf_path,
+        'before_bytes': before_bytes,
+        'after_bytes': os.path.getsize(pdf_path),
+        'images_before': images_before,
+        'images_after': images_after,
+        'linearized': bool(qpdf) and not linearize_error,
+        'linearize_error': linearize_error,
+        'seconds': time.perf_counter() - start,
+    }
+    print(f"Optimized {pdf_path}: {before_bytes} -> {report['after_bytes']} bytes "
+          f"in {report['seconds'] * 1000:.0f} ms")
+    return report
+
+def optimize_pdfs(pdf_paths, linearize=False, workers=None):
+    """Optimize several PDFs on a process pool; MuPDF holds the GIL, so threads would not overlap.
+
+    Returns one report per file, in order.
+    """
+    import multiprocessing
+
+    pdf_paths = list(pdf_paths)
+    workers = min(workers or os.cpu_count() or 1, len(pdf_paths) or 1)
+    if workers == 1:
+        return [optimize_pdf(path, linearize) for path in pdf_paths]
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return list(executor.map(optimize_pdf, pdf_paths, [linearize] * len(pdf_paths)))
+
+def optimize_stage(pdf_paths, settings):
+    """Optimize finished outputs when the job's settings ask for it; otherwise returns no reports."""
+    if not settings.optimize_pdf:
+        return []
+    return optimize_pdfs(pdf_paths, settings.linearize_pdf)
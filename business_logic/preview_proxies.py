@@ -0,0 +1,84 @@
+"""Downsampled proxy images for fast, progressively refined previews.
+
+A preview is first drawn from a small proxy of each image and then refined
+through larger proxies up to the ``preview_quality`` setting, where 'high'
+means the original image. Proxies are written once to the preview cache
+directory and reused for the rest of the session.
+"""
+import os
+import tempfile
+import threading
+
+from business_logic.archive_sources import local_path, open_source
+from business_logic.content_hash import content_key
+
+PREVIEW_QUALITIES = ('low', 'medium', 'high')
+
+# Longest edge in pixels of the proxy used at each quality; None is the original image
+PROXY_MAX_EDGE = {
+    'low': 384,
+    'medium': 1200,
+    'high': None,
+}
+
+# Target for showing the first, low quality pass of a preview, proxy included
+FIRST_PASS_BUDGET_MS = 50
+
+_proxy_paths = {}
+_proxy_lock = threading.Lock()
+
+def refinement_levels(quality_cap):
+    """Qualities to render, coarsest first, stopping at the configured cap."""
+    if quality_cap not in PREVIEW_QUALITIES:
+        quality_cap = PREVIEW_QUALITIES[0]
+    return PREVIEW_QUALITIES[:PREVIEW_QUALITIES.index(quality_cap) + 1]
+
+def image_cache_key(image_path):
+    # Keyed on content, so copies of the same image share their proxies and previews
+    return content_key(image_path)[:16]
+
+def get_proxy_image(image_path, quality, cache_dir):
+    """Path of an image to draw the preview from at the given quality."""
+    max_edge = PROXY_MAX_EDGE[quality]
+    if max_edge is None:
+        return local_path(image_path)
+
+    key = (image_cache_key(image_path), quality)
+    with _proxy_lock:
+        proxy_path = _proxy_paths.get(key)
+    if proxy_path and os.path.exists(proxy_path):
+        return proxy_path
+
+    proxy_path = os.path.join(cache_dir, f"proxy_{key[0]}_{quality}.jpg")
+    if not os.path.exists(proxy_path):
+        _write_proxy(_best_proxy_source(image_path, key[0], max_edge), proxy_path, max_edge)
+    with _proxy_lock:
+        _proxy_paths[key] = proxy_path
+    return proxy_path
+
+def _best_proxy_source(image_path, image_key, max_edge):
+    # Downsample from the smallest cached proxy that is still large enough
+    with _proxy_lock:
+        for quality in PREVIEW_QUALITIES:
+            edge = PROXY_MAX_EDGE[quality]
+            path = _proxy_paths.get((image_key, quality))
+            if edge is not None and edge > max_edge and path and os.path.exists(path):
+                return path
+    return image_path
+
+def _write_proxy(source_path, proxy_path, max_edge):
+    from PIL import Image
+
+    with open_source(source_path) as f, Image.open(f) as img:
+        img.draft('RGB', (max_edge, max_edge))  # Lets JPEG decode at reduced scale
+        proxy = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    proxy.thumbnail((max_edge, max_edge), Image.Resampling.BILINEAR)
+    if proxy.mode == 'RGBA':
+        # Previews are drawn on white paper, so transparency is flattened onto white
+        proxy = Image.alpha_composite(Image.new('RGBA', proxy.size, 'white'), proxy).convert('RGB')
+    # JPEG is quick to encode, and both PDF backends embed it as it is instead of recompressing it.
+    # Write under a unique name so a concurrent refinement never sees a partial file
+    fd, temp_path = tempfile.mkstemp(suffix='.jpg', dir=os.path.dirname(proxy_path))
+    with os.fdopen(fd, 'wb') as f:
+        proxy.save(f, format='JPEG', quality=90)
+    os.replace(temp_path, proxy_path)
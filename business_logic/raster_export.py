@@ -0,0 +1,245 @@
+"""Raster sheet export for printers that take PNG/TIFF input from a RIP.
+
+Sheets are composited straight from the source image using the same layout
+as the PDF output. The page is rendered in horizontal bands on a thread pool
+and each band is handed to the file writer as soon as it is ready, so memory
+use is bounded by the scaled card plus the bands in flight rather than the
+full sheet.
+"""
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from business_logic.archive_sources import local_path
+from business_logic.bleed import bleed_stage
+from business_logic.pdf_operations import layout_postcard_sheet
+from config import resolve_render_settings
+
+RASTER_DPIS = (300, 600, 1200)
+RASTER_FORMATS = ('tiff', 'png')
+
+TILE_SIZE = 256  # TIFF tile edge and band height, in pixels
+GUIDE_LINE_WIDTH_PT = 0.5
+GUIDE_DASH_PT = (6, 3)
+CROP_MARK_WIDTH_PT = 0.25
+
+def export_raster_sheet(image_path, output_path, paper_size_name, dpi=300, fmt='tiff', workers=None, settings=None):
+    from PIL import Image
+
+    if fmt not in RASTER_FORMATS:
+        raise ValueError(f"Unsupported raster format: {fmt}")
+
+    settings = settings or resolve_render_settings()
+    image_path = local_path(image_path)
+    layout, geometry = layout_postcard_sheet(image_path, paper_size_name, settings)
+    px_per_mm = dpi / 25.4
+    width = round(geometry['paper_width'] * px_per_mm)
+    height = round(geometry['paper_height'] * px_per_mm)
+
+    # Geometry is measured from the bottom-left corner, rasters from the top-left
+    slots = [(round(x * px_per_mm), round((geometry['paper_height'] - y - h) * px_per_mm),
+              round(w * px_per_mm), round(h * px_per_mm))
+             for x, y, w, h in geometry['image_slots']]
+
+    with Image.open(bleed_stage(image_path, layout, settings)) as img:
+        card = img.convert('RGB')
+    if geometry['rotated']:
+        card = card.transpose(Image.Transpose.ROTATE_90)
+    if slots:
+        card = card.resize(slots[0][2:], Image.Resampling.LANCZOS)
+
+    def to_pixels(lines):
+        return [(x1 * px_per_mm, (geometry['paper_height'] - y1) * px_per_mm,
+                 x2 * px_per_mm, (geometry['paper_height'] - y2) * px_per_mm)
+                for x1, y1, x2, y2 in lines]
+
+    guides = to_pixels(geometry['guides'])
+    crop_marks = to_pixels(geometry['crop_marks'])
+
+    def render_band(top):
+        band = Image.new('RGB', (width, min(TILE_SIZE, height - top)), 'white')
+        bottom = top + band.height
+        for left, slot_top, slot_width, slot_height in slots:
+            if slot_top < bottom and slot_top + slot_height > top:
+                crop_top = max(top, slot_top) - slot_top
+                crop_bottom = min(bottom, slot_top + slot_height) - slot_top
+                band.paste(card.crop((0, crop_top, slot_width, crop_bottom)), (left, slot_top + crop_top - top))
+        _draw_guides(band, top, guides, dpi)
+        _draw_guides(band, top, crop_marks, dpi, CROP_MARK_WIDTH_PT, dash_pt=None)
+        return band
+
+    writer_class = TiledTiffWriter if fmt == 'tiff' else PngBandWriter
+    workers = workers or os.cpu_count() or 1
+    band_tops = list(range(0, height, TILE_SIZE))
+    with writer_class(output_path, width, height, dpi) as writer, ThreadPoolExecutor(workers) as executor:
+        # Keep a bounded window of bands in flight so finished bands never pile up
+        window = workers * 2
+        pending = [executor.submit(lambda top: writer.encode_band(render_band(top)), top) for top in band_tops[:window]]
+        for i in range(len(band_tops)):
+            encoded = pending[i].result()
+            pending[i] = None
+            if i + window < len(band_tops):
+                pending.append(executor.submit(lambda top: writer.encode_band(render_band(top)), band_tops[i + window]))
+            writer.write_band(encoded)
+
+    print(f"Raster sheet saved: {output_path} ({width}x{height}px at {dpi} DPI)")
+    return layout['total']
+
+def export_raster_sheets(images, output_dir, paper_size_name, dpi=300, fmt='tiff'):
+    settings = resolve_render_settings()
+    outputs = []
+    for image_path in images:
+        output_path = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(image_path))[0]}.{fmt}")
+        export_raster_sheet(image_path, output_path, paper_size_name, dpi, fmt, settings=settings)
+        outputs.append(output_path)
+    return outputs
+
+def _draw_guides(band, band_top, guides, dpi, width_pt=GUIDE_LINE_WIDTH_PT, dash_pt=GUIDE_DASH_PT):
+    # dash_pt=None draws solid lines
+    from PIL import ImageDraw
+
+    draw = ImageDraw.Draw(band)
+    line_width = max(1, round(width_pt / 72 * dpi))
+    for x1, y1, x2, y2 in guides:
+        length = max(abs(x2 - x1), abs(y2 - y1))
+        if not length:
+            continue
+        if dash_pt is None:
+            if max(y1, y2) - band_top >= 0 and min(y1, y2) - band_top <= band.height:
+                draw.line([(x1, y1 - band_top), (x2, y2 - band_top)], fill='black', width=line_width)
+            continue
+        dash_on, dash_off = (round(length_pt / 72 * dpi) for length_pt in dash_pt)
+        dx, dy = (x2 - x1) / length, (y2 - y1) / length
+        for start in range(0, int(length), dash_on + dash_off):
+            end = min(start + dash_on, length)
+            ys = (y1 + dy * start - band_top, y1 + dy * end - band_top)
+            if max(ys) < 0 or min(ys) > band.height:
+                continue
+            draw.line([(x1 + dx * start, ys[0]), (x1 + dx * end, ys[1])], fill='black', width=line_width)
+
+class TiledTiffWriter:
+    """Writes an RGB TIFF with deflate-compressed tiles, one band of tiles at a time."""
+    def __init__(self, output_path, width, height, dpi):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.tile_offsets = []
+        self.tile_byte_counts = []
+
+    def __enter__(self):
+        self.file = open(self.output_path, 'wb')
+        self.file.write(b'II*\x00' + struct.pack('<I', 0))  # IFD offset is patched on close
+        return self
+
+    def encode_band(self, band):
+        # Runs on worker threads: zlib releases the GIL while compressing
+        from PIL import Image
+
+        tiles = []
+        for left in range(0, self.width, TILE_SIZE):
+            tile = Image.new('RGB', (TILE_SIZE, TILE_SIZE), 'white')
+            tile.paste(band.crop((left, 0, min(left + TILE_SIZE, self.width), band.height)))
+            tiles.append(zlib.compress(tile.tobytes(), 6))
+        return tiles
+
+    def write_band(self, tiles):
+        for data in tiles:
+            self.tile_offsets.append(self.file.tell())
+            self.tile_byte_counts.append(len(data))
+            self.file.write(data)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._write_ifd()
+        finally:
+            self.file.close()
+        return False
+
+    def _write_ifd(self):
+        f = self.file
+        tile_count = len(self.tile_offsets)
+
+        def out_of_line(data):
+            if f.tell() % 2:
+                f.write(b'\x00')
+            offset = f.tell()
+            f.write(data)
+            return offset
+
+        bits_offset = out_of_line(struct.pack('<3H', 8, 8, 8))
+        resolution_offset = out_of_line(struct.pack('<2I', self.dpi, 1))
+        offsets_offset = out_of_line(struct.pack(f'<{tile_count}I', *self.tile_offsets))
+        counts_offset = out_of_line(struct.pack(f'<{tile_count}I', *self.tile_byte_counts))
+
+        SHORT, LONG, RATIONAL = 3, 4, 5
+        entries = [
+            (256, LONG, 1, self.width),            # ImageWidth
+            (257, LONG, 1, self.height),           # ImageLength
+            (258, SHORT, 3, bits_offset),          # BitsPerSample
+            (259, SHORT, 1, 8),                    # Compression: deflate
+            (262, SHORT, 1, 2),                    # PhotometricInterpretation: RGB
+            (277, SHORT, 1, 3),                    # SamplesPerPixel
+            (282, RATIONAL, 1, resolution_offset), # XResolution
+            (283, RATIONAL, 1, resolution_offset), # YResolution
+            (284, SHORT, 1, 1),                    # PlanarConfiguration: chunky
+            (296, SHORT, 1, 2),                    # ResolutionUnit: inch
+            (322, LONG, 1, TILE_SIZE),             # TileWidth
+            (323, LONG, 1, TILE_SIZE),             # TileLength
+            (324, LONG, tile_count, offsets_offset if tile_count > 1 else self.tile_offsets[0]),
+            (325, LONG, tile_count, counts_offset if tile_count > 1 else self.tile_byte_counts[0]),
+        ]
+
+        ifd_offset = out_of_line(struct.pack('<H', len(entries)))
+        for tag, field_type, count, value in entries:
+            if field_type == SHORT and count == 1:
+                f.write(struct.pack('<HHIHH', tag, field_type, count, value, 0))
+            else:
+                f.write(struct.pack('<HHII', tag, field_type, count, value))
+        f.write(struct.pack('<I', 0))
+        f.seek(4)
+        f.write(struct.pack('<I', ifd_offset))
+
+class PngBandWriter:
+    """Streams an RGB PNG band by band with pHYs DPI metadata."""
+    def __init__(self, output_path, width, height, dpi):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+
+    def __enter__(self):
+        self.file = open(self.output_path, 'wb')
+        self.compressor = zlib.compressobj(6)
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self._write_chunk(b'IHDR', struct.pack('>2I5B', self.width, self.height, 8, 2, 0, 0, 0))
+        pixels_per_metre = round(self.dpi / 0.0254)
+        self._write_chunk(b'pHYs', struct.pack('>2IB', pixels_per_metre, pixels_per_metre, 1))
+        return self
+
+    def encode_band(self, band):
+        # Prefix each scanline with filter type 0; the deflate stream itself is
+        # shared across bands, so compression happens in write_band.
+        row_bytes = self.width * 3
+        data = band.tobytes()
+        return b''.join(b'\x00' + data[i:i + row_bytes] for i in range(0, len(data), row_bytes))
+
+    def write_band(self, scanlines):
+        compressed = self.compressor.compress(scanlines)
+        if compressed:
+            self._write_chunk(b'IDAT', compressed)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._write_chunk(b'IDAT', self.compressor.flush())
+                self._write_chunk(b'IEND', b'')
+        finally:
+            self.file.close()
+        return False
+
+    def _write_chunk(self, chunk_type, data):
+        self.file.write(struct.pack('>I', len(data)) + chunk_type + data)
+        self.file.write(struct.pack('>I', zlib.crc32(chunk_type + data)))
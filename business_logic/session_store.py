@@ -0,0 +1,146 @@
+"""SQLite store for the image list, so a session can be restored without touching the files.
+
+Each imported image has one row holding its position, front/back selection
+order and the metadata probed when it was imported: pixel size, DPI, file
+size and mtime, content hash and a small thumbnail. Startup rebuilds the list
+from these rows alone; ``refresh_record`` later checks each file against its
+row in the background. Every change is written as it happens.
+"""
+import os
+import sqlite3
+
+from business_logic.archive_sources import open_source, source_stat
+from business_logic.content_hash import content_key
+from config import user_dir
+
+SESSION_FILE = 'session.db'  # In the per-user data directory
+THUMBNAIL_DIR = 'thumbnails'  # In the per-user cache directory
+THUMBNAIL_SIZE = 96
+
+METADATA_FIELDS = ('content_hash', 'width', 'height', 'dpi_x', 'dpi_y', 'file_size', 'mtime_ns', 'thumbnail', 'missing')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    front_order INTEGER,
+    back_order INTEGER,
+    content_hash TEXT,
+    width INTEGER,
+    height INTEGER,
+    dpi_x REAL,
+    dpi_y REAL,
+    file_size INTEGER,
+    mtime_ns INTEGER,
+    thumbnail TEXT,
+    missing INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+class SessionStore:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(user_dir('data'), SESSION_FILE)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        # user_version marks a store that has been set up, so the one-off import
+        # of the old persisted_files.json never runs twice
+        self.created = self.connection.execute('PRAGMA user_version').fetchone()[0] == 0
+        self.connection.execute(SCHEMA)
+        self.connection.execute('PRAGMA user_version = 1')
+        self.connection.commit()
+
+    def load(self):
+        """All rows as dicts, in list order."""
+        rows = self.connection.execute('SELECT * FROM images ORDER BY position')
+        return [dict(row) for row in rows]
+
+    def add_images(self, records):
+        with self.connection:
+            next_position = self.connection.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM images').fetchone()[0]
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO images (path, position, {', '.join(METADATA_FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(METADATA_FIELDS))})",
+                [(record['path'], next_position + i, *(record.get(field) for field in METADATA_FIELDS))
+                 for i, record in enumerate(records)],
+            )
+
+    def update_metadata(self, record):
+        with self.connection:
+            self.connection.execute(
+                f"UPDATE images SET {', '.join(f'{field} = ?' for field in METADATA_FIELDS)} WHERE path = ?",
+                (*(record.get(field) for field in METADATA_FIELDS), record['path']),
+            )
+
+    def save_selection(self, is_front, selected):
+        column = 'front_order' if is_front else 'back_order'
+        with self.connection:
+            self.connection.execute(f'UPDATE images SET {column} = NULL')
+            self.connection.executemany(f'UPDATE images SET {column} = ? WHERE path = ?',
+                                        [(order, path) for order, path in enumerate(selected)])
+
+    def remove_image(self, path):
+        with self.connection:
+            self.connection.execute('DELETE FROM images WHERE path = ?', (path,))
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute('DELETE FROM images')
+
+    def close(self):
+        self.connection.close()
+
+def probe_image(path, content_hash=None):
+    """Metadata row for an image, reading only its header. Missing or unreadable files are marked missing."""
+    from PIL import Image
+
+    record = {'path': path, 'content_hash': content_hash, 'missing': 0}
+    try:
+        stat = source_stat(path)
+        with open_source(path) as f, Image.open(f) as img:
+            dpi = img.info.get('dpi') or (None, None)
+            record.update(width=img.width, height=img.height, dpi_x=dpi[0], dpi_y=dpi[1])
+    except OSError:
+        record['missing'] = 1
+        return record
+    record.update(file_size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    return record
+
+def refresh_record(record, thumbnail_dir=None):
+    """Check a stored row against its file. Returns the updated row, or None if nothing changed."""
+    try:
+        stat = source_stat(record['path'])
+    except OSError:
+        return None if record.get('missing') else dict(record, missing=1)
+
+    unchanged = (not record.get('missing') and record.get('content_hash')
+                 and (record.get('file_size'), record.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns))
+    if unchanged and record.get('thumbnail') and os.path.exists(record['thumbnail']):
+        return None
+
+    updated = dict(record)
+    if not unchanged:
+        try:
+            updated.update(probe_image(record['path'], content_key(record['path'])))
+        except OSError:
+            return dict(record, missing=1)
+    if not updated['missing']:
+        updated['thumbnail'] = write_thumbnail(record['path'], updated['content_hash'], thumbnail_dir)
+    return updated
+
+def write_thumbnail(image_path, content_hash, thumbnail_dir=None):
+    from PIL import Image
+
+    thumbnail_dir = thumbnail_dir or os.path.join(user_dir('cache'), THUMBNAIL_DIR)
+    thumbnail_path = os.path.join(thumbnail_dir, f'{content_hash[:16]}.png')
+    if not os.path.exists(thumbnail_path):
+        os.makedirs(thumbnail_dir, exist_ok=True)
+        with open_source(image_path) as f, Image.open(f) as img:
+            img.draft('RGB', (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            thumbnail = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        temp_path = thumbnail_path + '.tmp'
+        thumbnail.save(temp_path, format='PNG')
+        os.replace(temp_path, thumbnail_path)
+    return thumbnail_path
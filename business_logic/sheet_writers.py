@@ -0,0 +1,121 @@
+"""Sheet writers turn a sheet geometry from pdf_operations into PDF pages.
+
+Every writer takes the output path up front, gets one ``add_sheet`` call per
+page and writes the file on ``close``. Geometry is in mm from the bottom-left
+corner of the page, as returned by ``calculate_sheet_geometry``.
+"""
+from config import get_setting
+
+MM_TO_PT = 72 / 25.4
+GUIDE_LINE_WIDTH = 0.5
+GUIDE_DASH = (6, 3)
+CROP_MARK_WIDTH = 0.25
+
+class SheetWriter:
+    def __init__(self, output_pdf):
+        self.output_pdf = output_pdf
+
+    def add_sheet(self, image_path, geometry):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+class ReportlabSheetWriter(SheetWriter):
+    def __init__(self, output_pdf):
+        from reportlab.pdfgen import canvas
+
+        super().__init__(output_pdf)
+        self.canvas = canvas.Canvas(output_pdf)
+        self.page_count = 0
+
+    def add_sheet(self, image_path, geometry):
+        from reportlab.lib.units import mm
+        from reportlab.lib.colors import black
+
+        c = self.canvas
+        if self.page_count:
+            c.showPage()
+        c.setPageSize((geometry['paper_width']*mm, geometry['paper_height']*mm))
+
+        for x, y, width, height in geometry['image_slots']:
+            if geometry['rotated']:
+                c.saveState()
+                c.translate((x+width)*mm, y*mm)
+                c.rotate(90)
+                c.drawImage(image_path, 0, 0, width=height*mm, height=width*mm, preserveAspectRatio=True)
+                c.restoreState()
+            else:
+                c.drawImage(image_path, x*mm, y*mm, width=width*mm, height=height*mm, preserveAspectRatio=True)
+
+        # Add guidelines
+        c.setStrokeColor(black)
+        c.setLineWidth(GUIDE_LINE_WIDTH)
+        c.setDash(*GUIDE_DASH)
+        for x1, y1, x2, y2 in geometry['guides']:
+            c.line(x1*mm, y1*mm, x2*mm, y2*mm)
+
+        # Crop marks are solid hairlines
+        c.setLineWidth(CROP_MARK_WIDTH)
+        c.setDash()
+        for x1, y1, x2, y2 in geometry['crop_marks']:
+            c.line(x1*mm, y1*mm, x2*mm, y2*mm)
+        self.page_count += 1
+
+    def close(self):
+        self.canvas.save()
+
+class PyMuPDFSheetWriter(SheetWriter):
+    """Writes sheets with fitz, embedding each image once and reusing it for every slot.
+
+    Pass an open ``document`` to append pages to it; the file is only written
+    on ``close`` when ``output_pdf`` is given.
+    """
+    def __init__(self, output_pdf=None, document=None):
+        import fitz
+
+        super().__init__(output_pdf)
+        self.document = document if document is not None else fitz.open()
+        self.image_xrefs = {}
+
+    def add_sheet(self, image_path, geometry):
+        import fitz
+
+        paper_height = geometry['paper_height']
+        page = self.document.new_page(width=geometry['paper_width'] * MM_TO_PT, height=paper_height * MM_TO_PT)
+        rotate = 90 if geometry['rotated'] else 0
+
+        for x, y, width, height in geometry['image_slots']:
+            # fitz measures y from the top of the page
+            rect = fitz.Rect(x, paper_height - y - height, x + width, paper_height - y) * MM_TO_PT
+            xref = self.image_xrefs.get(image_path, 0)
+            if xref:
+                page.insert_image(rect, xref=xref, rotate=rotate)
+            else:
+                self.image_xrefs[image_path] = page.insert_image(rect, filename=image_path, rotate=rotate)
+
+        shape = page.new_shape()
+        for lines, style in ((geometry['guides'], dict(width=GUIDE_LINE_WIDTH, dashes="[%g %g] 0" % GUIDE_DASH)),
+                             (geometry['crop_marks'], dict(width=CROP_MARK_WIDTH))):
+            if not lines:
+                continue
+            for x1, y1, x2, y2 in lines:
+                shape.draw_line(fitz.Point(x1, paper_height - y1) * MM_TO_PT, fitz.Point(x2, paper_height - y2) * MM_TO_PT)
+            shape.finish(color=(0, 0, 0), **style)
+        shape.commit()
+
+    def close(self):
+        if self.output_pdf:
+            self.document.save(self.output_pdf, garbage=3, deflate=True)
+
+SHEET_WRITERS = {
+    'reportlab': ReportlabSheetWriter,
+    'pymupdf': PyMuPDFSheetWriter,
+}
+
+def get_sheet_writer(backend=None):
+    backend = backend or get_setting('pdf_backend', 'reportlab')
+    try:
+        return SHEET_WRITERS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend: {backend}")
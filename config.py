@@ -1,7 +1,28 @@
+import atexit
+import copy
+import dataclasses
 import json
 import os
+import shutil
+import tempfile
+import threading
+import time
+from functools import lru_cache
 
 CONFIG_FILE = 'config.json'
+SAVE_DELAY_SECONDS = 0.5
+APP_DIR_NAME = 'postcard-printer'
+CACHE_MAX_BYTES = 2 * 1024 ** 3  # Per cache directory
+CACHE_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+def _current_umask():
+    # The umask can only be read by setting it; done once, at import
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# mkstemp creates files readable by their owner only; new files get the mode open() would give them
+NEW_FILE_MODE = 0o666 & ~_current_umask()
 
 def load_config():
     if os.path.exists(CONFIG_FILE):
@@ -10,16 +31,82 @@ def load_config():
     return {}
 
 def save_config(config):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=4)
+    # Write to a temporary file next to the config and rename it into place,
+    # so a crash mid-write never leaves a truncated config behind.
+    config_dir = os.path.dirname(os.path.abspath(CONFIG_FILE))
+    fd, temp_path = tempfile.mkstemp(prefix='.config-', suffix='.json', dir=config_dir)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(config, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(CONFIG_FILE):
+            shutil.copymode(CONFIG_FILE, temp_path)
+        else:
+            os.chmod(temp_path, NEW_FILE_MODE)
+        os.replace(temp_path, CONFIG_FILE)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def user_dir(kind):
+    """Per-user directory for the app's ``'data'`` or ``'cache'`` files, created on first use.
+
+    Follows XDG_DATA_HOME / XDG_CACHE_HOME, and LOCALAPPDATA on Windows.
+    """
+    if os.name == 'nt':
+        root = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        path = os.path.join(root, APP_DIR_NAME, kind)
+    else:
+        variable, default = {'data': ('XDG_DATA_HOME', '~/.local/share'), 'cache': ('XDG_CACHE_HOME', '~/.cache')}[kind]
+        path = os.path.join(os.environ.get(variable) or os.path.expanduser(default), APP_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+@lru_cache(maxsize=None)
+def user_cache_dir(name):
+    """The cache directory ``name`` under ``user_dir('cache')``, trimmed the first time it is used in a session."""
+    path = os.path.join(user_dir('cache'), name)
+    os.makedirs(path, exist_ok=True)
+    prune_cache_dir(path)
+    return path
+
+def prune_cache_dir(path, max_bytes=CACHE_MAX_BYTES, max_age_seconds=CACHE_MAX_AGE_SECONDS):
+    """Remove files older than ``max_age_seconds``, then the oldest ones until the rest fit in ``max_bytes``."""
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                continue
+    now = time.time()
+    total = 0
+    # Newest first: once a file is too old or over the budget, so is every file after it
+    for mtime, size, file_path in sorted(files, reverse=True):
+        total += size
+        if total > max_bytes or now - mtime > max_age_seconds:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass  # Already removed by another session
 
 CONFIG = load_config()
 
+_save_timer = None
+_save_lock = threading.Lock()
+_config_lock = threading.Lock()  # Held while CONFIG is changed or copied for saving
+
+@lru_cache(maxsize=None)
+def _split_key(key):
+    return tuple(key.split('.'))
+
 def get_setting(key, default=None):
-    keys = key.split('.')
     value = CONFIG
     try:
-        for k in keys:
+        for k in _split_key(key):
             value = value[k]
         return value
     except KeyError:
@@ -27,7 +114,75 @@ def get_setting(key, default=None):
 
 def update_setting(key, value):
     if key in CONFIG.get('user_modifiable', {}):
-        CONFIG['user_modifiable'][key] = value
-        save_config(CONFIG)
+        with _config_lock:
+            CONFIG['user_modifiable'][key] = value
+        schedule_save()
     else:
         raise ValueError(f"Setting '{key}' is not user-modifiable")
+
+def schedule_save():
+    """Save the config shortly, so a burst of updates results in one write."""
+    global _save_timer
+    with _save_lock:
+        if _save_timer is not None:
+            _save_timer.cancel()
+        _save_timer = threading.Timer(SAVE_DELAY_SECONDS, flush_config)
+        _save_timer.daemon = True
+        _save_timer.start()
+
+def flush_config():
+    """Write any pending setting changes now."""
+    global _save_timer
+    with _save_lock:
+        if _save_timer is None:
+            return
+        _save_timer.cancel()
+        _save_timer = None
+        # Runs on the timer thread; the copy keeps the UI thread's updates from
+        # changing CONFIG while it is being written
+        with _config_lock:
+            snapshot = copy.deepcopy(CONFIG)
+        save_config(snapshot)
+
+atexit.register(flush_config)
+
+@dataclasses.dataclass(frozen=True)
+class RenderSettings:
+    """Settings a render job needs, resolved once when the job starts.
+
+    Immutable, hashable (usable in cache keys) and picklable (can be sent to
+    worker processes), so a job never sees settings change mid-render.
+    """
+    dpi: int
+    margin_mm: float
+    paper_sizes: tuple  # ((name, (width_mm, height_mm)), ...)
+    pdf_backend: str
+    output_profile: str = None  # ICC profile images are converted to; None leaves colours untouched
+    rendering_intent: str = 'perceptual'
+    bleed_mm: float = 0.0  # Added around each card; cards are then cut at crop marks
+    bleed_mode: str = 'mirror'
+    optimize_pdf: bool = False  # Rewrite finished outputs smaller, see business_logic.pdf_optimizer
+    linearize_pdf: bool = False
+    deterministic_pdf: bool = False  # Byte-reproducible outputs, see business_logic.deterministic_pdf
+
+    def paper_size(self, name):
+        for paper_name, size in self.paper_sizes:
+            if paper_name == name:
+                return size
+        raise KeyError(name)
+
+def resolve_render_settings(**overrides):
+    settings = RenderSettings(
+        dpi=get_setting('user_modifiable.default_dpi', 300),
+        margin_mm=get_setting('margin_mm', 6.35),
+        paper_sizes=tuple((name, tuple(size)) for name, size in get_setting('paper_sizes', {}).items()),
+        pdf_backend=get_setting('pdf_backend', 'reportlab'),
+        output_profile=get_setting('color_management.output_profile'),
+        rendering_intent=get_setting('color_management.rendering_intent', 'perceptual'),
+        bleed_mm=get_setting('bleed.size_mm', 0.0),
+        bleed_mode=get_setting('bleed.mode', 'mirror'),
+        optimize_pdf=get_setting('pdf_optimization.enabled', False),
+        linearize_pdf=get_setting('pdf_optimization.linearize', False),
+        deterministic_pdf=get_setting('deterministic_pdf', False),
+    )
+    return dataclasses.replace(settings, **overrides)
@@ -0,0 +1,127 @@
+"""Admits render jobs against a memory budget, so several huge images never decode at once.
+
+A job's peak memory is estimated from the headers of its images. A job
+renders its sheets one after another, so only its largest image counts. That
+image is charged for its decoded pixels plus the working copies rendering
+makes of them, and each job also pays a fixed allowance for its worker.
+
+Jobs are admitted while the admitted total stays within the budget. A job
+that does not fit waits, and smaller jobs that do fit go ahead of it. Once
+it has been passed over ``MAX_BYPASSES`` times, nothing more is admitted
+until it fits. A job bigger than the whole budget runs on its own.
+"""
+import asyncio
+import contextlib
+import os
+
+from business_logic import instrumentation
+
+# Per pixel, on top of the decoded image: the RGB conversion, the bleed stage's
+# float working copy and the PDF writer's own copy
+WORKING_BYTES_PER_PIXEL = 18
+WORKER_BASE_BYTES = 64 * 1024 * 1024
+MAX_BYPASSES = 8
+
+class ImageTooLargeError(ValueError):
+    """An image over PIL's decompression bomb limit, which rendering would refuse to decode."""
+
+def bytes_per_pixel(mode):
+    from PIL import Image
+
+    if mode in ('I', 'F'):
+        return 4
+    if mode.startswith('I;16'):
+        return 2
+    return Image.getmodebands(mode)
+
+def estimate_image_bytes(image_path):
+    """Peak bytes rendering one sheet of ``image_path`` holds, from its header alone. 0 if unreadable.
+
+    Raises ImageTooLargeError for images PIL refuses to open as decompression bombs.
+    """
+    from PIL import Image
+    from business_logic.archive_sources import open_source
+
+    try:
+        with open_source(image_path) as f, Image.open(f) as img:
+            return img.width * img.height * (bytes_per_pixel(img.mode) + WORKING_BYTES_PER_PIXEL)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(f"Image is too large to render: {image_path} ({e})")
+    except (OSError, ValueError):
+        return 0
+
+def estimate_job_bytes(image_paths):
+    return WORKER_BASE_BYTES + max((estimate_image_bytes(path) for path in set(image_paths)), default=0)
+
+def default_memory_budget():
+    # Half of physical memory, or 4 GB where that cannot be read
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+    except (AttributeError, ValueError, OSError):
+        return 4 * 1024 ** 3
+
+class _Waiter:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+        self.bypasses = 0
+
+class MemoryScheduler:
+    def __init__(self, budget_bytes=None):
+        self.budget = budget_bytes or default_memory_budget()
+        self.admitted = 0
+        self.running = 0
+        self.waiting = []  # In arrival order
+        self.changed = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, nbytes):
+        """Wait until ``nbytes`` can be admitted and hold them for the body of the ``async with``."""
+        await self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            await self.release(nbytes)
+
+    async def acquire(self, nbytes):
+        waiter = _Waiter(nbytes)
+        async with self.changed:
+            self.waiting.append(waiter)
+            try:
+                if not self._can_admit(waiter):
+                    instrumentation.increment('scheduler.throttled')
+                    self._publish()
+                    await self.changed.wait_for(lambda: self._can_admit(waiter))
+            except BaseException:
+                self.waiting.remove(waiter)
+                self._publish()
+                self.changed.notify_all()
+                raise
+            for earlier in self.waiting[:self.waiting.index(waiter)]:
+                earlier.bypasses += 1
+            self.waiting.remove(waiter)
+            self.admitted += nbytes
+            self.running += 1
+            self._publish()
+
+    async def release(self, nbytes):
+        async with self.changed:
+            self.admitted -= nbytes
+            self.running -= 1
+            self._publish()
+            self.changed.notify_all()
+
+    def _can_admit(self, waiter):
+        if self.running and self.admitted + waiter.nbytes > self.budget:
+            return False
+        # A waiter passed over too often holds back everyone behind it
+        for earlier in self.waiting:
+            if earlier is waiter:
+                return True
+            if earlier.bypasses >= MAX_BYPASSES:
+                return False
+        return True
+
+    def _publish(self):
+        instrumentation.set_value('scheduler.admitted_bytes', self.admitted)
+        instrumentation.set_value('scheduler.running', self.running)
+        instrumentation.set_value('scheduler.waiting', len(self.waiting))
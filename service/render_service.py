@@ -0,0 +1,460 @@
+"""Local HTTP service that renders postcard jobs without the GUI.
+
+Run it in its own process:
+
+    python -m service.render_service --port 8765 --workers 4 --queue-size 32 --memory-budget-mb 8192
+
+Endpoints:
+    POST /jobs               Submit a job spec (JSON, see below). 202 with the job id,
+                             or 503 with Retry-After when the queue is full.
+    POST /jobs?wait=<s>      As above, but wait up to <s> seconds for a queue slot;
+                             waiting submitters are admitted in arrival order.
+    GET  /jobs/<id>          Current job status as JSON.
+    GET  /jobs/<id>/events   Status changes streamed as newline-delimited JSON until
+                             the job finishes.
+    GET  /jobs/<id>/result   Waits for the job and streams the resulting PDF.
+    GET  /metrics            Instrumentation counters as JSON, including the queue
+                             depth and the memory admitted to running jobs.
+
+Job spec:
+    {
+        "images": ["/path/front1.png", ...],           # paths readable by the service
+        "uploads": [{"name": "front2.png", "data": "<base64>"}, ...],
+        "backs": ["/path/back.png"],                   # optional, pairs fronts with backs
+        "back_uploads": [{"name": ..., "data": ...}],  # optional
+        "pairing": "shared_back",                      # optional: one_to_one (default), shared_back or cyclic
+        "paper_size": "A4",
+        "dpi": 300,
+        "backend": "pymupdf"                           # optional, defaults to pdf_backend
+    }
+
+The result is one PDF holding every sheet of the job, with front and back
+pages interleaved when the job is paired. Image paths may name a ZIP or TAR
+archive, which adds every image in it, or a single member of one, as in
+"/path/cards.zip!/front/card1.png".
+
+Jobs start in order, but only while their estimated peak memory fits in the
+memory budget (see service.memory_scheduler), so jobs with huge images run
+fewer at a time while small jobs keep flowing.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import dataclasses
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs
+
+from business_logic import instrumentation
+from business_logic.archive_sources import expand_sources, source_exists
+from business_logic.pairing import PAIRING_MODES, plan_pairs
+from business_logic.sheet_writers import SHEET_WRITERS
+from config import get_setting, resolve_render_settings
+from service.memory_scheduler import ImageTooLargeError, MemoryScheduler, estimate_job_bytes
+
+MAX_BODY_BYTES = 512 * 1024 * 1024
+STREAM_CHUNK_BYTES = 64 * 1024
+JOB_TTL_SECONDS = 600
+LINGER_SECONDS = 0.1  # How long an unread request body is drained after an error response
+LINGER_BYTES = 4 * 1024 * 1024
+
+class JobError(ValueError):
+    pass
+
+def render_job(spec, work_dir):
+    """Render a validated job spec to a single PDF. Runs in a worker process."""
+    import fitz
+    from business_logic.content_hash import hash_file
+    from business_logic.pdf_operations import create_postcard_pdf, combine_pdfs
+
+    from business_logic.color_management import embed_output_intent, prepare_images
+    from business_logic.deterministic_pdf import deterministic_stage
+    from business_logic.pdf_optimizer import optimize_pdf
+
+    settings = spec['settings']
+    prepare_images(spec['images'] + spec['backs'], settings)
+    # The sheets are intermediates; only result.pdf is made deterministic
+    sheet_settings = dataclasses.replace(settings, deterministic_pdf=False)
+    rendered = {}
+
+    def render_side(image_path):
+        # Identical images in one job, e.g. a shared back, are rendered once
+        key = hash_file(image_path)
+        if key not in rendered:
+            output_pdf = os.path.join(work_dir, f'sheet_{key}.pdf')
+            create_postcard_pdf(image_path, output_pdf, spec['paper_size'], settings=sheet_settings)
+            rendered[key] = output_pdf
+        return rendered[key]
+
+    if spec['pairs']:
+        sheets = []
+        for i, (front, back) in enumerate(spec['pairs']):
+            paired_pdf = os.path.join(work_dir, f'paired_{i}.pdf')
+            combine_pdfs(render_side(front), render_side(back), paired_pdf, backend=settings.pdf_backend)
+            sheets.append(paired_pdf)
+    else:
+        sheets = [render_side(image) for image in spec['images']]
+
+    output_pdf = os.path.join(work_dir, 'result.pdf')
+    with fitz.open() as result:
+        for sheet in sheets:
+            with fitz.open(sheet) as doc:
+                result.insert_pdf(doc)
+        result.save(output_pdf, garbage=3, deflate=True)
+    if settings.output_profile:
+        embed_output_intent(output_pdf, settings.output_profile)
+    deterministic_stage([output_pdf], settings)
+    if settings.optimize_pdf:
+        # Already in a worker process, so optimized inline rather than on another pool
+        optimize_pdf(output_pdf, settings.linearize_pdf)
+    return output_pdf
+
+class Job:
+    def __init__(self, spec, work_dir):
+        self.id = uuid.uuid4().hex
+        self.spec = spec
+        self.work_dir = work_dir
+        self.status = 'queued'
+        self.error = None
+        self.result_path = None
+        self.submitted = time.time()
+        self.finished = None
+        self.changed = asyncio.Condition()
+
+    async def set_status(self, status, error=None):
+        async with self.changed:
+            self.status = status
+            self.error = error
+            if status in ('done', 'failed'):
+                self.finished = time.time()
+            self.changed.notify_all()
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'submitted': self.submitted,
+            'finished': self.finished,
+        }
+
+class RenderService:
+    def __init__(self, workers=None, queue_size=32, memory_budget=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.scheduler = MemoryScheduler(memory_budget)
+        self.jobs = {}
+        # Forked workers would inherit open client sockets and hold connections open
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.scratch_dir = tempfile.mkdtemp(prefix='postcard-service-')
+
+    async def start(self, host, port):
+        # One dispatcher per worker bounds how many jobs render at once
+        self.dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        self.executor.shutdown(cancel_futures=True)
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            try:
+                async with self.scheduler.reserve(job.spec['memory_bytes']):
+                    self._publish_queue_depth()
+                    await job.set_status('rendering')
+                    job.result_path = await loop.run_in_executor(self.executor, render_job, job.spec, job.work_dir)
+                await job.set_status('done')
+            except Exception as e:
+                await job.set_status('failed', str(e))
+            finally:
+                self.queue.task_done()
+                loop.call_later(JOB_TTL_SECONDS, self._forget_job, job.id)
+
+    def _forget_job(self, job_id):
+        job = self.jobs.pop(job_id, None)
+        if job:
+            shutil.rmtree(job.work_dir, ignore_errors=True)
+
+    async def submit(self, body, wait=0):
+        work_dir = tempfile.mkdtemp(dir=self.scratch_dir)
+        try:
+            # Reads image headers and lists archives, so it stays off the event loop
+            spec = await asyncio.to_thread(parse_job_spec, body, work_dir)
+            job = Job(spec, work_dir)
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(self.queue.put(job), wait)
+                except asyncio.TimeoutError:
+                    raise asyncio.QueueFull
+            else:
+                self.queue.put_nowait(job)
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        self.jobs[job.id] = job
+        self._publish_queue_depth()
+        return job
+
+    def _publish_queue_depth(self):
+        # Jobs not yet rendering: still queued, or picked up and waiting for memory
+        instrumentation.set_value('service.queue_depth', self.queue.qsize() + len(self.scheduler.waiting))
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            method, path, body = await read_request(reader)
+            await self._route(method, path, body, writer)
+        except HttpError as e:
+            await send_json(writer, e.status, {'error': e.message}, e.headers)
+            await discard_unread(reader)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body, writer):
+        path, _, query = path.partition('?')
+        parts = [part for part in path.split('/') if part]
+        if method == 'POST' and parts == ['jobs']:
+            try:
+                wait = float(parse_qs(query).get('wait', ['0'])[0])
+            except ValueError:
+                raise HttpError(400, "wait must be a number of seconds")
+            try:
+                job = await self.submit(body, wait)
+            except asyncio.QueueFull:
+                raise HttpError(503, "Render queue is full", {'Retry-After': '1'})
+            except JobError as e:
+                raise HttpError(400, str(e))
+            await send_json(writer, 202, {
+                'id': job.id,
+                'status_url': f'/jobs/{job.id}',
+                'events_url': f'/jobs/{job.id}/events',
+                'result_url': f'/jobs/{job.id}/result',
+            })
+            return
+        if method == 'GET' and parts == ['metrics']:
+            await send_json(writer, 200, instrumentation.snapshot())
+            return
+
+        if method != 'GET' or len(parts) not in (2, 3) or parts[0] != 'jobs':
+            raise HttpError(404, "Not found")
+        job = self.jobs.get(parts[1])
+        if job is None:
+            raise HttpError(404, "Unknown job")
+
+        if len(parts) == 2:
+            await send_json(writer, 200, job.to_dict())
+        elif parts[2] == 'events':
+            await self._stream_events(job, writer)
+        elif parts[2] == 'result':
+            await self._stream_result(job, writer)
+        else:
+            raise HttpError(404, "Not found")
+
+    async def _stream_events(self, job, writer):
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n'
+                     b'Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n')
+        last_status = None
+        while True:
+            async with job.changed:
+                if job.status == last_status:
+                    await job.changed.wait()
+                last_status = job.status
+                event = json.dumps(job.to_dict()).encode() + b'\n'
+            writer.write(b'%x\r\n%s\r\n' % (len(event), event))
+            await writer.drain()
+            if job.done:
+                break
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    async def _stream_result(self, job, writer):
+        async with job.changed:
+            await job.changed.wait_for(lambda: job.done)
+        if job.status == 'failed':
+            raise HttpError(500, job.error)
+
+        size = os.path.getsize(job.result_path)
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/pdf\r\n'
+                     b'Content-Length: %d\r\nConnection: close\r\n\r\n' % size)
+        with open(job.result_path, 'rb') as f:
+            while chunk := f.read(STREAM_CHUNK_BYTES):
+                writer.write(chunk)
+                await writer.drain()
+
+def parse_job_spec(body, work_dir):
+    try:
+        raw = json.loads(body or b'{}')
+    except ValueError:
+        raise JobError("Job spec must be JSON")
+    if not isinstance(raw, dict):
+        raise JobError("Job spec must be a JSON object")
+
+    paper_sizes = get_setting('paper_sizes')
+    paper_size = raw.get('paper_size', get_setting('default_paper_size'))
+    if not isinstance(paper_size, str) or paper_size not in paper_sizes:
+        raise JobError(f"Unknown paper size: {paper_size}")
+    dpi = raw.get('dpi', get_setting('user_modifiable.default_dpi'))
+    if not isinstance(dpi, int) or not 72 <= dpi <= 1200:
+        raise JobError("dpi must be an integer between 72 and 1200")
+
+    backend = raw.get('backend', get_setting('pdf_backend', 'reportlab'))
+    if not isinstance(backend, str) or backend not in SHEET_WRITERS:
+        raise JobError(f"Unknown PDF backend: {backend}")
+
+    images = _collect_images(_list_field(raw, 'images', str), _list_field(raw, 'uploads', dict), work_dir, 'front')
+    backs = _collect_images(_list_field(raw, 'backs', str), _list_field(raw, 'back_uploads', dict), work_dir, 'back')
+    if not images:
+        raise JobError("Job has no images")
+    pairs = []
+    if backs:
+        pairing = raw.get('pairing', 'one_to_one')
+        if not isinstance(pairing, str) or pairing not in PAIRING_MODES or pairing == 'manifest':
+            raise JobError(f"Unknown pairing mode: {pairing}")
+        try:
+            pairs = plan_pairs(images, backs, pairing)
+        except ValueError as e:
+            raise JobError(str(e))
+
+    try:
+        memory_bytes = estimate_job_bytes(images + backs)
+    except ImageTooLargeError as e:
+        raise JobError(str(e))
+    settings = resolve_render_settings(dpi=dpi, pdf_backend=backend)
+    return {'images': images, 'backs': backs, 'pairs': pairs, 'paper_size': paper_size, 'settings': settings,
+            'memory_bytes': memory_bytes}
+
+def _list_field(raw, key, item_type):
+    value = raw.get(key, [])
+    if not isinstance(value, list) or not all(isinstance(item, item_type) for item in value):
+        kind = 'strings' if item_type is str else 'objects'
+        raise JobError(f"{key} must be a list of {kind}")
+    return value
+
+def _collect_images(paths, uploads, work_dir, side):
+    images = []
+    for path in expand_sources(paths):
+        if not source_exists(path):
+            raise JobError(f"Image file not found: {path}")
+        images.append(path)
+    for i, upload in enumerate(uploads):
+        name = upload.get('name', '')
+        if not isinstance(name, str):
+            raise JobError(f"Upload {i} name must be a string")
+        name = os.path.basename(name)
+        try:
+            data = base64.b64decode(upload['data'], validate=True)
+        except (KeyError, TypeError, binascii.Error):
+            raise JobError(f"Upload {name or i} has no valid base64 data")
+        path = os.path.join(work_dir, f'{side}_upload_{i}_{name}')
+        with open(path, 'wb') as f:
+            f.write(data)
+        images.append(path)
+    return images
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 411: 'Length Required',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+async def read_request(reader):
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise HttpError(400, "Request headers too large")
+    request_line, *header_lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, path, _ = request_line.split(' ', 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    for line in header_lines:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    body = b''
+    if method == 'POST':
+        if 'content-length' not in headers:
+            raise HttpError(411, "Content-Length required")
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise HttpError(400, "Content-Length must be a number")
+        if length < 0:
+            raise HttpError(400, "Content-Length must not be negative")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length)
+    return method, path, body
+
+async def discard_unread(reader):
+    # Closing with request data still unread makes the client see a reset instead of the response
+    discarded = 0
+    while discarded < LINGER_BYTES:
+        try:
+            chunk = await asyncio.wait_for(reader.read(STREAM_CHUNK_BYTES), LINGER_SECONDS)
+        except (asyncio.TimeoutError, ConnectionError):
+            return
+        if not chunk:
+            return
+        discarded += len(chunk)
+
+async def send_json(writer, status, payload, headers=None):
+    body = json.dumps(payload).encode()
+    extra = ''.join(f'{name}: {value}\r\n' for name, value in (headers or {}).items())
+    writer.write(f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n{extra}Connection: close\r\n\r\n'.encode() + body)
+    await writer.drain()
+
+async def serve(host, port, workers, queue_size, memory_budget=None):
+    service = RenderService(workers, queue_size, memory_budget)
+    server = await service.start(host, port)
+    print(f"Render service listening on http://{host}:{port} with {service.workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Postcard render service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help="Jobs rendered at once (default: CPU count)")
+    parser.add_argument('--queue-size', type=int, default=32, help="Jobs waiting before new ones get 503")
+    parser.add_argument('--memory-budget-mb', type=int, default=None,
+                        help="Memory rendering jobs may use at once (default: half of physical memory)")
+    args = parser.parse_args()
+    memory_budget = args.memory_budget_mb * 1024 * 1024 if args.memory_budget_mb else None
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size, memory_budget))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,128 @@
 from config import get_setting
+from business_logic.archive_sources import expand_sources
+from business_logic.content_hash import get_hash_index
+from business_logic.session_store import SessionStore, probe_image
 import os
 import json
 
 import tempfile
- 
+
+LEGACY_PERSISTED_FILES = "persisted_files.json"
 
 class FileManager:
     def __init__(self):
         self.images = []
         self.front_images = []
         self.back_images = []
+        self.hashes = {}      # path -> content hash, None for unreadable files
+        self.duplicates = {}  # skipped path -> already imported path with the same content
+        self.metadata = {}    # path -> session store row
+        self.store = SessionStore() if get_setting("user_modifiable.persist_files") else None
         self.load_persisted_files()
         self.temp_dir = tempfile.mkdtemp()
 
 
     def add_files(self, new_files):
+        """Import ``new_files`` synchronously. Returns the paths that were added."""
+        return self.merge_scanned(self.scan_files(new_files))
+
+    def scan_files(self, new_files):
+        """Read everything an import needs from disk: archive listings, content hashes and metadata.
+
+        Touches no FileManager state, so it can run off the UI thread; the
+        result is handed to ``merge_scanned`` on the UI thread.
+        """
+        # Archives add the images inside them, which are read from the archive in place
+        files = expand_sources(new_files)
+        hash_index = get_hash_index()
+        hashes = hash_index.get_hashes(file for file in files if file not in self.hashes)
+        hash_index.save()
+        records = {file: probe_image(file, content_hash) for file, content_hash in hashes.items()}
+        return {'files': files, 'hashes': hashes, 'records': records}
+
+    def merge_scanned(self, scan):
+        """Add the files of a ``scan_files`` result that are not already listed. Returns the added paths."""
+        # Files are identified by content, so the same artwork reached through a
+        # copy, a symlink or another path is imported only once.
+        known = {self._identity(file): file for file in self.images}
+
         added_files = []
-        for file in new_files:
-            if file not in self.images:
-                self.images.append(file)
-                added_files.append(file)
-                
-                # Auto-select logic
-                if not self.front_images:
-                    self.front_images.append(file)
-                elif not self.back_images:
-                    self.back_images.append(file)
+        for file in scan['files']:
+            if file in self.images:
+                continue
+            self.hashes[file] = scan['hashes'].get(file)
+            identity = self._identity(file)
+            if identity in known:
+                self.duplicates[file] = known[identity]
+                del self.hashes[file]
+                continue
+            known[identity] = file
+            self.images.append(file)
+            added_files.append(file)
+
+            # Auto-select logic
+            if not self.front_images:
+                self.front_images.append(file)
+            elif not self.back_images:
+                self.back_images.append(file)
+
+        records = [scan['records'].get(file) or probe_image(file, self.hashes[file]) for file in added_files]
+        self.metadata.update((record['path'], record) for record in records)
+        if self.store and added_files:
+            self.store.add_images(records)
+            self._save_selection()
         return added_files
 
+    def _identity(self, file_path):
+        content_hash = self.hashes.get(file_path)
+        return content_hash if content_hash is not None else os.path.realpath(file_path)
+
     def remove_file(self, file_path):
         if file_path in self.images:
             self.images.remove(file_path)
+            self.hashes.pop(file_path, None)
         if file_path in self.front_images:
             self.front_images.remove(file_path)
         if file_path in self.back_images:
             self.back_images.remove(file_path)
+        self.metadata.pop(file_path, None)
+        if self.store:
+            self.store.remove_image(file_path)
 
     def update_image_list(self, file_path, is_checked, is_front):
         target_list = self.front_images if is_front else self.back_images
         if is_checked and file_path not in target_list:
             target_list.append(file_path)
-            return True
         elif not is_checked and file_path in target_list:
             target_list.remove(file_path)
-            return True
-        return False
+        else:
+            return False
+        self._save_selection(is_front)
+        return True
+
+    def _save_selection(self, is_front=None):
+        if self.store:
+            for side in ((True, False) if is_front is None else (is_front,)):
+                self.store.save_selection(side, self.front_images if side else self.back_images)
+
+    def update_metadata(self, record):
+        """Take a row refreshed in the background, keeping the hash used for dedupe current."""
+        if record['path'] not in self.images:
+            return
+        self.metadata[record['path']] = record
+        self.hashes[record['path']] = record.get('content_hash')
+        if self.store:
+            self.store.update_metadata(record)
 
     def clear_files(self):
         self.images.clear()
         self.front_images.clear()
         self.back_images.clear()
+        self.hashes.clear()
+        self.duplicates.clear()
+        self.metadata.clear()
+        if self.store:
+            self.store.clear()
 
     def get_images(self):
         return self.images
@@ -64,17 +137,37 @@ class FileManager:
             target_list.extend(self.images)
         else:
             target_list.clear()
+        self._save_selection(is_front)
 
     def load_persisted_files(self):
-        if get_setting("user_modifiable.persist_files"):
-            try:
-                with open("persisted_files.json", "r") as f:
-                    persisted_files = json.load(f)
-                self.add_files(persisted_files)
-            except FileNotFoundError:
-                print("No persisted files found.")
+        # Restored from the stored rows alone; the files themselves are checked
+        # later in the background, so startup does no file I/O per image.
+        if not self.store:
+            return
+        if self.store.created:
+            self._import_persisted_json()
+            return
+        records = self.store.load()
+        for record in records:
+            self.images.append(record['path'])
+            self.hashes[record['path']] = record['content_hash']
+            self.metadata[record['path']] = record
+        for target_list, column in ((self.front_images, 'front_order'), (self.back_images, 'back_order')):
+            selected = [record for record in records if record[column] is not None]
+            target_list.extend(record['path'] for record in sorted(selected, key=lambda record: record[column]))
+
+    def _import_persisted_json(self):
+        # One-off migration of the file list kept by earlier versions
+        try:
+            with open(LEGACY_PERSISTED_FILES, "r") as f:
+                persisted_files = json.load(f)
+        except FileNotFoundError:
+            print("No persisted files found.")
+            return
+        self.add_files(persisted_files)
 
     def save_persisted_files(self):
-        if get_setting("user_modifiable.persist_files"):
-            with open("persisted_files.json", "w") as f:
-                json.dump(self.images, f)
+        # Changes are written to the session store as they happen
+        if self.store:
+            self.store.close()
+            self.store = None
@@ -0,0 +1,32 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+IMPORT_BATCH_SIZE = 64  # Files scanned between checks for interruption
+
+class ImportWorker(QThread):
+    """Hashes and probes files being imported, off the UI thread.
+
+    Emits ``scanned`` with the combined ``FileManager.scan_files`` result once
+    every file has been read; the files are added to the list on the UI
+    thread by whoever handles it. Nothing is emitted if interrupted.
+    """
+    scanned = pyqtSignal(dict)
+
+    def __init__(self, file_manager, files):
+        super().__init__()
+        self.file_manager = file_manager
+        self.files = list(files)
+
+    def run(self):
+        result = {'files': [], 'hashes': {}, 'records': {}}
+        for start in range(0, len(self.files), IMPORT_BATCH_SIZE):
+            if self.isInterruptionRequested():
+                return
+            try:
+                scan = self.file_manager.scan_files(self.files[start:start + IMPORT_BATCH_SIZE])
+            except Exception as e:
+                print(f"Error importing files: {e}")
+                continue
+            result['files'].extend(scan['files'])
+            result['hashes'].update(scan['hashes'])
+            result['records'].update(scan['records'])
+        self.scanned.emit(result)
@@ -0,0 +1,72 @@
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from business_logic import instrumentation
+from .view_logic import create_preview_pdf, render_pdf_page
+
+class PreviewJob:
+    """One preview cell to render at one quality."""
+    def __init__(self, generation, is_front, index, image_path, paper_size, settings, quality, width, height):
+        self.generation = generation
+        self.is_front = is_front
+        self.index = index
+        self.image_path = image_path
+        self.paper_size = paper_size
+        self.settings = settings
+        self.quality = quality
+        self.width = width
+        self.height = height
+
+class PreviewLoader(QThread):
+    """Renders preview cells in the background, most wanted first.
+
+    The view hands over the full list of cells it wants, in priority order,
+    every time the viewport changes; cells that scrolled away before their
+    turn are simply dropped.
+    """
+    page_ready = pyqtSignal(object, object)  # PreviewJob, RenderedPage
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, temp_dir):
+        super().__init__()
+        self.temp_dir = temp_dir
+        self.jobs = []
+        self.busy = False
+        self.condition = threading.Condition()
+
+    def set_jobs(self, jobs):
+        with self.condition:
+            self.jobs = list(jobs)
+            self.condition.notify()
+
+    def is_idle(self):
+        with self.condition:
+            return not self.jobs and not self.busy
+
+    def stop(self):
+        self.requestInterruption()
+        with self.condition:
+            self.jobs = []
+            self.condition.notify()
+
+    def run(self):
+        while not self.isInterruptionRequested():
+            with self.condition:
+                while not self.jobs and not self.isInterruptionRequested():
+                    self.condition.wait()
+                if self.isInterruptionRequested():
+                    return
+                job = self.jobs.pop(0)
+                self.busy = True
+            try:
+                preview_pdf = create_preview_pdf(job.image_path, self.temp_dir, job.paper_size, job.settings, job.quality)
+                page = render_pdf_page(preview_pdf, job.width, job.height)
+                instrumentation.increment('preview.cell_renders')
+                self.page_ready.emit(job, page)
+            except Exception as e:
+                print(f"Error rendering preview: {e}")
+                self.error_occurred.emit(str(e))
+            finally:
+                with self.condition:
+                    self.busy = False
@@ -0,0 +1,28 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from business_logic.session_store import refresh_record
+
+class SessionRevalidator(QThread):
+    """Checks restored images against their files in the background.
+
+    Emits the refreshed row for every image whose file was changed, moved
+    away or is still missing its thumbnail; rows are written back on the UI
+    thread by whoever handles ``record_refreshed``.
+    """
+    record_refreshed = pyqtSignal(dict)
+
+    def __init__(self, records):
+        super().__init__()
+        self.records = [dict(record) for record in records]
+
+    def run(self):
+        for record in self.records:
+            if self.isInterruptionRequested():
+                return
+            try:
+                refreshed = refresh_record(record)
+            except Exception as e:
+                print(f"Error checking {record['path']}: {e}")
+                continue
+            if refreshed is not None:
+                self.record_refreshed.emit(refreshed)
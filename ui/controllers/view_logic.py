@@ -1,17 +1,28 @@
+import hashlib
 import os
 import shutil
 import tempfile
-from PyQt5.QtWidgets import QFileDialog, QMessageBox
-from PyQt5.QtGui import QPixmap, QImage, QPainter, QPen
-from PyQt5.QtCore import Qt
-import fitz
+from PyQt5.QtWidgets import QFileDialog, QMessageBox, QInputDialog
+from PyQt5.QtGui import QImage
+from PyQt5 import sip
 
+from business_logic import instrumentation
+from business_logic.color_management import prepare_images
+from config import resolve_render_settings
+from business_logic.archive_sources import is_archive
 from business_logic.image_operations import is_supported_image
-from business_logic.pdf_operations import create_postcard_pdf, pair_pdfs
+from business_logic.pairing import plan_pairs
+from business_logic.pdf_operations import create_postcard_pdf, render_pairs
+from business_logic.pdf_optimizer import optimize_stage
+from business_logic.output_uploader import get_uploader
+from business_logic.preview_proxies import get_proxy_image, image_cache_key
+from business_logic.raster_export import export_raster_sheets, RASTER_DPIS, RASTER_FORMATS
 
 def select_images(parent_widget):
-    files, _ = QFileDialog.getOpenFileNames(parent_widget, "Select Images", "", "Image Files (*.png *.jpg *.bmp)")
-    return [f for f in files if is_supported_image(f)]
+    files, _ = QFileDialog.getOpenFileNames(parent_widget, "Select Images", "",
+                                            "Images and Archives (*.png *.jpg *.jpeg *.bmp *.zip *.tar *.tar.gz *.tgz);;"
+                                            "Image Files (*.png *.jpg *.jpeg *.bmp);;Archives (*.zip *.tar *.tar.gz *.tgz)")
+    return [f for f in files if is_supported_image(f) or is_archive(f)]
 
 def generate_pdfs(images, paper_size, parent_widget):
     if not images:
@@ -20,59 +31,125 @@ def generate_pdfs(images, paper_size, parent_widget):
 
     output_dir = QFileDialog.getExistingDirectory(parent_widget, "Select Output Directory")
     if output_dir:
-        for image_path in images:
-            output_pdf = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(image_path))[0]}.pdf")
-            create_postcard_pdf(image_path, output_pdf, paper_size)
-        QMessageBox.information(parent_widget, "Success", "PDFs generated successfully")
+        settings = resolve_render_settings()
+        prepare_images(images, settings)
+        # Rendered to local scratch and copied to the (possibly slow) destination in the background
+        uploader = get_uploader()
+        scratch_dir = uploader.scratch_dir()
+        output_names = output_pdf_names(images)
+        output_pdfs = []
+        for i, image_path in enumerate(images):
+            # Scratch files are numbered, as images from different folders or archives may share a name
+            output_pdf = os.path.join(scratch_dir, f"{i + 1:03d}_{output_names[i]}")
+            create_postcard_pdf(image_path, output_pdf, paper_size, settings=settings)
+            output_pdfs.append(output_pdf)
+        reports = optimize_stage(output_pdfs, settings)
+        for output_pdf, name in zip(output_pdfs, output_names):
+            uploader.submit(output_pdf, output_dir, name)
+        message = "PDFs generated successfully, copying to the output directory in the background"
+        if reports:
+            saved = sum(report['before_bytes'] - report['after_bytes'] for report in reports)
+            message += f" ({saved / 1024:.0f} KB saved by optimization)"
+        QMessageBox.information(parent_widget, "Success", message)
+
+def output_pdf_names(images):
+    """One PDF file name per image, from the image's name; repeated names get a counter."""
+    names, taken = [], set()
+    for image_path in images:
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        name, count = f"{stem}.pdf", 1
+        while name.lower() in taken:  # Output folders may be case-insensitive
+            count += 1
+            name = f"{stem}_{count}.pdf"
+        taken.add(name.lower())
+        names.append(name)
+    return names
+
+def export_raster_wrapper(images, paper_size, parent_widget):
+    if not images:
+        QMessageBox.warning(parent_widget, "Warning", "No images selected")
+        return
+
+    dpi, ok = QInputDialog.getItem(parent_widget, "Export Raster Sheets", "DPI:", [str(dpi) for dpi in RASTER_DPIS], 0, False)
+    if not ok:
+        return
+    fmt, ok = QInputDialog.getItem(parent_widget, "Export Raster Sheets", "Format:", list(RASTER_FORMATS), 0, False)
+    if not ok:
+        return
+
+    output_dir = QFileDialog.getExistingDirectory(parent_widget, "Select Output Directory")
+    if output_dir:
+        outputs = export_raster_sheets(images, output_dir, paper_size, int(dpi), fmt)
+        QMessageBox.information(parent_widget, "Success", f"{len(outputs)} raster sheets exported successfully")
+
+def pair_pdfs_wrapper(front_images, back_images, paper_size, parent_widget, mode='one_to_one'):
+    manifest = None
+    if mode == 'manifest':
+        manifest, _ = QFileDialog.getOpenFileName(parent_widget, "Select Pairing Manifest", "", "CSV Files (*.csv)")
+        if not manifest:
+            return
+    try:
+        pairs = plan_pairs(front_images, back_images, mode, manifest)
+    except (ValueError, OSError) as e:
+        QMessageBox.warning(parent_widget, "Warning", str(e))
+        return
 
-def pair_pdfs_wrapper(front_images, back_images, paper_size, parent_widget):
     output_dir = QFileDialog.getExistingDirectory(parent_widget, "Select Output Directory for Paired PDFs")
     if output_dir:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            front_pdfs = [create_temp_pdf(img, temp_dir, paper_size, i, 'front') for i, img in enumerate(front_images)]
-            back_pdfs = [create_temp_pdf(img, temp_dir, paper_size, i, 'back') for i, img in enumerate(back_images)]
-            paired_pdfs = pair_pdfs(front_pdfs, back_pdfs, output_dir)
-        
-        QMessageBox.information(parent_widget, "Success", f"{len(paired_pdfs)} PDFs paired successfully")
-
-def create_preview_pdfs(front_images, back_images, paper_size, temp_dir):
-    front_pdfs = [create_temp_pdf(img, temp_dir, paper_size, i, 'front') for i, img in enumerate(front_images)]
-    back_pdfs = [create_temp_pdf(img, temp_dir, paper_size, i, 'back') for i, img in enumerate(back_images)]
-    return front_pdfs, back_pdfs
-
-def create_temp_pdf(image_path, temp_dir, paper_size, index, side, force_create=False):
-    temp_pdf = os.path.join(temp_dir, f"{side}_{index}.pdf")
-    if force_create or not os.path.exists(temp_pdf):
-        create_postcard_pdf(image_path, temp_pdf, paper_size)
-    return temp_pdf
-
-def get_pdf_pixmap(pdf_path, max_width, max_height):
-    doc = fitz.open(pdf_path)
-    page = doc.load_page(0)  # Load the first page
-    
-    # Print the original page size
-    print(f"Original PDF page size: {page.rect.width}x{page.rect.height}")
-    
-    zoom_x = max_width / page.rect.width
-    zoom_y = max_height / page.rect.height
-    zoom = min(zoom_x, zoom_y) * 0.95  # 0.95 to leave a small margin
-    
-    # Print the calculated zoom factor
-    print(f"Calculated zoom factor: {zoom}")
-    
-    mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat)
-    
-    img = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
-    pixmap = QPixmap.fromImage(img)
-    
-    # Draw a border around the pixmap
-    painter = QPainter(pixmap)
-    painter.setPen(QPen(Qt.black, 2))
-    painter.drawRect(pixmap.rect())
-    painter.end()
-    
-    return pixmap
+        settings = resolve_render_settings()
+        uploader = get_uploader()
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                paired_pdfs = render_pairs(pairs, paper_size, uploader.scratch_dir(), temp_dir, settings)
+        except (ValueError, OSError) as e:
+            QMessageBox.warning(parent_widget, "Warning", f"Pairing failed: {e}")
+            return
+        for paired_pdf in paired_pdfs:
+            uploader.submit(paired_pdf, output_dir)
+
+        QMessageBox.information(parent_widget, "Success",
+                                f"{len(paired_pdfs)} PDFs paired successfully, copying to the output directory in the background")
+
+def preview_pdf_path(image_path, temp_dir, paper_size, settings, quality):
+    # Cached per image, paper size, render settings and quality
+    key = hashlib.sha1(f"{image_cache_key(image_path)}|{paper_size}|{settings!r}|{quality}".encode()).hexdigest()[:16]
+    return os.path.join(temp_dir, f"preview_{key}.pdf")
+
+def create_preview_pdf(image_path, temp_dir, paper_size, settings, quality):
+    """Preview sheet drawn from the proxy image for ``quality``."""
+    preview_pdf = preview_pdf_path(image_path, temp_dir, paper_size, settings, quality)
+    if not os.path.exists(preview_pdf):
+        proxy_path = get_proxy_image(image_path, quality, temp_dir)
+        create_postcard_pdf(image_path, preview_pdf, paper_size, draw_image_path=proxy_path, settings=settings)
+    return preview_pdf
+
+class RenderedPage:
+    """A rendered PDF page as a QImage that reads straight from the fitz pixmap's memory.
+
+    QImage does not own memory it is built over, so the fitz pixmap is kept
+    here and the RenderedPage must stay referenced while the image is drawn.
+    """
+    def __init__(self, pix):
+        self.pix = pix
+        self.image = QImage(sip.voidptr(pix.samples_ptr), pix.width, pix.height, pix.stride, QImage.Format_RGB888)
+        self.nbytes = pix.stride * pix.height
+
+        instrumentation.increment('render.frames')
+        instrumentation.increment('render.frame_bytes', self.nbytes)
+        instrumentation.set_value('render.last_frame_bytes', self.nbytes)
+
+def render_pdf_page(pdf_path, max_width, max_height, page_num=0):
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        page = doc.load_page(page_num)
+
+        zoom_x = max_width / page.rect.width
+        zoom_y = max_height / page.rect.height
+        zoom = min(zoom_x, zoom_y) * 0.95  # 0.95 to leave a small margin
+
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return RenderedPage(pix)
 
 def cleanup_temp_files(temp_dir):
     try:
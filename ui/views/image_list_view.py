@@ -1,19 +1,37 @@
 import os
 from PyQt5.QtWidgets import QHBoxLayout, QWidget, QLabel, QListWidget, QListWidgetItem, QCheckBox, QPushButton, QMenu
-from PyQt5.QtCore import Qt, QPoint, pyqtSignal
-from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QColor, QBrush
+from PyQt5.QtCore import Qt, QPoint, QTimer, pyqtSignal
+from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QColor, QBrush, QPixmap
 
+from ..controllers.import_worker import ImportWorker
+from business_logic.archive_sources import is_archive
 from business_logic.image_operations import is_supported_image
 
+THUMBNAIL_EDGE = 32
+ROW_BATCH_SIZE = 20  # Rows created per pass of the event loop when listing imported files
+
 class ImageListWidget(QListWidget):
+    # Emitted once per user action that changes the front/back selection
+    selection_changed = pyqtSignal()
+    # Emitted with the paths that were not imported because their content is already listed
+    duplicates_skipped = pyqtSignal(list)
+    # Emitted with the paths newly added to the list
+    files_added = pyqtSignal(list)
+    # Emitted with the paths added once a background import has finished
+    import_finished = pyqtSignal(list)
+
     def __init__(self, file_manager, pdf_preview):
         super().__init__()
         self.file_manager = file_manager
         self.pdf_preview = pdf_preview
+        self.importers = []
+        self.pending_row_batches = 0
+        self.widgets_by_path = {}  # Rows looked up by path, so background updates stay cheap in long lists
         persisted_files = file_manager.images
         self.setAcceptDrops(True)
         self.setDragDropMode(QListWidget.DragDrop)
         self.setSelectionMode(QListWidget.ExtendedSelection)
+        self.selection_changed.connect(self.pdf_preview.update_preview_display)
         self._setup_header()
         self.add_items(persisted_files)
         self.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -45,9 +63,10 @@ class ImageListWidget(QListWidget):
 
     def clear_all(self):
         self.clear()
+        self.widgets_by_path.clear()
         self._setup_header()
         self.file_manager.clear_files()
-        self.pdf_preview.update_preview_display()
+        self.selection_changed.emit()
 
     def show_context_menu(self, position: QPoint):
         menu = QMenu()
@@ -60,26 +79,30 @@ class ImageListWidget(QListWidget):
         for item in self.selectedItems():
             image_widget = self.itemWidget(item)
             self.file_manager.remove_file(image_widget.image_path)
+            self.widgets_by_path.pop(image_widget.image_path, None)
             self.takeItem(self.row(item))
-            self.pdf_preview.update_preview_display()
+        self.update_select_all_checkbox_state()
+        self.selection_changed.emit()
     
     def add_item(self, file, auto_select_front=False, auto_select_back=False):
         item = QListWidgetItem(self)
         image_widget = ImageListItem(file, self.file_manager, self.pdf_preview)
-        image_widget.checkbox_changed.connect(self.update_select_all_checkbox_state)
+        image_widget.checkbox_changed.connect(self.on_item_checkbox_changed)
         
         # Set checkbox state based on FileManager's selection
-        image_widget.front_checkbox.setChecked(file in self.file_manager.front_images)
-        image_widget.back_checkbox.setChecked(file in self.file_manager.back_images)
+        image_widget.set_checked(file in self.file_manager.front_images, file in self.file_manager.back_images)
+        image_widget.set_metadata(self.file_manager.metadata.get(file))
         
         item.setSizeHint(image_widget.sizeHint())
         self.setItemWidget(item, image_widget)
+        self.widgets_by_path[file] = image_widget
         return image_widget
     
     def add_items(self, files):
         for file in files:
             self.add_item(file)
-        self.pdf_preview.update_preview_display()
+        self.update_select_all_checkbox_state()
+        self.selection_changed.emit()
 
     def dragEnterEvent(self, event: QDragEnterEvent):
         print("Drag enter event received in ImageListWidget")
@@ -100,58 +123,108 @@ class ImageListWidget(QListWidget):
         if event.mimeData().hasUrls():
             event.setDropAction(Qt.CopyAction)
             event.accept()
-            files = [u.toLocalFile() for u in event.mimeData().urls() if is_supported_image(u.toLocalFile())]
+            files = [u.toLocalFile() for u in event.mimeData().urls() if is_supported_image(u.toLocalFile()) or is_archive(u.toLocalFile())]
             if files:
                 self.handle_file_list_drop(event)
         else:
             super().dropEvent(event)
 
+    def update_metadata(self, record):
+        image_widget = self.widgets_by_path.get(record['path'])
+        if image_widget:
+            image_widget.set_metadata(record)
+
+    def image_widgets(self):
+        return [self.itemWidget(self.item(index)) for index in range(1, self.count())]  # Skip header
+
     def update_all_checkboxes(self, is_front, is_checked):
-        for index in range(1, self.count()):  # Start from 1 to skip header
-            item = self.item(index)
-            image_widget = self.itemWidget(item)
+        for image_widget in self.image_widgets():
             if image_widget:
                 if is_front:
-                    image_widget.front_checkbox.setChecked(is_checked)
+                    image_widget.set_checked(front=is_checked)
                 else:
-                    image_widget.back_checkbox.setChecked(is_checked)
+                    image_widget.set_checked(back=is_checked)
 
     def update_select_all_checkbox_state(self):
-        # Check if all front checkboxes are checked
-        all_front_checked = all(
-            self.itemWidget(self.item(i)).front_checkbox.isChecked()
-            for i in range(1, self.count())
-        )
-        self.select_all_front.setChecked(all_front_checked)
-
-        # Check if all back checkboxes are checked
-        all_back_checked = all(
-            self.itemWidget(self.item(i)).back_checkbox.isChecked()
-            for i in range(1, self.count())
-        )
-        self.select_all_back.setChecked(all_back_checked)
+        front_images, back_images = self.file_manager.get_selected_images()
+        images = self.file_manager.get_images()
+        self._set_header_checked(self.select_all_front, bool(images) and len(front_images) == len(images))
+        self._set_header_checked(self.select_all_back, bool(images) and len(back_images) == len(images))
+
+    def _set_header_checked(self, checkbox, checked):
+        # The header handlers would otherwise re-apply select-all to every row
+        checkbox.blockSignals(True)
+        checkbox.setChecked(checked)
+        checkbox.blockSignals(False)
+
+    def on_item_checkbox_changed(self):
+        self.update_select_all_checkbox_state()
+        self.selection_changed.emit()
+
+    def set_all_selected(self, is_front, checked):
+        """Select or deselect every row on one side as a single update."""
+        self.file_manager.select_all(is_front, checked)
+        self.update_all_checkboxes(is_front, checked)
+        self.update_select_all_checkbox_state()
+        self.selection_changed.emit()
 
     def select_all_front_images(self, state):
-        checked = state == Qt.Checked
-        self.file_manager.select_all(True, checked)
-        self.update_all_checkboxes(True, checked)
-        self.pdf_preview.update_preview_display()
+        self.set_all_selected(True, state == Qt.Checked)
 
     def select_all_back_images(self, state):
-        checked = state == Qt.Checked
-        self.file_manager.select_all(False, checked)
-        self.update_all_checkboxes(False, checked)
-        self.pdf_preview.update_preview_display()
+        self.set_all_selected(False, state == Qt.Checked)
 
     def handle_file_list_drop(self, event):
         if event.mimeData().hasUrls():
             event.setDropAction(Qt.CopyAction)
             event.accept()
-            files = [u.toLocalFile() for u in event.mimeData().urls() if is_supported_image(u.toLocalFile())]
+            files = [u.toLocalFile() for u in event.mimeData().urls() if is_supported_image(u.toLocalFile()) or is_archive(u.toLocalFile())]
             if files:
-                added_files = self.file_manager.add_files(files)
-                self.add_items(added_files)
-                self.pdf_preview.update_preview_display()
+                self.import_files(files)
+
+    def import_files(self, files):
+        """Import ``files`` in the background; they are listed once hashed and probed."""
+        if not files:
+            return
+        importer = ImportWorker(self.file_manager, files)
+        importer.scanned.connect(self.on_files_scanned)
+        importer.finished.connect(lambda: self.importers.remove(importer))
+        self.importers.append(importer)
+        importer.start()
+
+    def on_files_scanned(self, scan):
+        added_files = self.file_manager.merge_scanned(scan)
+        duplicates = [file for file in scan['files'] if file in self.file_manager.duplicates]
+        if duplicates:
+            self.duplicates_skipped.emit(duplicates)
+        self.pending_row_batches += 1
+        self._add_row_batch(added_files, 0)
+
+    def _add_row_batch(self, added_files, start):
+        # Creating a row widget takes a couple of milliseconds, so a large import
+        # is listed a batch at a time instead of in one long block
+        for file in added_files[start:start + ROW_BATCH_SIZE]:
+            if file in self.file_manager.images:  # Not removed or cleared in the meantime
+                self.add_item(file)
+        start += ROW_BATCH_SIZE
+        if start < len(added_files):
+            QTimer.singleShot(0, lambda: self._add_row_batch(added_files, start))
+            return
+
+        self.pending_row_batches -= 1
+        self.update_select_all_checkbox_state()
+        self.selection_changed.emit()
+        if added_files:
+            self.files_added.emit(added_files)
+        self.import_finished.emit(added_files)
+
+    def is_importing(self):
+        return bool(self.importers) or self.pending_row_batches > 0
+
+    def stop_imports(self):
+        for importer in list(self.importers):
+            importer.requestInterruption()
+            importer.wait()
 
     def dropEvent(self, event):
         self.handle_file_list_drop(event)
@@ -171,19 +244,49 @@ class ImageListItem(QWidget):
         layout.setContentsMargins(5, 2, 5, 2)
         self.front_checkbox = QCheckBox("Front")
         self.back_checkbox = QCheckBox("Back")
+        self.thumbnail_label = QLabel()
+        self.thumbnail_label.setFixedSize(THUMBNAIL_EDGE, THUMBNAIL_EDGE)
+        self.thumbnail_label.setAlignment(Qt.AlignCenter)
         self.name_label = QLabel(os.path.basename(self.image_path))
         self.name_label.setMinimumWidth(200)
         layout.addWidget(self.front_checkbox)
         layout.addWidget(self.back_checkbox)
+        layout.addWidget(self.thumbnail_label)
         layout.addWidget(self.name_label)
         layout.addStretch()
 
         self.front_checkbox.stateChanged.connect(self.on_checkbox_changed)
         self.back_checkbox.stateChanged.connect(self.on_checkbox_changed)
 
+    def set_checked(self, front=None, back=None):
+        """Update the checkboxes to match the FileManager without emitting change signals."""
+        for checkbox, checked in ((self.front_checkbox, front), (self.back_checkbox, back)):
+            if checked is not None:
+                checkbox.blockSignals(True)
+                checkbox.setChecked(checked)
+                checkbox.blockSignals(False)
+
+    def set_metadata(self, record):
+        """Show the stored thumbnail and details, or flag a file that can no longer be found."""
+        if not record:
+            return
+        if record.get('missing'):
+            self.name_label.setStyleSheet("color: gray; text-decoration: line-through;")
+            self.setToolTip(f"File not found: {self.image_path}")
+            return
+        self.name_label.setStyleSheet("")
+        details = [self.image_path]
+        if record.get('width'):
+            details.append(f"{record['width']} x {record['height']} px")
+        if record.get('dpi_x'):
+            details.append(f"{round(record['dpi_x'])} DPI")
+        self.setToolTip("\n".join(details))
+        if record.get('thumbnail') and os.path.exists(record['thumbnail']):
+            pixmap = QPixmap(record['thumbnail'])
+            self.thumbnail_label.setPixmap(pixmap.scaled(THUMBNAIL_EDGE, THUMBNAIL_EDGE, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+
     def on_checkbox_changed(self):
         is_front = self.sender() == self.front_checkbox
         is_checked = self.sender().isChecked()
         if self.file_manager.update_image_list(self.image_path, is_checked, is_front):
-            self.pdf_preview.update_preview_display()
             self.checkbox_changed.emit()
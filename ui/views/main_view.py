@@ -1,14 +1,12 @@
 import os
 
 from PyQt5.QtWidgets import QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QFileDialog, QComboBox, QLabel, QMessageBox, QListWidgetItem, QCheckBox, QSplitter, QAction
-from PyQt5.QtCore import Qt, QMarginsF
+from PyQt5.QtCore import Qt, QMarginsF, QTimer, pyqtSignal
 from PyQt5.QtGui import QImage, QPainter
 from PyQt5.QtPrintSupport import QPrinter, QPrintDialog
 from PyQt5.QtGui import QPageLayout, QPageSize
 
-import fitz
-
-from ..controllers.view_logic import select_images, generate_pdfs, pair_pdfs_wrapper, cleanup_temp_files, get_pdf_pixmap
+from ..controllers.view_logic import select_images, generate_pdfs, pair_pdfs_wrapper, export_raster_wrapper, cleanup_temp_files, RenderedPage
 from config import get_setting
 
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton
@@ -17,19 +15,38 @@ from .settings_view import SettingsDialog
 from .image_list_view import ImageListWidget
 from .pdf_view import PdfPreviewWidget
 from ..controllers.file_controller import FileManager
+from ..controllers.session_revalidator import SessionRevalidator
+from business_logic.output_uploader import get_uploader, shutdown_uploader
+
+PAIRING_MODE_LABELS = {
+    'one_to_one': 'One to one',
+    'shared_back': 'One back for all',
+    'cyclic': 'Cycle backs',
+    'manifest': 'From manifest...',
+}
+
+REFRESH_BATCH_SIZE = 50  # Refreshed rows applied per pass of the event loop
 
 class PostcardApp(QMainWindow):
+    # Emitted from an uploader thread with the kept local path, the destination and the error
+    upload_failed = pyqtSignal(str, str, str)
+
     def __init__(self):
         super().__init__()
         self.images = []
         self.front_images = []
         self.back_images = []
         self.file_manager = FileManager()
+        self.revalidators = []
+        self.refreshed_records = []
         self.setWindowTitle("Postcard Automater")
         self.create_menu_bar()
         self.initUI()
         self.setMinimumSize(1000, 600)
         self.setAcceptDrops(True)
+        self.start_revalidation(self.file_manager.images)
+        self.upload_failed.connect(self.show_upload_failure)
+        get_uploader().add_failure_listener(self.upload_failed.emit)
 
     def initUI(self):
         self.setWindowTitle('Postcard Printer')
@@ -50,12 +67,17 @@ class PostcardApp(QMainWindow):
         self.paper_size_combo = QComboBox()
         self.paper_size_combo.addItems(list(get_setting('paper_sizes').keys()))
         self.generate_button = QPushButton('Generate PDFs')
+        self.pairing_mode_combo = QComboBox()
+        for mode, label in PAIRING_MODE_LABELS.items():
+            self.pairing_mode_combo.addItem(label, mode)
         self.pair_button = QPushButton('Pair PDFs')
 
         left_layout.addWidget(self.select_images_button)
         left_layout.addWidget(QLabel('Paper Size:'))
         left_layout.addWidget(self.paper_size_combo)
         left_layout.addWidget(self.generate_button)
+        left_layout.addWidget(QLabel('Pairing:'))
+        left_layout.addWidget(self.pairing_mode_combo)
         left_layout.addWidget(self.pair_button)
         left_layout.addStretch(1)
 
@@ -64,6 +86,8 @@ class PostcardApp(QMainWindow):
 
         self.preview_view = PdfPreviewWidget(self.file_manager, self.paper_size_combo)
         self.file_list = ImageListWidget(self.file_manager, self.preview_view)
+        self.file_list.duplicates_skipped.connect(self.show_duplicates)
+        self.file_list.files_added.connect(self.start_revalidation)
 
         self.splitter = QSplitter(Qt.Vertical)
         self.splitter.addWidget(self.preview_view)
@@ -80,15 +104,41 @@ class PostcardApp(QMainWindow):
         self.pair_button.clicked.connect(self.on_pair_pdfs)
         self.paper_size_combo.currentIndexChanged.connect(self.preview_view.update_preview_display)
         
+    def start_revalidation(self, paths):
+        # Restored images are checked against their files, and thumbnails made
+        # for new ones, without holding up startup or the import
+        revalidator = SessionRevalidator([self.file_manager.metadata[path] for path in paths])
+        revalidator.record_refreshed.connect(self.on_record_refreshed)
+        revalidator.finished.connect(lambda: self.revalidators.remove(revalidator))
+        self.revalidators.append(revalidator)
+        revalidator.start()
+
+    def on_record_refreshed(self, record):
+        # A re-imported folder whose thumbnails are already cached refreshes every
+        # row almost at once, so rows are applied a batch at a time
+        self.refreshed_records.append(record)
+        if len(self.refreshed_records) == 1:
+            QTimer.singleShot(0, self.apply_refreshed_records)
+
+    def apply_refreshed_records(self):
+        batch = self.refreshed_records[:REFRESH_BATCH_SIZE]
+        del self.refreshed_records[:REFRESH_BATCH_SIZE]
+        for record in batch:
+            self.file_manager.update_metadata(record)
+            self.file_list.update_metadata(record)
+            if record.get('missing'):
+                self.statusBar().showMessage(f"Image not found: {record['path']}", 10000)
+        if self.refreshed_records:
+            QTimer.singleShot(0, self.apply_refreshed_records)
+
     def open_settings(self):
         dialog = SettingsDialog(self)
         if dialog.exec_() == QDialog.Accepted:
             self.apply_settings()
 
     def apply_settings(self):
-        # Apply the new settings to your application
-        # For example:
-        pass
+        # DPI and preview quality both change what the preview shows
+        self.preview_view.update_preview_display()
     
     def create_menu_bar(self):
         menubar = self.menuBar()
@@ -125,6 +175,11 @@ class PostcardApp(QMainWindow):
         pair_pdfs_action.triggered.connect(self.on_pair_pdfs)
         tools_menu.addAction(pair_pdfs_action)
 
+        # Add 'Export Raster Sheets' action to Tools menu
+        export_raster_action = QAction('Export Raster Sheets', self)
+        export_raster_action.triggered.connect(self.on_export_raster)
+        tools_menu.addAction(export_raster_action)
+
         # Settings menu
         settings_menu = menubar.addMenu('Settings')
         
@@ -145,6 +200,8 @@ class PostcardApp(QMainWindow):
             self.handle_printing(printer)
 
     def handle_printing(self, printer):
+        import fitz
+
         if not self.front_images or not self.back_images:
             QMessageBox.warning(self, "Printing Error", "Both front and back images are required for printing.")
             return
@@ -180,11 +237,10 @@ class PostcardApp(QMainWindow):
                         printer.newPage()
                     
                     page = doc.load_page(page_num)
-                    pix = page.get_pixmap()
-                    img = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
+                    rendered = RenderedPage(page.get_pixmap(alpha=False))
                     
                     # Draw the image on the full page
-                    painter.drawImage(printer.pageRect(QPrinter.DevicePixel), img)
+                    painter.drawImage(printer.pageRect(QPrinter.DevicePixel), rendered.image)
                 
                 doc.close()
         finally:
@@ -194,28 +250,48 @@ class PostcardApp(QMainWindow):
 
     def on_select_images(self):
         new_images = select_images(self)
-        self.file_manager.add_files(new_images)
-        self.file_list.add_items(new_images)
-        self.preview_view.update_preview_display()
+        self.file_list.import_files(new_images)
+
+    def show_upload_failure(self, local_path, destination_dir, error):
+        self.statusBar().showMessage(
+            f"Could not copy {os.path.basename(local_path)} to {destination_dir} ({error}); kept at {local_path}")
+
+    def show_duplicates(self, duplicates):
+        names = ', '.join(
+            f"{os.path.basename(path)} (same as {os.path.basename(self.file_manager.duplicates[path])})"
+            for path in duplicates
+        )
+        self.statusBar().showMessage(f"Skipped {len(duplicates)} duplicate image(s): {names}", 10000)
     
     def on_generate_pdfs(self):
         paper_size = self.paper_size_combo.currentText()
         generate_pdfs(self.file_manager.images, paper_size, self)
 
+    def on_export_raster(self):
+        paper_size = self.paper_size_combo.currentText()
+        export_raster_wrapper(self.file_manager.images, paper_size, self)
+
     def on_pair_pdfs(self):
         front_images, back_images = self.file_manager.get_selected_images()
-        if not front_images or not back_images:
-            QMessageBox.warning(self, "Warning", "Both front and back images are required for pairing")
-            return
         paper_size = self.paper_size_combo.currentText()
-        pair_pdfs_wrapper(front_images, back_images, paper_size, self)
+        pair_pdfs_wrapper(front_images, back_images, paper_size, self, self.pairing_mode_combo.currentData())
 
     def handle_preview_drop(self, files):
-        self.file_manager.add_files(files)
-        self.file_list.add_items(files)
-        self.preview_view.update_preview_display()
+        self.file_list.import_files(files)
 
     def closeEvent(self, event):
+       self.file_list.stop_imports()
+       for revalidator in list(self.revalidators):
+           revalidator.requestInterruption()
+           revalidator.wait()
        self.file_manager.save_persisted_files()
+       self.preview_view.stop()
+       # Outputs still being copied to their destination are finished before exit
+       failures = shutdown_uploader()
+       if failures:
+           QMessageBox.warning(self, "Outputs not copied",
+                               f"{len(failures)} output(s) could not be copied to their destination "
+                               "and were kept locally:\n\n" +
+                               '\n'.join(f"{local_path} (for {destination_dir})" for local_path, destination_dir, _ in failures))
        cleanup_temp_files(self.file_manager.temp_dir)
        super().closeEvent(event)
@@ -1,61 +1,248 @@
-from PyQt5.QtWidgets import QPushButton, QHBoxLayout, QWidget, QLabel
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QDragEnterEvent, QDropEvent
+from PyQt5.QtWidgets import QAbstractScrollArea, QHBoxLayout, QWidget
+from PyQt5.QtCore import Qt, QRect, pyqtSignal
+from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QPainter, QPen
 
-from ..controllers.view_logic import get_pdf_pixmap, create_preview_pdfs
+import time
+from collections import OrderedDict
+
+from ..controllers.preview_loader import PreviewJob, PreviewLoader
+from business_logic import instrumentation
+from business_logic.preview_proxies import PREVIEW_QUALITIES, refinement_levels
+from config import get_setting, resolve_render_settings
+from business_logic.archive_sources import is_archive
 from business_logic.image_operations import is_supported_image
 
-from PyQt5.QtWidgets import QHBoxLayout, QLabel, QPushButton
+STRIP_CACHE_BYTES = 96 * 1024 * 1024  # Rendered pages kept per strip
+PREFETCH_CELLS = 3  # Cells rendered ahead of the viewport in each direction
+CELL_SPACING = 8
 
 class PdfPreviewWidget(QWidget):
+    """Front and back page strips that only render the cells being looked at.
+
+    Cells in the viewport are rendered first, coarsest quality first, then
+    their neighbours are prefetched; everything else is left until it is
+    scrolled to. The two strips scroll together.
+    """
     def __init__(self, file_manager, paper_size_combo):
         super().__init__()
         self.file_manager = file_manager
         self.paper_size_combo = paper_size_combo
+        self.generation = 0
+        self.paper_size = None
+        self.settings = None
+        self.qualities = ()
+        self.loader = PreviewLoader(file_manager.temp_dir)
+        self.loader.page_ready.connect(self.on_page_ready)
+        self.loader.start()
         self._setup_ui()
 
     def _setup_ui(self):
         self.layout = QHBoxLayout(self)
-        self.front_viewer = PdfViewer(is_front=True, parent=self)
-        self.back_viewer = PdfViewer(is_front=False, parent=self)
-        self.layout.addWidget(self.front_viewer)
-        self.layout.addWidget(self.back_viewer)
+        self.front_strip = PageStrip(is_front=True, parent=self)
+        self.back_strip = PageStrip(is_front=False, parent=self)
+        self.layout.addWidget(self.front_strip)
+        self.layout.addWidget(self.back_strip)
+
+        self.syncing_scroll = False
+        for strip, other in ((self.front_strip, self.back_strip), (self.back_strip, self.front_strip)):
+            strip.verticalScrollBar().valueChanged.connect(lambda value, other=other: self.sync_scroll(other, value))
+            strip.viewport_changed.connect(self.request_pages)
+
+    def sync_scroll(self, other, value):
+        # Guarded so a strip with fewer cells clamping the value cannot pull the other one back
+        if not self.syncing_scroll:
+            self.syncing_scroll = True
+            other.verticalScrollBar().setValue(value)
+            self.syncing_scroll = False
+
+    def strips(self):
+        return (self.front_strip, self.back_strip)
 
     def update_preview_display(self):
         front_images, back_images = self.file_manager.get_selected_images()
-        paper_size = self.paper_size_combo.currentText()
-        front_pdfs, back_pdfs = create_preview_pdfs(front_images, back_images, paper_size, self.file_manager.temp_dir)
-        self.front_viewer.load_pdfs(front_pdfs)
-        self.back_viewer.load_pdfs(back_pdfs)
+        self.paper_size = self.paper_size_combo.currentText()
+        self.qualities = refinement_levels(get_setting('user_modifiable.preview_quality'))
+        self.settings = resolve_render_settings()
+        paper_width, paper_height = self.settings.paper_size(self.paper_size)
+
+        self.generation += 1
+        self.pass_started = time.perf_counter()
+        self.first_page_shown = False
+        render_key = (self.paper_size, self.settings)
+        self.front_strip.set_images(list(front_images), paper_height / paper_width, render_key)
+        self.back_strip.set_images(list(back_images), paper_height / paper_width, render_key)
+        self.request_pages()
+
+    def request_pages(self):
+        """Queue renders for the visible cells and their neighbours, most needed first."""
+        if self.settings is None:
+            return
+        rows = {strip: (strip.visible_rows(), strip.nearby_rows(PREFETCH_CELLS)) for strip in self.strips()}
+        coarsest, finer = self.qualities[:1], self.qualities[1:]
+        jobs = []
+        for near, qualities in ((0, coarsest), (0, finer), (1, coarsest), (1, finer)):
+            for quality in qualities:
+                for strip in self.strips():
+                    width, height = strip.page_size()
+                    for index in rows[strip][near]:
+                        if strip.needs_page(index, quality):
+                            jobs.append(PreviewJob(self.generation, strip.is_front, index, strip.images[index],
+                                                   self.paper_size, self.settings, quality, width, height))
+        self.loader.set_jobs(jobs)
+
+    def on_page_ready(self, job, page):
+        strip = self.front_strip if job.is_front else self.back_strip
+        # Dropped if the cell's image, the paper size or the settings changed since it was queued
+        if strip.set_page(job, page) and job.generation == self.generation and not self.first_page_shown:
+            self.first_page_shown = True
+            instrumentation.set_value('preview.first_pass_ms', (time.perf_counter() - self.pass_started) * 1000)
+
+    def stop(self):
+        self.loader.stop()
+        self.loader.wait()
+
+class PageStrip(QAbstractScrollArea):
+    """A vertically scrolling column of page previews, one cell per image.
+
+    Only the pages handed in through ``set_page`` are drawn; cells without
+    one show a placeholder. Pages rendered with an older paper size or
+    settings stay on screen until their replacement arrives, and pages far from the viewport are
+    evicted once the strip holds more than STRIP_CACHE_BYTES.
+    """
+    viewport_changed = pyqtSignal()
 
-class PdfViewer(QWidget):
     def __init__(self, is_front, parent=None):
         super().__init__(parent)
         self.is_front = is_front
-        self.pdf_paths = []
-        self.current_page = 0
-        self._setup_ui()
+        self.images = []
+        self.aspect = 297 / 210
+        self.render_key = None  # (paper size, RenderSettings) pages should be rendered with
+        self.pages = OrderedDict()  # index -> (PreviewJob, RenderedPage), least recently drawn first
+        self.cache_bytes = 0
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        # A scroll bar appearing would narrow every cell and force a re-render
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+        self.setAcceptDrops(True)
 
-    def _setup_ui(self):
-        self.layout = QHBoxLayout(self)
-        self.prev_button = QPushButton("<")
-        self.next_button = QPushButton(">")
-        self.image_label = QLabel(f"No image selected")
-        self.image_label.setAlignment(Qt.AlignCenter)
-        
-        self.layout.addWidget(self.prev_button)
-        self.layout.addWidget(self.image_label, 1)
-        self.layout.addWidget(self.next_button)
-
-        self.prev_button.clicked.connect(self.show_previous)
-        self.next_button.clicked.connect(self.show_next)
+    def set_images(self, images, aspect, render_key):
+        self.images = images
+        self.aspect = aspect
+        self.render_key = render_key
+        for index in [i for i, (job, _) in self.pages.items() if i >= len(images) or job.image_path != images[i]]:
+            self._evict(index)
+        self._update_scroll_range()
+        self.viewport().update()
 
-        self.setAcceptDrops(True)
+    def cell_height(self):
+        return self.page_size()[1] + CELL_SPACING
 
-    def load_pdfs(self, pdf_paths):
-        self.pdf_paths = pdf_paths or []
-        self.current_page = 0
-        self.update_display()
+    def page_size(self):
+        width = max(self.viewport().width() - 2 * CELL_SPACING, 16)
+        return width, round(width * self.aspect)
+
+    def visible_rows(self):
+        if not self.images:
+            return range(0)
+        top = self.verticalScrollBar().value()
+        first = top // self.cell_height()
+        last = (top + self.viewport().height()) // self.cell_height()
+        return range(first, min(last + 1, len(self.images)))
+
+    def nearby_rows(self, count):
+        """Rows just outside the viewport, nearest first."""
+        visible = self.visible_rows()
+        if not visible:
+            return []
+        rows = []
+        for step in range(1, count + 1):
+            rows.extend(row for row in (visible.stop - 1 + step, visible.start - step) if 0 <= row < len(self.images))
+        return rows
+
+    def needs_page(self, index, quality):
+        entry = self.pages.get(index)
+        if entry is None:
+            return True
+        job = entry[0]
+        return ((job.paper_size, job.settings) != self.render_key
+                or (job.width, job.height) != self.page_size()
+                or PREVIEW_QUALITIES.index(job.quality) < PREVIEW_QUALITIES.index(quality))
+
+    def set_page(self, job, page):
+        """Show a rendered page, unless it is out of date. Returns whether it was taken."""
+        if (job.index >= len(self.images) or job.image_path != self.images[job.index]
+                or (job.paper_size, job.settings) != self.render_key):
+            return False
+        current = self.pages.get(job.index)
+        if current and not self.needs_page(job.index, job.quality) and current[0].quality != job.quality:
+            return False  # A finer render of this cell is already showing
+        self._evict(job.index)
+        self.pages[job.index] = (job, page)
+        self.cache_bytes += page.nbytes
+        self._trim_cache()
+        instrumentation.set_value(f"preview.{'front' if self.is_front else 'back'}_cache_bytes", self.cache_bytes)
+        if job.index in self.visible_rows():
+            self.viewport().update()
+        return True
+
+    def _evict(self, index):
+        entry = self.pages.pop(index, None)
+        if entry:
+            self.cache_bytes -= entry[1].nbytes
+
+    def _trim_cache(self):
+        visible = self.visible_rows()
+        for index in list(self.pages):
+            if self.cache_bytes <= STRIP_CACHE_BYTES:
+                break
+            if index not in visible:
+                self._evict(index)
+
+    def _update_scroll_range(self):
+        scroll_bar = self.verticalScrollBar()
+        content_height = len(self.images) * self.cell_height()
+        scroll_bar.setRange(0, max(content_height - self.viewport().height(), 0))
+        scroll_bar.setPageStep(self.viewport().height())
+        scroll_bar.setSingleStep(max(self.cell_height() // 4, 1))
+
+    def on_scrolled(self, value):
+        self.viewport().update()
+        self.viewport_changed.emit()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scroll_range()
+        self.viewport_changed.emit()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        if not self.images:
+            painter.drawText(self.viewport().rect(), Qt.AlignCenter, "No image selected")
+            painter.end()
+            return
+
+        width, height = self.page_size()
+        top = self.verticalScrollBar().value()
+        for index in self.visible_rows():
+            cell = QRect(CELL_SPACING, index * self.cell_height() - top, width, height)
+            entry = self.pages.get(index)
+            if entry is None:
+                painter.setPen(QPen(Qt.lightGray, 1))
+                painter.drawRect(cell.adjusted(0, 0, -1, -1))
+                painter.setPen(Qt.black)
+                painter.drawText(cell, Qt.AlignCenter, f"{index + 1}\nRendering preview...")
+                continue
+            self.pages.move_to_end(index)
+            image = entry[1].image
+            target = QRect(0, 0, image.width(), image.height())
+            if image.width() > width or image.height() > height:
+                # Drawn from a render at another size until its replacement arrives
+                target.setSize(image.size().scaled(cell.size(), Qt.KeepAspectRatio))
+            target.moveCenter(cell.center())
+            painter.drawImage(target, image)
+            painter.setPen(QPen(Qt.black, 2))
+            painter.drawRect(target.adjusted(1, 1, -1, -1))
+        painter.end()
 
     def dragEnterEvent(self, event: QDragEnterEvent):
         if event.mimeData().hasUrls():
@@ -65,37 +252,6 @@ class PdfViewer(QWidget):
         if event.mimeData().hasUrls():
             event.setDropAction(Qt.CopyAction)
             event.accept()
-            files = [u.toLocalFile() for u in event.mimeData().urls() if is_supported_image(u.toLocalFile())]
-            if files:
-                self.main_window.handle_preview_drop(files, self.is_front)
-
-    def update_display(self):
-        print(f"Updating display. Current page: {self.current_page}, Total pages: {len(self.pdf_paths)}")
-        if self.pdf_paths and 0 <= self.current_page < len(self.pdf_paths):
-            pixmap = get_pdf_pixmap(self.pdf_paths[self.current_page], self.image_label.width(), self.image_label.height())
-            if pixmap:
-                print(f"Pixmap created. Size: {pixmap.width()}x{pixmap.height()}")
-                self.image_label.setPixmap(pixmap)
-            else:
-                print("Failed to create pixmap")
-                self.image_label.setText("Failed to load image")
-        else:
-            print("No image selected")
-            self.image_label.setText("No image selected")
-        
-        self.prev_button.setEnabled(self.current_page > 0)
-        self.next_button.setEnabled(self.current_page < len(self.pdf_paths) - 1)
-
-    def show_previous(self):
-        if self.current_page > 0:
-            self.current_page -= 1
-            self.update_display()
-
-    def show_next(self):
-        if self.current_page < len(self.pdf_paths) - 1:
-            self.current_page += 1
-            self.update_display()
-
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        self.update_display()
\ No newline at end of file
+            files = [u.toLocalFile() for u in event.mimeData().urls() if is_supported_image(u.toLocalFile()) or is_archive(u.toLocalFile())]
+            if files and hasattr(self.window(), 'handle_preview_drop'):
+                self.window().handle_preview_drop(files)
@@ -1,5 +1,6 @@
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox, QComboBox, QCheckBox, QPushButton
 from config import get_setting, update_setting
+from business_logic.preview_proxies import PREVIEW_QUALITIES
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -8,6 +9,7 @@ class SettingsDialog(QDialog):
         self.layout = QVBoxLayout(self)
 
         self.dpi_spinbox = self.create_spinbox("Default DPI:", "default_dpi", 72, 1200)
+        self.preview_quality_combobox = self.create_combobox("Preview quality:", "preview_quality", list(PREVIEW_QUALITIES))
         self.persist_files_checkbox = self.create_checkbox("Persist files between app instances", "persist_files")
 
         buttons_layout = QHBoxLayout()
@@ -48,5 +50,6 @@ class SettingsDialog(QDialog):
 
     def save_settings(self):
         update_setting("default_dpi", self.dpi_spinbox.value())
+        update_setting("preview_quality", self.preview_quality_combobox.currentText())
         update_setting("persist_files", self.persist_files_checkbox.isChecked())
         self.accept()
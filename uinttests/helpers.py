@@ -0,0 +1,24 @@
+import os
+from unittest import mock
+
+import config
+from business_logic import content_hash
+from business_logic.content_hash import HashIndex
+
+def isolate_caches(test_case, temp_dir):
+    """Keep a test's content hashes and cached images in ``temp_dir`` instead of the user's cache directory.
+
+    Returns the HashIndex the test's code will use.
+    """
+    index = HashIndex(os.path.join(temp_dir, 'hash_index.json'))
+    patchers = [
+        mock.patch.object(content_hash, '_default_index', index),
+        mock.patch.dict(os.environ, {'XDG_CACHE_HOME': temp_dir, 'LOCALAPPDATA': temp_dir}),
+    ]
+    for patcher in patchers:
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+    # Cache directories are resolved once per session; forget the real ones for this test
+    config.user_cache_dir.cache_clear()
+    test_case.addCleanup(config.user_cache_dir.cache_clear)
+    return index
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import fitz
+from PIL import Image
+
+import config
+from business_logic import archive_sources
+from business_logic.archive_sources import expand_sources, local_path, member_path, open_source, source_stat
+from business_logic.content_hash import hash_file
+from business_logic.pdf_operations import create_postcard_pdf
+from business_logic.session_store import probe_image
+from ui.controllers.file_controller import FileManager
+from uinttests.helpers import isolate_caches
+
+class TestArchiveSources(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.cards = {}
+        for name, color in (('card1.png', 'red'), ('card2.png', 'blue')):
+            path = os.path.join(self.temp_dir, name)
+            Image.new('RGB', (600, 400), color).save(path, dpi=(150, 150))
+            self.cards[name] = path
+
+        self.zip_path = os.path.join(self.temp_dir, 'cards.zip')
+        with zipfile.ZipFile(self.zip_path, 'w') as archive:
+            for name, path in self.cards.items():
+                archive.write(path, f'front/{name}')
+            archive.writestr('front/notes.txt', 'not an image')
+        self.tar_path = os.path.join(self.temp_dir, 'cards.tar.gz')
+        with tarfile.open(self.tar_path, 'w:gz') as archive:
+            for name, path in self.cards.items():
+                archive.add(path, f'back/{name}')
+
+        self.index = isolate_caches(self, self.temp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_archives_expand_to_their_images(self):
+        expanded = expand_sources([self.zip_path, self.cards['card1.png'], self.tar_path])
+        self.assertEqual(expanded, [
+            member_path(self.zip_path, 'front/card1.png'),
+            member_path(self.zip_path, 'front/card2.png'),
+            self.cards['card1.png'],
+            member_path(self.tar_path, 'back/card1.png'),
+            member_path(self.tar_path, 'back/card2.png'),
+        ])
+
+    def test_members_read_like_the_extracted_files(self):
+        for archive_path, folder in ((self.zip_path, 'front'), (self.tar_path, 'back')):
+            member = member_path(archive_path, f'{folder}/card2.png')
+            self.assertEqual(hash_file(member), hash_file(self.cards['card2.png']))
+            with open_source(member) as f:
+                self.assertEqual(f.read(), open(self.cards['card2.png'], 'rb').read())
+            self.assertEqual(source_stat(member).st_size, os.path.getsize(self.cards['card2.png']))
+            probed = probe_image(member)
+            self.assertEqual((probed['width'], probed['height']), (600, 400))
+
+        with self.assertRaises(FileNotFoundError):
+            source_stat(member_path(self.zip_path, 'front/missing.png'))
+
+    def test_compressed_tars_are_hashed_in_one_pass(self):
+        members = expand_sources([self.tar_path])
+        with mock.patch.object(archive_sources, 'hash_member') as random_access, \
+                mock.patch.object(archive_sources.tarfile, 'open', wraps=archive_sources.tarfile.open) as tar_open:
+            hashes = self.index.get_hashes(members + [self.cards['card1.png']])
+        random_access.assert_not_called()
+        self.assertEqual([call.args[1] for call in tar_open.call_args_list], ['r|*'])
+        self.assertEqual(hashes[members[1]], hash_file(self.cards['card2.png']))
+        self.assertEqual(hashes[members[0]], hashes[self.cards['card1.png']])
+        # Stored like any other hash, so a later lookup does not read the archive again
+        self.assertEqual(self.index.cached_hash(members[1]), hashes[members[1]])
+
+    def test_members_are_copied_out_once(self):
+        member = member_path(self.zip_path, 'front/card1.png')
+        path = local_path(member, self.cache_dir)
+        self.assertEqual(local_path(member, self.cache_dir), path)
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(path)])
+        self.assertEqual(hash_file(path), hash_file(self.cards['card1.png']))
+        self.assertEqual(local_path(self.cards['card1.png'], self.cache_dir), self.cards['card1.png'])
+
+    def test_import_and_render_from_an_archive(self):
+        with mock.patch.dict(config.CONFIG['user_modifiable'], {'persist_files': False}):
+            file_manager = FileManager()
+        self.addCleanup(shutil.rmtree, file_manager.temp_dir)
+        # The zip holds the same artwork as the tar, so only the zip's copies are imported
+        added = file_manager.add_files([self.zip_path, self.tar_path])
+        self.assertEqual(added, expand_sources([self.zip_path]))
+
+        output_pdf = os.path.join(self.temp_dir, 'sheet.pdf')
+        total = create_postcard_pdf(added[0], output_pdf, 'A4')
+        self.assertGreater(total, 0)
+        with fitz.open(output_pdf) as document:
+            self.assertEqual(len(document[0].get_images()), 1)
+
+if __name__ == '__main__':
+    unittest.main()
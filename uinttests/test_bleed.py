@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from business_logic.bleed import BLEED_MODES, bleed_image, extend_bleed
+from business_logic.pdf_operations import calculate_optimal_layout, calculate_sheet_geometry
+from uinttests.helpers import isolate_caches
+
+class TestBleed(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        isolate_caches(self, self.temp_dir)
+        self.pixels = np.random.default_rng(0).integers(0, 256, (40, 60, 3), dtype=np.uint8)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_extend_bleed_keeps_the_trimmed_image(self):
+        for mode in BLEED_MODES:
+            extended = extend_bleed(self.pixels, 5, mode)
+            self.assertEqual(extended.shape, (50, 70, 3))
+            np.testing.assert_array_equal(extended[5:-5, 5:-5], self.pixels)
+
+        np.testing.assert_array_equal(extend_bleed(self.pixels, 5, 'mirror')[4, 5:-5], self.pixels[0])
+        np.testing.assert_array_equal(extend_bleed(self.pixels, 5, 'stretch')[0, 5:-5], self.pixels[0])
+        with self.assertRaises(ValueError):
+            extend_bleed(self.pixels, 5, 'smear')
+
+    def test_bleed_wider_than_the_image(self):
+        small = self.pixels[:4, :6]
+        for mode in BLEED_MODES:
+            extended = extend_bleed(small, 10, mode)
+            self.assertEqual(extended.shape, (24, 26, 3))
+            np.testing.assert_array_equal(extended[10:-10, 10:-10], small)
+        # The outermost pixels are repeated all the way out
+        stretched = extend_bleed(small, 10, 'stretch')
+        np.testing.assert_array_equal(stretched[0, 10:-10], small[0])
+        np.testing.assert_array_equal(stretched[10:-10, -1], small[:, -1])
+
+    def test_bleed_image_is_cached(self):
+        path = os.path.join(self.temp_dir, 'card.png')
+        Image.fromarray(self.pixels).save(path)
+        bled_path = bleed_image(path, 1.0, 6.0, 'mirror', self.temp_dir)
+        with Image.open(bled_path) as bled:
+            self.assertEqual(bled.size, (80, 60))
+        mtime = os.stat(bled_path).st_mtime_ns
+        self.assertEqual(bleed_image(path, 1.0, 6.0, 'mirror', self.temp_dir), bled_path)
+        self.assertEqual(os.stat(bled_path).st_mtime_ns, mtime)
+
+    def test_geometry_with_bleed(self):
+        layout = calculate_optimal_layout(152.4, 101.6, 210, 297, 10, bleed=3)
+        geometry = calculate_sheet_geometry(layout, 210, 297, 10)
+        self.assertEqual(geometry['guides'], [])
+        self.assertTrue(geometry['crop_marks'])
+        for (x, y, w, h), (bx, by, bw, bh) in zip(geometry['slots'], geometry['image_slots']):
+            self.assertAlmostEqual(bx, x - 3)
+            self.assertAlmostEqual(by, y - 3)
+            self.assertAlmostEqual((bw, bh), (w + 6, h + 6))
+
+        # No bleed keeps the dashed guides and draws images at the trim size
+        geometry = calculate_sheet_geometry(calculate_optimal_layout(152.4, 101.6, 210, 297, 10), 210, 297, 10)
+        self.assertEqual(geometry['slots'], geometry['image_slots'])
+        self.assertEqual(geometry['crop_marks'], [])
+        self.assertTrue(geometry['guides'])
+
+if __name__ == '__main__':
+    unittest.main()
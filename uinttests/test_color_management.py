@@ -0,0 +1,138 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+import fitz
+from PIL import Image, ImageCms
+
+from business_logic import color_management
+from business_logic.color_management import color_stage, convert_image, embed_output_intent, prepare_images
+from business_logic.pdf_operations import create_postcard_pdf
+from config import resolve_render_settings
+from uinttests.helpers import isolate_caches
+
+def s15_fixed16(value):
+    return struct.pack('>i', round(value * 65536))
+
+def lut16(in_channels, out_channels, clut):
+    # A 2-point grid per input channel, with identity matrix and curves
+    data = b'mft2' + bytes(4) + bytes([in_channels, out_channels, 2, 0])
+    data += b''.join(s15_fixed16(1.0 if i in (0, 4, 8) else 0.0) for i in range(9))
+    data += struct.pack('>HH', 2, 2)
+    data += struct.pack('>HH', 0, 65535) * in_channels
+    data += struct.pack(f'>{len(clut)}H', *clut)
+    data += struct.pack('>HH', 0, 65535) * out_channels
+    return data
+
+def write_cmyk_profile(path, description='Test CMYK'):
+    """A minimal CMYK output profile that prints lightness with black ink only."""
+    # Lab -> CMYK: grid points in L, a, b order, K = 1 - L
+    lab_to_cmyk = []
+    for lightness in (0, 1):
+        for _ in range(4):
+            lab_to_cmyk += [0, 0, 0, (1 - lightness) * 65535]
+    # CMYK -> Lab: grid points in C, M, Y, K order, L = 1 - K
+    cmyk_to_lab = []
+    for _ in range(8):
+        for black in (0, 1):
+            cmyk_to_lab += [(1 - black) * 0xFF00, 0x8000, 0x8000]
+
+    text = description.encode() + b'\0'
+    tags = [
+        (b'desc', b'desc' + bytes(4) + struct.pack('>I', len(text)) + text + bytes(78)),
+        (b'wtpt', b'XYZ ' + bytes(4) + s15_fixed16(0.9642) + s15_fixed16(1.0) + s15_fixed16(0.8249)),
+        (b'cprt', b'text' + bytes(4) + b'none\0'),
+        (b'A2B0', lut16(4, 3, cmyk_to_lab)),
+        (b'B2A0', lut16(3, 4, lab_to_cmyk)),
+    ]
+    offset = 128 + 4 + 12 * len(tags)
+    table, body = struct.pack('>I', len(tags)), b''
+    for signature, data in tags:
+        body += bytes(-(offset + len(body)) % 4)
+        table += signature + struct.pack('>II', offset + len(body), len(data))
+        body += data
+    header = (struct.pack('>I', offset + len(body)) + b'lcms' + struct.pack('>I', 0x02100000) + b'prtrCMYKLab '
+              + bytes(12) + b'acsp' + bytes(24) + struct.pack('>I', 0)
+              + s15_fixed16(0.9642) + s15_fixed16(1.0) + s15_fixed16(0.8249) + bytes(48))
+    with open(path, 'wb') as f:
+        f.write(header + table + body)
+    return path
+
+class TestColorManagement(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        isolate_caches(self, self.temp_dir)
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.profile = write_cmyk_profile(os.path.join(self.temp_dir, 'press.icc'))
+        self.image = os.path.join(self.temp_dir, 'card.png')
+        srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+        Image.new('RGB', (600, 400), (255, 255, 255)).save(self.image, icc_profile=srgb, dpi=(150, 150))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_rgb_is_converted_to_the_output_profile(self):
+        converted = convert_image(self.image, self.profile, cache_dir=self.cache_dir)
+        with Image.open(converted) as img:
+            self.assertEqual(img.mode, 'CMYK')
+            self.assertEqual(img.size, (600, 400))
+            self.assertEqual(img.info['icc_profile'], open(self.profile, 'rb').read())
+            # White paper needs no ink
+            self.assertEqual(img.getpixel((0, 0)), (0, 0, 0, 0))
+
+    def test_conversions_are_cached_by_content(self):
+        first = convert_image(self.image, self.profile, cache_dir=self.cache_dir)
+        copy = os.path.join(self.temp_dir, 'copy.png')
+        shutil.copy(self.image, copy)
+
+        with mock.patch.object(color_management, 'get_transform') as get_transform:
+            self.assertEqual(convert_image(self.image, self.profile, cache_dir=self.cache_dir), first)
+            self.assertEqual(convert_image(copy, self.profile, cache_dir=self.cache_dir), first)
+            get_transform.assert_not_called()
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(first)])
+
+        other_intent = convert_image(self.image, self.profile, 'relative_colorimetric', cache_dir=self.cache_dir)
+        self.assertNotEqual(other_intent, first)
+
+    def test_stage_is_skipped_without_an_output_profile(self):
+        settings = resolve_render_settings(output_profile=None)
+        self.assertEqual(color_stage(self.image, settings), self.image)
+
+        settings = resolve_render_settings(output_profile=self.profile)
+        with mock.patch.object(color_management, 'convert_image', wraps=color_management.convert_image) as convert:
+            prepare_images([self.image, self.image], settings)
+            self.assertEqual(convert.call_count, 1)
+            converted = color_stage(self.image, settings)
+        with Image.open(converted) as img:
+            self.assertEqual(img.mode, 'CMYK')
+
+    def test_output_intent_is_embedded(self):
+        output_pdf = os.path.join(self.temp_dir, 'sheet.pdf')
+        settings = resolve_render_settings(pdf_backend='pymupdf', output_profile=self.profile)
+        create_postcard_pdf(self.image, output_pdf, 'A4', settings=settings)
+
+        with fitz.open(output_pdf) as document:
+            intents = document.xref_get_key(document.pdf_catalog(), 'OutputIntents')
+            self.assertEqual(intents[0], 'array')
+            intent_xref = int(intents[1].strip('[]').split()[0])
+            self.assertEqual(document.xref_get_key(intent_xref, 'S')[1], '/GTS_PDFX')
+            self.assertEqual(document.xref_get_key(intent_xref, 'OutputConditionIdentifier')[1], 'Test CMYK')
+            profile_xref = int(document.xref_get_key(intent_xref, 'DestOutputProfile')[1].split()[0])
+            self.assertEqual(document.xref_get_key(profile_xref, 'N')[1], '4')
+            self.assertEqual(document.xref_stream(profile_xref), open(self.profile, 'rb').read())
+
+    def test_output_intent_on_an_existing_pdf(self):
+        output_pdf = os.path.join(self.temp_dir, 'plain.pdf')
+        with fitz.open() as document:
+            document.new_page()
+            document.save(output_pdf)
+        embed_output_intent(output_pdf, self.profile, condition='Coated press')
+        with fitz.open(output_pdf) as document:
+            intent_xref = int(document.xref_get_key(document.pdf_catalog(), 'OutputIntents')[1].strip('[]').split()[0])
+            self.assertEqual(document.xref_get_key(intent_xref, 'Info')[1], 'Coated press')
+
+if __name__ == '__main__':
+    unittest.main()
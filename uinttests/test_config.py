@@ -0,0 +1,114 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import config
+
+class TestRenderSettings(unittest.TestCase):
+    def test_snapshot_is_hashable_and_picklable(self):
+        settings = config.resolve_render_settings(dpi=600)
+        self.assertEqual(settings.dpi, 600)
+        self.assertEqual(pickle.loads(pickle.dumps(settings)), settings)
+        self.assertEqual(hash(settings), hash(config.resolve_render_settings(dpi=600)))
+        self.assertEqual(settings.paper_size('A4'), (210, 297))
+
+    def test_snapshot_does_not_follow_later_updates(self):
+        settings = config.resolve_render_settings()
+        original_dpi = settings.dpi
+        with mock.patch.dict(config.CONFIG['user_modifiable'], {'default_dpi': original_dpi * 2}):
+            self.assertEqual(config.resolve_render_settings().dpi, original_dpi * 2)
+            self.assertEqual(settings.dpi, original_dpi)
+        self.assertEqual(settings.dpi, config.get_setting('user_modifiable.default_dpi'))
+
+class TestCacheDirs(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_file(self, name, size, age_seconds):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        mtime = time.time() - age_seconds
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_old_files_are_pruned(self):
+        self.write_file('fresh.png', 10, 60)
+        self.write_file('stale.png', 10, 2 * 24 * 60 * 60)
+        config.prune_cache_dir(self.temp_dir, max_bytes=1000, max_age_seconds=24 * 60 * 60)
+        self.assertEqual(os.listdir(self.temp_dir), ['fresh.png'])
+
+    def test_oldest_files_are_pruned_to_fit(self):
+        for i, name in enumerate(('newest.png', 'newer.png', 'older.png', 'oldest.png')):
+            self.write_file(name, 100, 60 * (i + 1))
+        config.prune_cache_dir(self.temp_dir, max_bytes=250, max_age_seconds=24 * 60 * 60)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['newer.png', 'newest.png'])
+
+    def test_cache_dirs_are_per_user(self):
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.temp_dir, 'LOCALAPPDATA': self.temp_dir}):
+            config.user_cache_dir.cache_clear()
+            self.addCleanup(config.user_cache_dir.cache_clear)
+            path = config.user_cache_dir('color')
+        self.assertTrue(path.startswith(self.temp_dir))
+        self.assertTrue(os.path.isdir(path))
+
+class TestConfigWrites(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.temp_dir, 'config.json')
+        patches = [
+            mock.patch.object(config, 'CONFIG_FILE', self.config_file),
+            mock.patch.object(config, 'CONFIG', {'user_modifiable': {'default_dpi': 300, 'persist_files': True}}),
+            mock.patch.object(config, 'SAVE_DELAY_SECONDS', 60),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_updates_are_debounced_into_one_write(self):
+        with mock.patch.object(config, 'save_config', wraps=config.save_config) as save_config:
+            config.update_setting('default_dpi', 600)
+            config.update_setting('persist_files', False)
+            self.assertFalse(os.path.exists(self.config_file))
+            config.flush_config()
+            config.flush_config()
+
+        self.assertEqual(save_config.call_count, 1)
+        with open(self.config_file) as f:
+            self.assertEqual(json.load(f)['user_modifiable'], {'default_dpi': 600, 'persist_files': False})
+        self.assertEqual(os.listdir(self.temp_dir), ['config.json'])
+
+    def test_file_mode_is_kept(self):
+        config.save_config(config.CONFIG)
+        self.assertEqual(os.stat(self.config_file).st_mode & 0o777, config.NEW_FILE_MODE)
+        os.chmod(self.config_file, 0o640)
+        config.save_config(config.CONFIG)
+        self.assertEqual(os.stat(self.config_file).st_mode & 0o777, 0o640)
+
+    def test_updates_while_saving_are_not_written_half_way(self):
+        def update_during_write(data, f, **options):
+            # The UI thread changing a setting while the timer thread is writing
+            config.CONFIG['user_modifiable']['default_dpi'] = 1200
+            return json_dump(data, f, **options)
+
+        json_dump = json.dump
+        config.update_setting('default_dpi', 600)
+        with mock.patch.object(config.json, 'dump', update_during_write):
+            config.flush_config()
+
+        with open(self.config_file) as f:
+            self.assertEqual(json.load(f)['user_modifiable']['default_dpi'], 600)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import config
+from business_logic import content_hash
+from business_logic.content_hash import HashIndex
+from ui.controllers.file_controller import FileManager
+from uinttests.helpers import isolate_caches
+
+class TestContentHashDedupe(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index = isolate_caches(self, self.temp_dir)
+        with mock.patch.dict(config.CONFIG['user_modifiable'], {'persist_files': False}):
+            self.file_manager = FileManager()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        shutil.rmtree(self.file_manager.temp_dir)
+
+    def write_file(self, name, data):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_copies_and_symlinks_are_imported_once(self):
+        original = self.write_file('card.png', b'artwork' * 1000)
+        copy = self.write_file('card copy.png', b'artwork' * 1000)
+        link = os.path.join(self.temp_dir, 'link.png')
+        os.symlink(original, link)
+        other = self.write_file('other.png', b'different artwork')
+
+        added = self.file_manager.add_files([original, copy, link, other])
+
+        self.assertEqual(added, [original, other])
+        self.assertEqual(self.file_manager.duplicates, {copy: original, link: original})
+        self.assertEqual(self.file_manager.front_images, [original])
+        self.assertEqual(self.file_manager.back_images, [other])
+
+    def test_unchanged_files_are_not_rehashed(self):
+        path = self.write_file('card.png', b'artwork')
+        first = self.index.get_hash(path)
+
+        self.index.save()
+        reloaded = HashIndex(self.index.index_file)
+        with mock.patch.object(content_hash, 'hash_file') as hash_file:
+            self.assertEqual(reloaded.get_hash(path), first)
+            hash_file.assert_not_called()
+
+        with open(path, 'ab') as f:
+            f.write(b' edited')
+        self.assertNotEqual(reloaded.get_hash(path), first)
+
+    def test_deleted_files_are_dropped_on_load(self):
+        kept = self.write_file('kept.png', b'artwork')
+        deleted = self.write_file('deleted.png', b'other artwork')
+        self.index.get_hashes([kept, deleted])
+        os.remove(deleted)
+        self.index.save()
+
+        reloaded = HashIndex(self.index.index_file)
+        self.assertEqual(list(reloaded.entries), [os.path.realpath(kept)])
+        reloaded.save()
+        with open(self.index.index_file) as f:
+            self.assertEqual(list(json.load(f)), [os.path.realpath(kept)])
+
+    def test_concurrent_saves(self):
+        paths = [self.write_file(f'card_{i}.png', b'artwork %d' % i) for i in range(40)]
+
+        def import_batch(batch):
+            self.index.get_hashes(batch)
+            self.index.save()
+
+        threads = [threading.Thread(target=import_batch, args=(paths[i::4],)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.index.save()
+
+        self.assertEqual(len(HashIndex(self.index.index_file).entries), 40)
+        # No temporary files are left behind by the racing writers
+        self.assertEqual([name for name in os.listdir(self.temp_dir) if name.startswith('.hash_index-')], [])
+
+    def test_default_index_is_kept_in_the_user_cache(self):
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.temp_dir}):
+            index = HashIndex()
+        self.assertEqual(index.index_file, os.path.join(self.temp_dir, 'postcard-printer', 'hash_index.json'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import fitz
+from PIL import Image
+
+from business_logic import deterministic_pdf
+from business_logic.deterministic_pdf import make_deterministic
+from business_logic.pdf_operations import create_postcard_pdf, render_pairs
+from config import resolve_render_settings
+from uinttests.helpers import isolate_caches
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class TestDeterministicPdf(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        isolate_caches(self, self.temp_dir)
+        self.front = os.path.join(self.temp_dir, 'front.png')
+        self.back = os.path.join(self.temp_dir, 'back.png')
+        Image.new('RGB', (600, 400), 'red').save(self.front, dpi=(150, 150))
+        Image.new('RGB', (600, 400), 'blue').save(self.back, dpi=(150, 150))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def render(self, run, deterministic=True):
+        outputs = {}
+        for backend in ('reportlab', 'pymupdf'):
+            settings = resolve_render_settings(pdf_backend=backend, deterministic_pdf=deterministic)
+            sheet = os.path.join(self.temp_dir, f'{run}_{backend}.pdf')
+            create_postcard_pdf(self.front, sheet, 'A4', settings=settings)
+            paired_dir = os.path.join(self.temp_dir, f'{run}_{backend}_paired')
+            scratch_dir = os.path.join(self.temp_dir, f'{run}_{backend}_scratch')
+            os.makedirs(scratch_dir)
+            paired, = render_pairs([(self.front, self.back)], 'A4', paired_dir, scratch_dir, settings)
+            outputs[backend] = (file_hash(sheet), file_hash(paired))
+        return outputs
+
+    def test_identical_inputs_give_identical_bytes(self):
+        first = self.render('first')
+        time.sleep(1.1)  # reportlab stamps the time to the second
+        self.assertEqual(self.render('second'), first)
+
+        # Without the deterministic mode the files differ from run to run
+        self.assertNotEqual(self.render('third', deterministic=False), first)
+
+    def test_document_id_follows_content(self):
+        settings = resolve_render_settings(pdf_backend='pymupdf', deterministic_pdf=True)
+        ids = []
+        for image in (self.front, self.back):
+            output_pdf = os.path.join(self.temp_dir, f'{os.path.basename(image)}.pdf')
+            create_postcard_pdf(image, output_pdf, 'A4', settings=settings)
+            with fitz.open(output_pdf) as document:
+                ids.append(document.xref_get_key(-1, 'ID')[1])
+                self.assertEqual(document.metadata['creationDate'], '')
+        self.assertNotEqual(ids[0], ids[1])
+        self.assertNotIn('0' * 32, ids[0])
+
+    def test_only_finished_outputs_are_rewritten(self):
+        settings = resolve_render_settings(pdf_backend='pymupdf', deterministic_pdf=True)
+        paired_dir = os.path.join(self.temp_dir, 'paired')
+        with mock.patch.object(deterministic_pdf, 'make_deterministic', wraps=make_deterministic) as rewrite:
+            paired, = render_pairs([(self.front, self.back)], 'A4', paired_dir, self.temp_dir, settings)
+        rewrite.assert_called_once_with(paired)
+
+    def test_file_mode_is_kept(self):
+        output_pdf = os.path.join(self.temp_dir, 'sheet.pdf')
+        create_postcard_pdf(self.front, output_pdf, 'A4', settings=resolve_render_settings(pdf_backend='pymupdf'))
+        os.chmod(output_pdf, 0o644)
+        make_deterministic(output_pdf)
+        self.assertEqual(os.stat(output_pdf).st_mode & 0o777, 0o644)
+
+if __name__ == '__main__':
+    unittest.main()
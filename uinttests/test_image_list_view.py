@@ -0,0 +1,119 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtTest import QSignalSpy
+from PyQt5.QtWidgets import QApplication
+from PIL import Image
+
+import config
+from ui.controllers.file_controller import FileManager
+from ui.views import image_list_view
+from ui.views.image_list_view import ImageListWidget
+from uinttests.helpers import isolate_caches
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+class CountingPreview:
+    def __init__(self):
+        self.updates = 0
+
+    def update_preview_display(self):
+        self.updates += 1
+
+class TestImageListSelection(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        isolate_caches(self, temp_dir)
+        with mock.patch.dict(config.CONFIG['user_modifiable'], {'persist_files': False}):
+            self.file_manager = FileManager()
+        self.files = [f'/tmp/card_{i}.png' for i in range(50)]
+        self.file_manager.add_files(self.files)
+        self.preview = CountingPreview()
+        self.image_list = ImageListWidget(self.file_manager, self.preview)
+        self.preview.updates = 0
+
+    def test_select_all_refreshes_preview_once(self):
+        self.image_list.select_all_front.setChecked(True)
+
+        self.assertEqual(self.preview.updates, 1)
+        self.assertEqual(self.file_manager.front_images, self.files)
+        self.assertTrue(all(w.front_checkbox.isChecked() for w in self.image_list.image_widgets()))
+
+    def test_deselect_all_refreshes_preview_once(self):
+        self.image_list.select_all_back.setChecked(True)
+        self.preview.updates = 0
+        self.image_list.select_all_back.setChecked(False)
+
+        self.assertEqual(self.preview.updates, 1)
+        self.assertEqual(self.file_manager.back_images, [])
+        self.assertFalse(any(w.back_checkbox.isChecked() for w in self.image_list.image_widgets()))
+
+    def test_row_toggle_updates_header_without_reselecting(self):
+        self.image_list.select_all_front.setChecked(True)
+        self.preview.updates = 0
+        self.image_list.image_widgets()[0].front_checkbox.setChecked(False)
+
+        self.assertEqual(self.preview.updates, 1)
+        self.assertFalse(self.image_list.select_all_front.isChecked())
+        self.assertEqual(self.file_manager.front_images, self.files[1:])
+
+    def test_refreshed_rows_update_their_widget(self):
+        self.image_list.update_metadata({'path': self.files[3], 'missing': 1})
+        self.assertEqual(self.image_list.image_widgets()[3].toolTip(), f"File not found: {self.files[3]}")
+
+        self.image_list.setCurrentRow(4)  # Row 0 is the header
+        self.image_list.delete_selected_items()
+        self.image_list.update_metadata({'path': self.files[3], 'missing': 1})  # Gone, so ignored
+
+        self.image_list.clear_all()
+        self.assertEqual(self.image_list.widgets_by_path, {})
+
+class TestBackgroundImport(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        isolate_caches(self, self.temp_dir)
+        with mock.patch.dict(config.CONFIG['user_modifiable'], {'persist_files': False}):
+            self.file_manager = FileManager()
+        self.image_list = ImageListWidget(self.file_manager, CountingPreview())
+
+    def test_files_are_read_off_the_ui_thread(self):
+        files = []
+        for i in range(image_list_view.ROW_BATCH_SIZE * 2 + 5):
+            path = os.path.join(self.temp_dir, f'card_{i}.png')
+            Image.new('RGB', (60, 40), (i, 0, 0)).save(path)
+            files.append(path)
+        duplicate = os.path.join(self.temp_dir, 'copy.png')
+        shutil.copy(files[0], duplicate)
+
+        scan_threads = []
+        scan_files = self.file_manager.scan_files
+
+        def recording_scan(paths):
+            scan_threads.append(threading.current_thread())
+            return scan_files(paths)
+
+        self.file_manager.scan_files = recording_scan
+        spy = QSignalSpy(self.image_list.import_finished)
+        self.image_list.import_files(files + [duplicate])
+        self.assertTrue(self.image_list.is_importing())
+        self.assertTrue(spy.wait(10000))
+
+        self.assertEqual(spy[0][0], files)
+        self.assertEqual([w.image_path for w in self.image_list.image_widgets()], files)
+        self.assertEqual(self.file_manager.duplicates, {duplicate: files[0]})
+        self.assertNotIn(threading.main_thread(), scan_threads)
+        self.assertEqual(self.file_manager.metadata[files[3]]['width'], 60)
+        QApplication.processEvents()
+        self.assertFalse(self.image_list.is_importing())
+
+if __name__ == '__main__':
+    unittest.main()
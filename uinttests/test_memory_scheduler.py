@@ -0,0 +1,141 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from business_logic import instrumentation
+from service import memory_scheduler
+from service.memory_scheduler import ImageTooLargeError, MemoryScheduler, estimate_image_bytes, estimate_job_bytes
+
+MB = 1024 * 1024
+RSS_SLACK_BYTES = 24 * MB  # Interpreter and allocator noise on top of the jobs' own memory
+
+def resident_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+class RssSampler(threading.Thread):
+    """Peak resident set size of this process while running, sampled every millisecond."""
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.baseline = self.peak = resident_bytes()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(0.001):
+            self.peak = max(self.peak, resident_bytes())
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.peak - self.baseline
+
+class TestMemoryScheduler(unittest.TestCase):
+    def setUp(self):
+        instrumentation.reset()
+        self.lock = threading.Lock()
+        self.live_bytes = 0
+        self.peak_bytes = 0
+        self.running = []  # (kind, start, end) per finished job
+
+    def render(self, kind, nbytes):
+        # Stands in for a worker decoding an image: really holds the memory for a while
+        with self.lock:
+            self.live_bytes += nbytes
+            self.peak_bytes = max(self.peak_bytes, self.live_bytes)
+        start = time.perf_counter()
+        # Filled, not just allocated, so the pages really count towards RSS
+        pixels = b'\x01' * nbytes
+        time.sleep(0.05 if kind == 'big' else 0.01)
+        del pixels
+        with self.lock:
+            self.live_bytes -= nbytes
+            self.running.append((kind, start, time.perf_counter()))
+
+    async def run_batch(self, scheduler, jobs, workers):
+        slots = asyncio.Semaphore(workers)
+
+        async def run(kind, nbytes):
+            async with slots, scheduler.reserve(nbytes):
+                await asyncio.to_thread(self.render, kind, nbytes)
+
+        await asyncio.gather(*(run(kind, nbytes) for kind, nbytes in jobs))
+
+    def test_mixed_batch_stays_under_cap(self):
+        cap = 96 * MB
+        jobs = [('big', 60 * MB) if i % 5 == 0 else ('small', 6 * MB) for i in range(20)]
+        sampler = RssSampler() if os.path.exists('/proc/self/statm') else None
+        if sampler:
+            sampler.start()
+        asyncio.run(self.run_batch(MemoryScheduler(cap), jobs, workers=4))
+
+        self.assertEqual(len(self.running), 20)
+        self.assertLessEqual(self.peak_bytes, cap)
+        if sampler:
+            # Two big jobs at once would have added 120MB
+            self.assertLessEqual(sampler.stop(), cap + RSS_SLACK_BYTES)
+        big = [(start, end) for kind, start, end in self.running if kind == 'big']
+        small = [(start, end) for kind, start, end in self.running if kind == 'small']
+        # Big jobs never overlap, and small jobs keep running alongside them
+        for i, (start, end) in enumerate(big):
+            self.assertFalse(any(s < end and start < e for s, e in big[i + 1:]))
+        self.assertTrue(any(s < big_end and big_start < e for big_start, big_end in big for s, e in small))
+
+        metrics = instrumentation.snapshot()
+        self.assertGreater(metrics['scheduler.throttled'], 0)
+        self.assertEqual((metrics['scheduler.admitted_bytes'], metrics['scheduler.running']), (0, 0))
+
+    def test_oversized_job_runs_alone(self):
+        jobs = [('small', 1 * MB), ('big', 40 * MB), ('small', 1 * MB)]
+        asyncio.run(self.run_batch(MemoryScheduler(16 * MB), jobs, workers=3))
+        self.assertEqual(len(self.running), 3)
+        self.assertEqual(self.peak_bytes, 40 * MB)
+
+    def test_passed_over_job_is_not_starved(self):
+        async def scenario():
+            scheduler = MemoryScheduler(10 * MB)
+            await scheduler.acquire(4 * MB)
+            big = asyncio.create_task(scheduler.acquire(8 * MB))
+            await asyncio.sleep(0)
+            for _ in range(memory_scheduler.MAX_BYPASSES):
+                await scheduler.acquire(1 * MB)
+                await scheduler.release(1 * MB)
+            small = asyncio.create_task(scheduler.acquire(1 * MB))
+            await asyncio.sleep(0)
+            self.assertFalse(small.done())
+
+            await scheduler.release(4 * MB)
+            await big
+            await scheduler.release(8 * MB)
+            await small
+
+        asyncio.run(scenario())
+
+    def test_estimate_from_header(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        rgb = os.path.join(temp_dir, 'rgb.png')
+        cmyk = os.path.join(temp_dir, 'cmyk.tif')
+        Image.new('RGB', (300, 200)).save(rgb)
+        Image.new('CMYK', (300, 200)).save(cmyk)
+
+        working = memory_scheduler.WORKING_BYTES_PER_PIXEL
+        self.assertEqual(estimate_image_bytes(rgb), 300 * 200 * (3 + working))
+        self.assertEqual(estimate_image_bytes(cmyk), 300 * 200 * (4 + working))
+        self.assertEqual(estimate_job_bytes([rgb, cmyk, rgb]),
+                         memory_scheduler.WORKER_BASE_BYTES + estimate_image_bytes(cmyk))
+        self.assertEqual(estimate_image_bytes(os.path.join(temp_dir, 'missing.png')), 0)
+
+        # Over twice the limit PIL refuses to open the image at all
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 10000):
+            with self.assertRaises(ImageTooLargeError):
+                estimate_image_bytes(rgb)
+
+if __name__ == '__main__':
+    unittest.main()
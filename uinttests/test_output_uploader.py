@@ -0,0 +1,159 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+import zipfile
+from unittest import mock
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PIL import Image
+from PyQt5.QtWidgets import QApplication
+
+from business_logic import instrumentation, output_uploader
+from business_logic.archive_sources import expand_sources
+from business_logic.output_uploader import OutputUploader
+from ui.controllers import view_logic
+from ui.controllers.view_logic import output_pdf_names
+from uinttests.helpers import isolate_caches
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+DESTINATION_DELAY = 0.1  # Seconds every copy to the throttled destination takes
+copy = output_uploader._copy
+
+def throttled_copy(src, dst):
+    time.sleep(DESTINATION_DELAY)
+    return copy(src, dst)
+
+class TestOutputUploader(unittest.TestCase):
+    def setUp(self):
+        instrumentation.reset()
+        self.temp_dir = tempfile.mkdtemp()
+        self.destination = os.path.join(self.temp_dir, 'share')
+        os.makedirs(self.destination)
+        throttle = mock.patch.object(output_uploader, '_copy', throttled_copy)
+        throttle.start()
+        self.addCleanup(throttle.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def render(self, uploader, count, destination=None):
+        # Stands in for rendering: each output is written to scratch and handed over at once
+        scratch_dir = uploader.scratch_dir()
+        futures = []
+        for i in range(count):
+            path = os.path.join(scratch_dir, f'sheet_{i}.pdf')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(64 * 1024))
+            futures.append(uploader.submit(path, destination or self.destination))
+        return futures
+
+    def test_rendering_does_not_wait_for_the_destination(self):
+        uploader = OutputUploader(workers=2, scratch_root=os.path.join(self.temp_dir, 'scratch'))
+        start = time.perf_counter()
+        futures = self.render(uploader, 10)
+        render_seconds = time.perf_counter() - start
+        uploader.wait()
+
+        self.assertLess(render_seconds, DESTINATION_DELAY * 2)
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(sorted(os.listdir(self.destination)), sorted(f'sheet_{i}.pdf' for i in range(10)))
+        self.assertEqual(instrumentation.get('output.files'), 10)
+        self.assertEqual(instrumentation.get('output.bytes'), 10 * 64 * 1024)
+        self.assertEqual(instrumentation.get('output.pending'), 0)
+        self.assertGreater(instrumentation.get('output.last_mb_per_second'), 0)
+        uploader.close()
+        self.assertFalse(os.path.exists(uploader.scratch_root))
+
+    def test_outputs_get_the_usual_permissions(self):
+        # As if the file had been written with open(), not readable by its owner only
+        umask = os.umask(0)
+        os.umask(umask)
+        uploader = OutputUploader(workers=1, scratch_root=os.path.join(self.temp_dir, 'scratch'))
+        report = self.render(uploader, 1)[0].result()
+        self.assertEqual(os.stat(report['path']).st_mode & 0o777, 0o666 & ~umask)
+        uploader.close()
+
+    def test_pending_files_are_bounded(self):
+        uploader = OutputUploader(max_pending=2, workers=1, scratch_root=os.path.join(self.temp_dir, 'scratch'))
+        start = time.perf_counter()
+        self.render(uploader, 4)
+        # The last two submits each had to wait for a copy to finish
+        self.assertGreaterEqual(time.perf_counter() - start, DESTINATION_DELAY * 2 * 0.9)
+        uploader.close()
+
+    def test_failed_copies_are_retried(self):
+        uploader = OutputUploader(workers=1, retries=2, retry_delay=0.01, scratch_root=os.path.join(self.temp_dir, 'scratch'))
+        replace = os.replace
+        calls = []
+
+        def flaky_replace(src, dst):
+            calls.append(dst)
+            if len(calls) == 1:
+                raise OSError("share went away")
+            replace(src, dst)
+
+        with mock.patch.object(output_uploader.os, 'replace', flaky_replace):
+            report = self.render(uploader, 1)[0].result()
+        self.assertEqual(report['attempts'], 2)
+        self.assertEqual(instrumentation.get('output.retries'), 1)
+        # The failed attempt's partial file was cleaned up
+        self.assertEqual(os.listdir(self.destination), ['sheet_0.pdf'])
+        uploader.close()
+
+    def test_local_file_is_kept_when_every_attempt_fails(self):
+        uploader = OutputUploader(workers=1, retries=1, retry_delay=0.01, scratch_root=os.path.join(self.temp_dir, 'scratch'))
+        notified = []
+        uploader.add_failure_listener(lambda *failure: notified.append(failure))
+        unmounted = os.path.join(self.temp_dir, 'unmounted')
+        future = self.render(uploader, 1, unmounted)[0]
+        with self.assertRaises(OSError):
+            future.result()
+        failures = uploader.close()
+        self.assertEqual(failures, uploader.failures)
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(os.path.exists(failures[0][0]))
+        self.assertEqual([failure[:2] for failure in notified], [(failures[0][0], unmounted)])
+        self.assertEqual(instrumentation.get('output.failures'), 1)
+
+class TestGeneratePdfs(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.destination = os.path.join(self.temp_dir, 'share')
+        os.makedirs(self.destination)
+        self.uploader = OutputUploader(workers=2, scratch_root=os.path.join(self.temp_dir, 'scratch'))
+        isolate_caches(self, self.temp_dir)
+        patchers = [
+            mock.patch.object(view_logic, 'get_uploader', lambda: self.uploader),
+            mock.patch.object(view_logic.QFileDialog, 'getExistingDirectory', return_value=self.destination),
+            mock.patch.object(view_logic.QMessageBox, 'information'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_output_names(self):
+        self.assertEqual(output_pdf_names(['a/card.png', 'b/card.png', 'card_2.jpg', 'c/Card.png', 'back.png']),
+                         ['card.pdf', 'card_2.pdf', 'card_2_2.pdf', 'Card_3.pdf', 'back.pdf'])
+
+    def test_images_with_the_same_name_get_their_own_outputs(self):
+        archives = []
+        for name, color in (('a.zip', 'red'), ('b.zip', 'blue')):
+            image = os.path.join(self.temp_dir, f'{color}.png')
+            Image.new('RGB', (600, 400), color).save(image, dpi=(150, 150))
+            archives.append(os.path.join(self.temp_dir, name))
+            with zipfile.ZipFile(archives[-1], 'w') as archive:
+                archive.write(image, 'front/card.png')
+
+        with mock.patch('builtins.print'):
+            view_logic.generate_pdfs(expand_sources(archives), 'A4', None)
+        self.assertEqual(self.uploader.close(), [])
+        self.assertEqual(sorted(os.listdir(self.destination)), ['card.pdf', 'card_2.pdf'])
+
+if __name__ == '__main__':
+    unittest.main()
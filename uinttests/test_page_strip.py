@@ -0,0 +1,92 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PIL import Image
+from PyQt5.QtWidgets import QApplication, QComboBox
+
+import config
+from business_logic import instrumentation
+from ui.controllers.file_controller import FileManager
+from ui.views.pdf_view import PREFETCH_CELLS, PdfPreviewWidget
+from uinttests.helpers import isolate_caches
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+class TestPageStrip(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        isolate_caches(self, self.temp_dir)
+        patcher = mock.patch.dict(config.CONFIG['user_modifiable'], {'persist_files': False, 'preview_quality': 'low'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.file_manager = FileManager()
+        images = []
+        for i in range(40):
+            path = os.path.join(self.temp_dir, f'card_{i}.png')
+            Image.new('RGB', (1800, 1200), (i * 6, 100, 200)).save(path)
+            images.append(path)
+        self.file_manager.add_files(images)
+        self.file_manager.select_all(True, True)
+        self.file_manager.select_all(False, True)
+
+        self.paper_size_combo = QComboBox()
+        self.paper_size_combo.addItem('A4')
+        self.preview = PdfPreviewWidget(self.file_manager, self.paper_size_combo)
+        self.preview.resize(400, 300)
+        self.preview.show()
+        app.processEvents()  # Let the strips settle at their final size first
+        instrumentation.reset()
+
+    def tearDown(self):
+        self.preview.stop()
+        self.preview.close()
+        shutil.rmtree(self.temp_dir)
+        shutil.rmtree(self.file_manager.temp_dir)
+
+    def wait_until_idle(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            app.processEvents()
+            if self.preview.loader.is_idle():
+                app.processEvents()
+                return
+            time.sleep(0.01)
+        self.fail("Preview loader did not finish")
+
+    def test_only_cells_near_the_viewport_are_rendered(self):
+        self.preview.update_preview_display()
+        self.wait_until_idle()
+
+        front, back = self.preview.front_strip, self.preview.back_strip
+        wanted = len(front.visible_rows()) + PREFETCH_CELLS
+        self.assertEqual(instrumentation.get('preview.cell_renders'), 2 * wanted)
+        self.assertEqual(sorted(front.pages), list(range(wanted)))
+
+        front.verticalScrollBar().setValue(front.verticalScrollBar().maximum())
+        self.wait_until_idle()
+
+        self.assertEqual(back.verticalScrollBar().value(), front.verticalScrollBar().value())
+        self.assertIn(len(self.file_manager.images) - 1, front.pages)
+        self.assertIn(len(self.file_manager.images) - 1, back.pages)
+        self.assertLess(instrumentation.get('preview.cell_renders'), len(self.file_manager.images))
+
+    def test_refresh_with_same_settings_does_not_rerender(self):
+        self.preview.update_preview_display()
+        self.wait_until_idle()
+        renders = instrumentation.get('preview.cell_renders')
+
+        self.preview.update_preview_display()
+        self.wait_until_idle()
+
+        self.assertEqual(instrumentation.get('preview.cell_renders'), renders)
+
+if __name__ == '__main__':
+    unittest.main()
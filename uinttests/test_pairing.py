@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import fitz
+from PIL import Image
+
+from business_logic import pdf_operations
+from business_logic.pairing import plan_pairs
+from config import resolve_render_settings
+from uinttests.helpers import isolate_caches
+
+class TestPairing(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        isolate_caches(self, self.temp_dir)
+        self.fronts = [self.make_image(f'front_{i}.png', (200, 40 * i, 40)) for i in range(4)]
+        self.back = self.make_image('back.png', (250, 250, 250))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_image(self, name, color):
+        path = os.path.join(self.temp_dir, name)
+        Image.new('RGB', (600, 400), color).save(path)
+        return path
+
+    def test_modes(self):
+        backs = ['b0', 'b1']
+        self.assertEqual(plan_pairs(['f0', 'f1'], backs), [('f0', 'b0'), ('f1', 'b1')])
+        self.assertEqual(plan_pairs(['f0', 'f1', 'f2'], ['b0'], 'shared_back'),
+                         [('f0', 'b0'), ('f1', 'b0'), ('f2', 'b0')])
+        self.assertEqual(plan_pairs(['f0', 'f1', 'f2'], backs, 'cyclic'),
+                         [('f0', 'b0'), ('f1', 'b1'), ('f2', 'b0')])
+        # Mismatched counts are an error rather than silently dropped pairs
+        with self.assertRaises(ValueError):
+            plan_pairs(['f0', 'f1', 'f2'], backs)
+
+    def test_manifest(self):
+        manifest = os.path.join(self.temp_dir, 'pairs.csv')
+        with open(manifest, 'w') as f:
+            f.write('front,back\nfront_0.png,back.png\n\nfront_1.png,back.png\n')
+
+        self.assertEqual(plan_pairs([], [], 'manifest', manifest), [
+            (self.fronts[0], self.back),
+            (self.fronts[1], self.back),
+        ])
+
+    def test_manifest_with_a_missing_file(self):
+        manifest = os.path.join(self.temp_dir, 'pairs.csv')
+        with open(manifest, 'w') as f:
+            f.write('front,back\nfront_0.png,back.png\nfront_9.png,back.png\n')
+
+        with self.assertRaisesRegex(ValueError, r'pairs\.csv:3: .*front_9\.png'):
+            plan_pairs([], [], 'manifest', manifest)
+
+    def test_shared_back_is_rendered_once(self):
+        pairs = plan_pairs(self.fronts, [self.back], 'shared_back')
+        output_dir = os.path.join(self.temp_dir, 'paired')
+        settings = resolve_render_settings(pdf_backend='pymupdf')
+
+        with mock.patch.object(pdf_operations, 'create_postcard_pdf',
+                               wraps=pdf_operations.create_postcard_pdf) as render:
+            paired_pdfs = pdf_operations.render_pairs(pairs, 'A4', output_dir, self.temp_dir, settings)
+
+        rendered_images = [call.args[0] for call in render.call_args_list]
+        self.assertEqual(sorted(rendered_images), sorted(self.fronts + [self.back]))
+        self.assertEqual(len(paired_pdfs), len(self.fronts))
+        for paired_pdf in paired_pdfs:
+            with fitz.open(paired_pdf) as doc:
+                self.assertEqual(doc.page_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
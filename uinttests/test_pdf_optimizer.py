@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import fitz
+from PIL import Image
+
+from business_logic import pdf_optimizer
+from business_logic.pdf_optimizer import optimize_pdf, optimize_pdfs
+
+class TestPdfOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.image = os.path.join(self.temp_dir, 'card.png')
+        Image.effect_noise((300, 200), 60).convert('RGB').save(self.image)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_pdf(self, name, pages=3):
+        # Pages are merged from separate files, so each holds its own copy of the image
+        path = os.path.join(self.temp_dir, name)
+        with fitz.open() as document:
+            for _ in range(pages):
+                with fitz.open() as sheet:
+                    sheet.new_page().insert_image(fitz.Rect(50, 50, 350, 250), filename=self.image)
+                    document.insert_pdf(sheet)
+            document.save(path)
+        return path
+
+    def test_duplicate_images_are_merged(self):
+        path = self.make_pdf('sheets.pdf')
+        report = optimize_pdf(path)
+
+        self.assertEqual((report['images_before'], report['images_after']), (3, 1))
+        self.assertLess(report['after_bytes'], report['before_bytes'])
+        self.assertEqual(report['after_bytes'], os.path.getsize(path))
+        with fitz.open(path) as document:
+            self.assertEqual(len(document), 3)
+            self.assertTrue(all(page.get_images() for page in document))
+        # No temporary files are left behind
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['card.png', 'sheets.pdf'])
+
+    def test_file_mode_is_kept(self):
+        path = self.make_pdf('sheets.pdf')
+        os.chmod(path, 0o644)
+        optimize_pdf(path)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+
+    @unittest.skipIf(os.name == 'nt', "uses a shell script as qpdf")
+    def test_failed_linearization_keeps_the_optimized_file(self):
+        path = self.make_pdf('sheets.pdf')
+        qpdf = os.path.join(self.temp_dir, 'qpdf')
+        with open(qpdf, 'w') as f:
+            f.write('#!/bin/sh\necho "qpdf: file is damaged" >&2\nexit 2\n')
+        os.chmod(qpdf, 0o755)
+
+        with mock.patch.object(pdf_optimizer.shutil, 'which', return_value=qpdf):
+            report = optimize_pdf(path, linearize=True)
+
+        self.assertFalse(report['linearized'])
+        self.assertEqual(report['linearize_error'], 'qpdf: file is damaged')
+        self.assertEqual(report['images_after'], 1)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['card.png', 'qpdf', 'sheets.pdf'])
+
+    def test_pool_reports_in_order(self):
+        paths = [self.make_pdf(f'sheets_{i}.pdf', pages=i + 1) for i in range(3)]
+        reports = optimize_pdfs(paths, workers=2)
+        self.assertEqual([report['path'] for report in reports], paths)
+        self.assertEqual([report['images_before'] for report in reports], [1, 2, 3])
+        self.assertTrue(all(report['images_after'] == 1 for report in reports))
+
+if __name__ == '__main__':
+    unittest.main()
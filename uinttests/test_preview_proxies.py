@@ -0,0 +1,94 @@
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PIL import Image, ImageDraw
+from PyQt5.QtWidgets import QApplication
+
+from business_logic import preview_proxies
+from business_logic.preview_proxies import FIRST_PASS_BUDGET_MS, PROXY_MAX_EDGE, get_proxy_image, refinement_levels
+from config import resolve_render_settings
+from ui.controllers.view_logic import create_preview_pdf, render_pdf_page
+from uinttests.helpers import isolate_caches
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+def write_card(path, size, shade=0, **options):
+    """A photo-like card: gradients, a shape and some grain."""
+    gradient = Image.linear_gradient('L')
+    card = Image.merge('RGB', (gradient.resize(size), gradient.rotate(90).resize(size), Image.new('L', size, shade)))
+    ImageDraw.Draw(card).ellipse((size[0] // 4, size[1] // 4, size[0] * 3 // 4, size[1] * 3 // 4), fill=(200, 30, 60))
+    Image.blend(card, Image.effect_noise(size, 30).convert('RGB'), 0.15).save(path, dpi=(300, 300), **options)
+    return path
+
+class TestPreviewProxies(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        isolate_caches(self, self.temp_dir)
+        patcher = mock.patch.object(preview_proxies, '_proxy_paths', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.image = write_card(os.path.join(self.temp_dir, 'card.jpg'), (1500, 1000), quality=90)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_refinement_levels(self):
+        self.assertEqual(refinement_levels('low'), ('low',))
+        self.assertEqual(refinement_levels('medium'), ('low', 'medium'))
+        self.assertEqual(refinement_levels('high'), ('low', 'medium', 'high'))
+        # Unknown settings fall back to the cheapest preview
+        self.assertEqual(refinement_levels('ultra'), ('low',))
+        self.assertEqual(refinement_levels(None), ('low',))
+
+    def test_proxy_sizes(self):
+        for quality in ('low', 'medium'):
+            with Image.open(get_proxy_image(self.image, quality, self.temp_dir)) as proxy:
+                self.assertEqual(max(proxy.size), PROXY_MAX_EDGE[quality])
+                self.assertEqual(proxy.size[0] * 2, proxy.size[1] * 3)
+                self.assertEqual(proxy.format, 'JPEG')
+        self.assertEqual(get_proxy_image(self.image, 'high', self.temp_dir), self.image)
+
+    def test_proxies_are_written_once(self):
+        medium = get_proxy_image(self.image, 'medium', self.temp_dir)
+        with mock.patch.object(preview_proxies, '_write_proxy', wraps=preview_proxies._write_proxy) as write:
+            self.assertEqual(get_proxy_image(self.image, 'medium', self.temp_dir), medium)
+            write.assert_not_called()
+            # Smaller proxies are downsampled from a cached larger one instead of the original
+            get_proxy_image(self.image, 'low', self.temp_dir)
+            self.assertEqual(write.call_args[0][0], medium)
+
+    def test_transparency_is_flattened_onto_white(self):
+        image = os.path.join(self.temp_dir, 'cutout.png')
+        Image.new('RGBA', (800, 600), (0, 0, 255, 0)).save(image)
+        with Image.open(get_proxy_image(image, 'low', self.temp_dir)) as proxy:
+            self.assertEqual(proxy.mode, 'RGB')
+            self.assertEqual(proxy.getpixel((10, 10)), (255, 255, 255))
+
+    def test_first_pass_budget(self):
+        settings = resolve_render_settings()
+
+        def first_pass(image):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                preview_pdf = create_preview_pdf(image, self.temp_dir, 'A4', settings, 'low')
+            render_pdf_page(preview_pdf, 300, 424)
+            return (time.perf_counter() - start) * 1000
+
+        # The first preview of a session also loads the PDF libraries, which is not counted
+        first_pass(self.image)
+        # A 6x4 inch card scanned at 300 DPI, best of three as the machine may be busy
+        timings = [first_pass(write_card(os.path.join(self.temp_dir, f'postcard_{i}.jpg'), (1800, 1200), i * 60, quality=90))
+                   for i in range(3)]
+        self.assertLess(min(timings), FIRST_PASS_BUDGET_MS)
+
+if __name__ == '__main__':
+    unittest.main()
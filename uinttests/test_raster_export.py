@@ -0,0 +1,38 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image, ImageChops, ImageStat
+
+from business_logic.pdf_operations import create_postcard_pdf
+from business_logic.raster_export import export_raster_sheet
+from uinttests.test_sheet_writers import make_card_image, render_page
+from uinttests.helpers import isolate_caches
+
+class TestRasterExport(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        isolate_caches(self, self.temp_dir)
+        self.image_path = os.path.join(self.temp_dir, 'card.png')
+        make_card_image(self.image_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_raster_matches_pdf_sheet(self):
+        pdf_path = os.path.join(self.temp_dir, 'sheet.pdf')
+        create_postcard_pdf(self.image_path, pdf_path, 'A4')
+        reference = render_page(pdf_path, zoom=150 / 72)
+
+        for fmt in ('tiff', 'png'):
+            output_path = os.path.join(self.temp_dir, f'sheet.{fmt}')
+            export_raster_sheet(self.image_path, output_path, 'A4', dpi=150, fmt=fmt, workers=3)
+            with Image.open(output_path) as raster:
+                self.assertEqual([round(d) for d in raster.info['dpi']], [150, 150])
+                raster = raster.convert('RGB')
+                diff = ImageStat.Stat(ImageChops.difference(reference.resize(raster.size), raster)).mean
+            self.assertLess(max(diff), 3.0, f"{fmt} differs from the PDF sheet: {diff}")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from service import render_service
+from service.render_service import RenderService
+
+MB = 1024 * 1024
+
+async def http(port, method, path, body=b'', headers=None):
+    """Send one request and return (status, headers, body); the service closes every connection."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    headers = dict({'Content-Length': str(len(body))} if method == 'POST' else {}, **(headers or {}))
+    head = f'{method} {path} HTTP/1.1\r\n' + ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+    writer.write(head.encode('latin-1') + b'\r\n' + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+
+    head, _, body = response.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    response_headers = dict((name.lower(), value.strip()) for name, value in (line.split(':', 1) for line in header_lines))
+    return int(status_line.split()[1]), response_headers, body
+
+def dechunk(body):
+    events = []
+    while True:
+        size, _, rest = body.partition(b'\r\n')
+        if int(size, 16) == 0:
+            return events
+        events.append(json.loads(rest[:int(size, 16)]))
+        body = rest[int(size, 16) + 2:]
+
+class TestRenderService(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.image = os.path.join(self.temp_dir, 'card.png')
+        Image.new('RGB', (600, 400), 'red').save(self.image, dpi=(150, 150))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def run_service(self, scenario, **options):
+        async def run():
+            service = RenderService(**options)
+            server = await service.start('127.0.0.1', 0)
+            try:
+                await scenario(service, server.sockets[0].getsockname()[1])
+            finally:
+                await service.close()
+
+        asyncio.run(run())
+
+    def job_body(self):
+        return json.dumps({'images': [self.image], 'paper_size': 'A4', 'dpi': 150}).encode()
+
+    def test_bad_requests(self):
+        async def scenario(service, port):
+            status, _, _ = await http(port, 'POST', '/jobs', b'{}', {'Content-Length': 'lots'})
+            self.assertEqual(status, 400)
+            status, _, _ = await http(port, 'GET', '/jobs', headers={'X-Padding': 'x' * 128 * 1024})
+            self.assertEqual(status, 400)
+            status, _, body = await http(port, 'POST', '/jobs', b'not json')
+            self.assertEqual((status, json.loads(body)['error']), (400, "Job spec must be JSON"))
+            status, _, body = await http(port, 'POST', '/jobs', json.dumps({'images': ['/no/such/card.png']}).encode())
+            self.assertEqual(status, 400)
+            self.assertIn('/no/such/card.png', json.loads(body)['error'])
+            status, _, _ = await http(port, 'POST', '/jobs')
+            self.assertEqual(status, 400)
+            for spec in ([1, 2], "x", {'images': 'card.png'}, {'images': [5]}, {'uploads': ['card.png']},
+                         {'uploads': [{'name': 5, 'data': ''}]}, {'backs': {}}, {'paper_size': ['A4']}):
+                status, _, body = await http(port, 'POST', '/jobs', json.dumps(spec).encode())
+                self.assertEqual(status, 400, spec)
+                self.assertIn('error', json.loads(body))
+            with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 10000):
+                status, _, body = await http(port, 'POST', '/jobs', self.job_body())
+            self.assertEqual(status, 400)
+            self.assertIn('too large', json.loads(body)['error'])
+            status, _, _ = await http(port, 'GET', '/jobs/unknown')
+            self.assertEqual(status, 404)
+
+        self.run_service(scenario, workers=1)
+
+    def test_full_queue_is_refused_with_retry_after(self):
+        async def scenario(service, port):
+            # With the whole memory budget taken, the dispatcher holds the first
+            # job waiting for memory and the second fills the queue
+            await service.scheduler.acquire(64 * MB)
+            first = await http(port, 'POST', '/jobs', self.job_body())
+            second = await http(port, 'POST', '/jobs', self.job_body())
+            self.assertEqual((first[0], second[0]), (202, 202))
+            status, headers, _ = await http(port, 'POST', '/jobs', self.job_body())
+            self.assertEqual((status, headers['retry-after']), (503, '1'))
+            await service.scheduler.release(64 * MB)
+
+        self.run_service(scenario, workers=1, queue_size=1, memory_budget=64 * MB)
+
+    def test_completed_job(self):
+        async def scenario(service, port):
+            status, _, body = await http(port, 'POST', '/jobs', self.job_body())
+            self.assertEqual(status, 202)
+            job = json.loads(body)
+
+            status, _, body = await http(port, 'GET', job['events_url'])
+            self.assertEqual(status, 200)
+            statuses = [event['status'] for event in dechunk(body)]
+            self.assertEqual(statuses[-1], 'done')
+            self.assertEqual(statuses, sorted(set(statuses), key=statuses.index))
+
+            status, headers, body = await http(port, 'GET', job['result_url'])
+            self.assertEqual((status, headers['content-type']), (200, 'application/pdf'))
+            self.assertTrue(body.startswith(b'%PDF'))
+            self.assertEqual(len(body), int(headers['content-length']))
+
+            status, _, body = await http(port, 'GET', job['status_url'])
+            self.assertEqual(json.loads(body)['status'], 'done')
+
+        self.run_service(scenario, workers=1)
+
+    def test_slow_job_specs_do_not_block_other_requests(self):
+        parse_job_spec = render_service.parse_job_spec
+
+        def slow_parse(body, work_dir):
+            time.sleep(0.5)  # e.g. listing a large archive on a network share
+            return parse_job_spec(body, work_dir)
+
+        async def scenario(service, port):
+            submit = asyncio.create_task(http(port, 'POST', '/jobs', self.job_body()))
+            await asyncio.sleep(0.1)
+            status, _, _ = await http(port, 'GET', '/metrics')
+            self.assertEqual(status, 200)
+            # Answered while the submit was still being parsed
+            self.assertFalse(submit.done())
+            self.assertEqual((await submit)[0], 202)
+
+        with mock.patch.object(render_service, 'parse_job_spec', slow_parse):
+            self.run_service(scenario, workers=1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import gc
+import os
+import sys
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import fitz
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication
+
+from business_logic import instrumentation
+from ui.controllers.view_logic import RenderedPage
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+def make_pixmap(width, height):
+    # Odd width, so rows are not 4-byte aligned and the stride has to be passed through
+    with fitz.open() as document:
+        page = document.new_page(width=width, height=height)
+        page.draw_rect(fitz.Rect(0, 0, width / 2, height), color=(1, 0, 0), fill=(1, 0, 0))
+        return page.get_pixmap(alpha=False)
+
+class TestRenderedPage(unittest.TestCase):
+    def setUp(self):
+        instrumentation.reset()
+
+    def test_image_reads_the_pixmap_in_place(self):
+        pix = make_pixmap(101, 60)
+        page = RenderedPage(pix)
+
+        self.assertEqual((page.image.width(), page.image.height()), (pix.width, pix.height))
+        self.assertEqual(page.image.bytesPerLine(), pix.stride)
+        self.assertEqual(page.nbytes, pix.stride * pix.height)
+        self.assertEqual(int(page.image.constBits()), pix.samples_ptr)
+        self.assertEqual(QColor(page.image.pixel(10, 10)).getRgb()[:3], (255, 0, 0))
+        self.assertEqual(QColor(page.image.pixel(90, 10)).getRgb()[:3], (255, 255, 255))
+        self.assertEqual(instrumentation.get('render.frames'), 1)
+        self.assertEqual(instrumentation.get('render.last_frame_bytes'), page.nbytes)
+
+    def test_pixmap_is_kept_alive(self):
+        page = RenderedPage(make_pixmap(101, 60))
+        gc.collect()
+        # Reading the image after the caller's reference is gone would crash if
+        # the pixmap's memory had been freed
+        self.assertEqual(int(page.image.constBits()), page.pix.samples_ptr)
+        self.assertEqual(page.image.copy().pixel(10, 10), page.image.pixel(10, 10))
+        self.assertEqual(QColor(page.image.pixel(10, 59)).getRgb()[:3], (255, 0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
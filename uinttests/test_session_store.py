@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+import config
+from business_logic import content_hash, session_store
+from business_logic.session_store import SessionStore, refresh_record
+from ui.controllers import file_controller
+from ui.controllers.file_controller import FileManager
+from uinttests.helpers import isolate_caches
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        store_path = os.path.join(self.temp_dir, 'session.db')
+        isolate_caches(self, self.temp_dir)
+        patchers = [
+            mock.patch.dict(config.CONFIG['user_modifiable'], {'persist_files': True}),
+            mock.patch.object(file_controller, 'SessionStore', lambda: SessionStore(store_path)),
+            mock.patch.object(file_controller, 'LEGACY_PERSISTED_FILES', os.path.join(self.temp_dir, 'persisted_files.json')),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.images = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir, f'card_{i}.png')
+            Image.new('RGB', (600, 400), (i * 80, 0, 0)).save(path, dpi=(300, 300))
+            self.images.append(path)
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            manager.save_persisted_files()
+            shutil.rmtree(manager.temp_dir)
+        shutil.rmtree(self.temp_dir)
+
+    def file_manager(self):
+        manager = FileManager()
+        self.managers.append(manager)
+        return manager
+
+    def test_session_is_restored_without_reading_files(self):
+        manager = self.file_manager()
+        manager.add_files(self.images)
+        manager.update_image_list(self.images[2], True, True)
+        manager.update_image_list(self.images[1], False, False)
+        manager.remove_file(self.images[0])
+
+        with mock.patch.object(content_hash, 'hash_file') as hash_file, \
+                mock.patch.object(session_store, 'probe_image') as probe_image:
+            restored = self.file_manager()
+            hash_file.assert_not_called()
+            probe_image.assert_not_called()
+
+        self.assertEqual(restored.images, self.images[1:])
+        self.assertEqual(restored.front_images, [self.images[2]])
+        self.assertEqual(restored.back_images, [])
+        self.assertEqual(restored.hashes, {path: manager.hashes[path] for path in self.images[1:]})
+        record = restored.metadata[self.images[1]]
+        self.assertEqual((record['width'], record['height'], round(record['dpi_x'])), (600, 400, 300))
+
+    def test_refresh_record(self):
+        manager = self.file_manager()
+        manager.add_files(self.images)
+        thumbnail_dir = os.path.join(self.temp_dir, 'thumbnails')
+
+        record = refresh_record(manager.metadata[self.images[0]], thumbnail_dir)
+        self.assertTrue(os.path.exists(record['thumbnail']))
+        self.assertIsNone(refresh_record(record, thumbnail_dir))
+
+        Image.new('RGB', (900, 600), 'blue').save(self.images[0])
+        changed = refresh_record(record, thumbnail_dir)
+        self.assertEqual(changed['width'], 900)
+        self.assertNotEqual(changed['content_hash'], record['content_hash'])
+
+        os.remove(self.images[0])
+        self.assertEqual(refresh_record(changed, thumbnail_dir)['missing'], 1)
+
+    def test_defaults_are_kept_in_the_user_directories(self):
+        environ = {'XDG_DATA_HOME': os.path.join(self.temp_dir, 'data'), 'XDG_CACHE_HOME': os.path.join(self.temp_dir, 'cache')}
+        with mock.patch.dict(os.environ, environ):
+            store = SessionStore()
+            store.connection.close()
+            thumbnail = refresh_record({'path': self.images[0]})['thumbnail']
+        self.assertEqual(store.path, os.path.join(self.temp_dir, 'data', 'postcard-printer', 'session.db'))
+        self.assertEqual(os.path.dirname(thumbnail), os.path.join(self.temp_dir, 'cache', 'postcard-printer', 'thumbnails'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+from business_logic.pdf_operations import create_postcard_pdf, combine_pdfs
+from uinttests.helpers import isolate_caches
+
+def make_card_image(path, size=(1200, 1800)):
+    # Distinct corners so that a flipped or wrongly rotated card shows up in the diff
+    img = Image.new('RGB', size, (240, 240, 240))
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    draw.rectangle([0, 0, w // 2, h // 3], fill=(200, 30, 30))
+    draw.rectangle([w // 2, h * 2 // 3, w, h], fill=(30, 30, 200))
+    draw.ellipse([w // 4, h // 3, w * 3 // 4, h * 2 // 3], fill=(30, 160, 30))
+    img.save(path)
+
+def render_page(pdf_path, page_num=0, zoom=0.5):
+    import fitz
+
+    with fitz.open(pdf_path) as doc:
+        pix = doc.load_page(page_num).get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+
+class TestSheetWriters(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        isolate_caches(self, self.temp_dir)
+        self.image_path = os.path.join(self.temp_dir, 'card.png')
+        make_card_image(self.image_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def assertVisuallyEqual(self, first, second, tolerance=3.0):
+        self.assertEqual(first.size, second.size)
+        diff = ImageStat.Stat(ImageChops.difference(first, second)).mean
+        self.assertLess(max(diff), tolerance, f"Mean channel difference {diff}")
+
+    def test_backends_render_the_same_sheet(self):
+        for paper_size in ('A4', 'Letter [8.5x11]'):
+            reportlab_pdf = os.path.join(self.temp_dir, 'reportlab.pdf')
+            pymupdf_pdf = os.path.join(self.temp_dir, 'pymupdf.pdf')
+            reportlab_total = create_postcard_pdf(self.image_path, reportlab_pdf, paper_size, backend='reportlab')
+            pymupdf_total = create_postcard_pdf(self.image_path, pymupdf_pdf, paper_size, backend='pymupdf')
+
+            self.assertEqual(reportlab_total, pymupdf_total)
+            self.assertVisuallyEqual(render_page(reportlab_pdf), render_page(pymupdf_pdf))
+
+    def test_pymupdf_embeds_image_once(self):
+        import fitz
+
+        output_pdf = os.path.join(self.temp_dir, 'sheet.pdf')
+        total = create_postcard_pdf(self.image_path, output_pdf, 'A3', backend='pymupdf')
+        self.assertGreater(total, 1)
+        with fitz.open(output_pdf) as doc:
+            self.assertEqual(len({img[0] for img in doc.get_page_images(0)}), 1)
+
+    def test_pymupdf_combine_matches_pypdf2(self):
+        front_pdf = os.path.join(self.temp_dir, 'front.pdf')
+        create_postcard_pdf(self.image_path, front_pdf, 'A4')
+        pypdf2_pdf = os.path.join(self.temp_dir, 'pypdf2.pdf')
+        pymupdf_pdf = os.path.join(self.temp_dir, 'pymupdf.pdf')
+        combine_pdfs(front_pdf, front_pdf, pypdf2_pdf, backend='reportlab')
+        combine_pdfs(front_pdf, front_pdf, pymupdf_pdf, backend='pymupdf')
+
+        for page_num in range(2):
+            self.assertVisuallyEqual(render_page(pypdf2_pdf, page_num), render_page(pymupdf_pdf, page_num))
+
+if __name__ == '__main__':
+    unittest.main()